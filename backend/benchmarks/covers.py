@@ -0,0 +1,56 @@
+import wave
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+# ---------------- SYNTHETIC COVERS ----------------
+# Every generator is seeded, so two runs benchmark byte-identical covers.
+# Content is smooth noise rather than flat colour, so PNG and FFV1 have
+# realistic work to do.
+
+def _noise(rng, shape):
+    base = rng.integers(0, 256, size=shape, dtype=np.uint8)
+    return cv2.GaussianBlur(base, (5, 5), 0)
+
+
+def make_png(path, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    Image.fromarray(_noise(rng, (height, width, 3)), "RGB").save(path, format="PNG")
+
+
+def make_wav(path, seconds, sampwidth=2, channels=1, rate=44100, seed=0):
+    rng = np.random.default_rng(seed)
+    nbytes = int(seconds * rate) * channels * sampwidth
+
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sampwidth)
+        wf.setframerate(rate)
+        wf.writeframes(rng.integers(0, 256, size=nbytes, dtype=np.uint8).tobytes())
+
+
+def make_avi(path, width, height, frames, fps=25, seed=0):
+    rng = np.random.default_rng(seed)
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"FFV1"), fps, (width, height))
+
+    try:
+        frame = _noise(rng, (height, width, 3))
+        for f in range(frames):
+            out.write(np.roll(frame, f * 2, axis=1))
+    finally:
+        out.release()
+
+
+def make_text(path, size, seed=0):
+    rng = np.random.default_rng(seed)
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "élan", "naïve"]
+    line = " ".join(rng.choice(words, size=12)) + "\n"
+    data = line.encode("utf-8")
+
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            f.write(data)
+            written += len(data)
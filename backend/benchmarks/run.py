@@ -0,0 +1,363 @@
+"""Benchmark every stego engine and crypto primitive on synthetic covers.
+
+Run from backend/:
+
+    python -m benchmarks.run --out results.json
+    python -m benchmarks.run --quick --compare results.json
+
+Each case is timed over --repeat runs after one warm-up run. Results
+record the median and best time, ops/sec, MB/s of cover processed, and
+peak traced memory (tracemalloc: Python and NumPy allocations, not the
+internal buffers of PIL, cv2 or the codecs). The cover and plan caches
+are disabled unless --cache is given, so repeated runs measure the cold
+path.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.covers import make_png, make_wav, make_avi, make_text
+from crypto.crypto_utils import aes_encrypt, aes_decrypt, build_header, kyber_encapsulate, kyber_decapsulate
+from pqcrypto.kem import ml_kem_512
+from stego.bits import bytes_to_bits, bits_to_bytes
+from stego.cache import cover_cache, plan_cache
+from stego.image_stego import embed_image, extract_image
+from stego.audio_stego import embed_audio, extract_audio
+from stego.video_stego import embed_video, extract_video
+from stego.video_shards import shard_count
+from stego.text_stego import embed_text, extract_text, RADICES
+
+
+KIB = 1024
+MIB = 1024 * 1024
+
+# ---------------- MATRIX ----------------
+# (full, quick) variants of every axis
+
+IMAGE_SIZES = ([(256, 256), (1024, 1024), (2048, 2048)], [(256, 256), (512, 512)])
+WAV_SHAPES = (
+    [(5, 1, 1), (5, 2, 1), (5, 3, 1), (5, 4, 1), (30, 2, 1), (30, 2, 2)],
+    [(2, 1, 1), (2, 2, 1), (2, 3, 2)],
+)  # (seconds, sampwidth, channels)
+VIDEO_SHAPES = ([(320, 240, 30), (640, 480, 30)], [(160, 120, 10)])
+VIDEO_PARALLEL_SHAPES = ([(640, 480, 240)], [(320, 240, 64)])
+TEXT_SIZES = ([1 * MIB, 16 * MIB], [256 * KIB])
+PAYLOAD_SIZES = ([1 * KIB, 16 * KIB, 128 * KIB], [1 * KIB, 16 * KIB])
+AES_SIZES = ([64 * KIB, 1 * MIB, 16 * MIB], [64 * KIB, 1 * MIB])
+
+
+# ---------------- MEASUREMENT ----------------
+
+def measure(fn, repeat):
+    # The warm-up run doubles as the memory run, so tracing overhead never
+    # lands in the timings.
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    median = statistics.median(times)
+
+    return {
+        "repeat": repeat,
+        "median_s": median,
+        "min_s": min(times),
+        "ops_per_sec": 1 / median if median else None,
+        "peak_mem_bytes": peak,
+    }
+
+
+def result(name, params, stats, nbytes=None):
+    entry = {"name": name, "params": params, **stats}
+
+    if nbytes:
+        entry["mb_per_s"] = nbytes / MIB / stats["median_s"]
+
+    return entry
+
+
+def fixed_seed(seed):
+    return lambda header: seed
+
+
+# ---------------- CASES ----------------
+
+def bench_crypto(args, variant):
+    pk, sk = ml_kem_512.generate_keypair()
+    kyber_ct, shared_secret = kyber_encapsulate(pk)
+    key = os.urandom(32)
+
+    yield result("kyber.keygen", {}, measure(ml_kem_512.generate_keypair, args.repeat))
+    yield result("kyber.encaps", {}, measure(lambda: kyber_encapsulate(pk), args.repeat))
+    yield result("kyber.decaps", {}, measure(lambda: kyber_decapsulate(sk, kyber_ct), args.repeat))
+
+    for size in AES_SIZES[variant]:
+        data = os.urandom(size)
+        nonce, ciphertext = aes_encrypt(data, key)
+        params = {"bytes": size}
+
+        yield result("aes_gcm.encrypt", params, measure(lambda: aes_encrypt(data, key), args.repeat), size)
+        yield result("aes_gcm.decrypt", params, measure(lambda: aes_decrypt(nonce, ciphertext, key), args.repeat), size)
+
+
+def bench_bits(args, variant):
+    for size in PAYLOAD_SIZES[variant]:
+        data = os.urandom(size)
+        bits = bytes_to_bits(data)
+
+        yield result("bits.unpack", {"bytes": size}, measure(lambda: bytes_to_bits(data), args.repeat), size)
+        yield result("bits.pack", {"bytes": size}, measure(lambda: bits_to_bytes(bits), args.repeat), size)
+
+
+def payload_cases(kyber_ct, capacity_bytes, variant):
+    seed = os.urandom(32)
+
+    for size in PAYLOAD_SIZES[variant]:
+        header = build_header(kyber_ct, os.urandom(12), size)
+
+        if size + len(header) > capacity_bytes:
+            continue
+
+        yield size, header, os.urandom(size), seed
+
+
+def bench_cover(args, workdir, variant, kyber_ct, name, cover, params, capacity_bytes, embed, extract, suffix):
+    cover_size = os.path.getsize(cover)
+
+    for size, header, body, seed in payload_cases(kyber_ct, capacity_bytes, variant):
+        stego = os.path.join(workdir, f"stego{suffix}")
+        case = {**params, "payload_bytes": size}
+
+        yield result(f"{name}.embed", case,
+                     measure(lambda: embed(cover, stego, header, body, seed), args.repeat), cover_size)
+
+        yield result(f"{name}.extract", case,
+                     measure(lambda: extract(stego, fixed_seed(seed)), args.repeat), os.path.getsize(stego))
+
+
+def bench_image(args, workdir, variant, kyber_ct):
+    for w, h in IMAGE_SIZES[variant]:
+        cover = os.path.join(workdir, f"cover_{w}x{h}.png")
+        make_png(cover, w, h)
+
+        yield from bench_cover(args, workdir, variant, kyber_ct, "image", cover, {"width": w, "height": h},
+                               w * h * 3 // 8, embed_image, extract_image, ".png")
+
+
+def bench_audio(args, workdir, variant, kyber_ct):
+    for seconds, sampwidth, channels in WAV_SHAPES[variant]:
+        cover = os.path.join(workdir, f"cover_{seconds}s_{sampwidth}_{channels}.wav")
+        make_wav(cover, seconds, sampwidth, channels)
+
+        params = {"seconds": seconds, "bits": sampwidth * 8, "channels": channels}
+        capacity = seconds * 44100 * channels // 8
+
+        yield from bench_cover(args, workdir, variant, kyber_ct, "audio", cover, params,
+                               capacity, embed_audio, extract_audio, ".wav")
+
+
+def bench_video(args, workdir, variant, kyber_ct):
+    for w, h, frames in VIDEO_SHAPES[variant]:
+        cover = os.path.join(workdir, f"cover_{w}x{h}_{frames}.avi")
+        make_avi(cover, w, h, frames)
+
+        params = {"width": w, "height": h, "frames": frames}
+
+        yield from bench_cover(args, workdir, variant, kyber_ct, "video", cover, params,
+                               w * h * 3 * frames // 8, embed_video, extract_video, ".avi")
+
+
+def worker_counts(limit):
+    counts = [1]
+
+    while counts[-1] * 2 <= limit:
+        counts.append(counts[-1] * 2)
+
+    if counts[-1] != limit:
+        counts.append(limit)
+
+    return counts
+
+
+def bench_video_parallel(args, workdir, variant, kyber_ct):
+    # Sharded embed scaling: one payload, 1, 2, 4, ... workers up to --workers.
+    # Each entry's "speedup" is relative to the 1-worker run; "shards" is
+    # the processes actually started (1 below STEGO_VIDEO_SHARD_MIN_BYTES,
+    # so the --quick cover runs serially).
+    for w, h, frames in VIDEO_PARALLEL_SHAPES[variant]:
+        cover = os.path.join(workdir, f"cover_{w}x{h}_{frames}.avi")
+        make_avi(cover, w, h, frames)
+
+        size = PAYLOAD_SIZES[variant][-1]
+        header = build_header(kyber_ct, os.urandom(12), size)
+        body = os.urandom(size)
+        seed = os.urandom(32)
+        stego = os.path.join(workdir, "stego.avi")
+        serial = None
+
+        for workers in worker_counts(args.workers):
+            meta = {"width": w, "height": h, "frame_count": frames}
+            params = {"width": w, "height": h, "frames": frames, "payload_bytes": size, "workers": workers,
+                      "shards": shard_count(meta, workers)}
+            stats = measure(lambda: embed_video(cover, stego, header, body, seed, workers=workers), args.repeat)
+            serial = serial or stats["median_s"]
+
+            yield {**result("video.embed_sharded", params, stats, os.path.getsize(cover)),
+                   "speedup": serial / stats["median_s"]}
+
+
+def bench_text(args, workdir, variant, kyber_ct):
+    for size in TEXT_SIZES[variant]:
+        cover = os.path.join(workdir, f"cover_{size}.txt")
+        make_text(cover, size)
+
+        for payload, radix in itertools.product(PAYLOAD_SIZES[variant], RADICES):
+            header = build_header(kyber_ct, os.urandom(12), payload)
+            body = os.urandom(payload)
+            stego = os.path.join(workdir, "stego.txt")
+            case = {"text_bytes": size, "payload_bytes": payload, "radix": radix}
+
+            yield result("text.embed", case,
+                         measure(lambda: embed_text(cover, stego, header, body, radix), args.repeat), size)
+            yield result("text.extract", case,
+                         measure(lambda: extract_text(stego, fixed_seed(b"")), args.repeat), os.path.getsize(stego))
+
+
+SUITES = {
+    "crypto": bench_crypto,
+    "bits": bench_bits,
+    "image": bench_image,
+    "audio": bench_audio,
+    "video": bench_video,
+    "text": bench_text,
+    "video_parallel": bench_video_parallel,
+}
+
+
+# ---------------- REPORTING ----------------
+
+def case_key(entry):
+    return entry["name"], json.dumps(entry["params"], sort_keys=True)
+
+
+def compare(results, baseline_path, threshold):
+    """Print the median-time ratio against a baseline file. Returns the
+    number of cases slower than threshold x baseline."""
+    with open(baseline_path) as f:
+        baseline = {case_key(e): e for e in json.load(f)["results"]}
+
+    regressions = 0
+
+    for entry in results:
+        old = baseline.get(case_key(entry))
+
+        if old is None:
+            continue
+
+        ratio = entry["median_s"] / old["median_s"]
+        flag = ""
+
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+
+        print(f"{entry['name']:<18} {case_key(entry)[1]:<60} {ratio:6.2f}x{flag}")
+
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--quick", action="store_true", help="small covers and payloads only")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", choices=sorted(SUITES), help="run only these suites")
+    parser.add_argument("--cache", action="store_true", help="keep the cover and plan caches enabled")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="most workers for the video_parallel suite (default: CPU count)")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio counted as a regression (default 1.25)")
+    args = parser.parse_args(argv)
+
+    if not args.cache:
+        cover_cache.enabled = False
+        plan_cache.enabled = False
+
+    variant = 1 if args.quick else 0
+    pk, _ = ml_kem_512.generate_keypair()
+    kyber_ct, _ = kyber_encapsulate(pk)
+
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="stego-bench-") as workdir:
+        for suite in args.only or SUITES:
+            fn = SUITES[suite]
+
+            if suite in ("crypto", "bits"):
+                cases = fn(args, variant)
+            else:
+                cases = fn(args, workdir, variant, kyber_ct)
+
+            for entry in cases:
+                results.append(entry)
+                throughput = f"{entry['mb_per_s']:9.1f} MB/s" if "mb_per_s" in entry else " " * 14
+                print(f"{entry['name']:<18} {json.dumps(entry['params']):<60} "
+                      f"{entry['median_s'] * 1000:10.2f} ms {throughput} "
+                      f"{entry['peak_mem_bytes'] / MIB:8.1f} MiB", flush=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": args.quick,
+            "repeat": args.repeat,
+            "cache": args.cache,
+        },
+        "results": results,
+    }
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        if compare(results, args.compare, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
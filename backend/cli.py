@@ -0,0 +1,147 @@
+"""Hide or extract payloads for every file in a directory, in parallel.
+
+Run from backend/:
+
+    python -m cli hide --public-key pk.bin --message "meet at noon" covers/ out/
+    python -m cli hide --key-id 0123456789abcdef --payload report.pdf covers/ out/
+    python -m cli extract --private-key sk.bin out/ recovered/
+
+Each file is one job on a process pool (--workers, default CPU count).
+A line is printed as each file finishes, then the totals with files/s
+and MB/s of input. Extracted messages are written to <name>.message.txt
+and file payloads to <name>.payload. Exits 1 if any file failed.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from stegolib import hide, extract, COVER_SUFFIXES, STEGO_SUFFIXES
+
+MIB = 1024 * 1024
+
+
+def read_file(path):
+    if path is None:
+        return None
+
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def list_inputs(directory, suffixes):
+    return sorted(
+        entry.path for entry in os.scandir(directory)
+        if entry.is_file() and entry.name.lower().endswith(suffixes)
+    )
+
+
+# ---------------- JOBS ----------------
+# Top level so they can be shipped to the pool workers. Each returns
+# (path, output, error, seconds) and never raises.
+
+def hide_one(path, out_dir, public_key, key_id, message, payload_path, density):
+    started = time.perf_counter()
+    payload = message if payload_path is None else Path(payload_path)
+
+    try:
+        output = hide(path, payload, public_key, out_dir, key_id, density)
+        return path, output, None, time.perf_counter() - started
+    except Exception as e:
+        return path, None, str(e) or type(e).__name__, time.perf_counter() - started
+
+
+def extract_one(path, out_dir, private_key, key_id):
+    started = time.perf_counter()
+    name = os.path.basename(path)
+
+    try:
+        kind, output = extract(path, private_key, os.path.join(out_dir, name + ".payload"), key_id)
+
+        if kind == "message":
+            message = output
+            output = os.path.join(out_dir, name + ".message.txt")
+
+            with open(output, "w", encoding="utf-8") as f:
+                f.write(message)
+
+        return path, output, None, time.perf_counter() - started
+    except Exception as e:
+        return path, None, str(e) or type(e).__name__, time.perf_counter() - started
+
+
+# ---------------- RUNNER ----------------
+
+def run(job, paths, args, workers):
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    failed = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(job, path, *args) for path in paths]
+
+        for done, future in enumerate(as_completed(futures), 1):
+            path, output, error, seconds = future.result()
+            name = os.path.basename(path)
+
+            if error is None:
+                print(f"[{done}/{len(paths)}] {name} -> {os.path.basename(output)} ({seconds:.2f}s)", flush=True)
+            else:
+                failed += 1
+                print(f"[{done}/{len(paths)}] {name} FAILED: {error}", flush=True)
+
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(paths)} files ({failed} failed) in {elapsed:.2f}s: "
+          f"{len(paths) / elapsed:.2f} files/s, {total_bytes / MIB / elapsed:.2f} MB/s")
+
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    hide_cmd = commands.add_parser("hide", help="hide one payload in every cover of a directory")
+    hide_cmd.add_argument("input_dir")
+    hide_cmd.add_argument("output_dir")
+    hide_key = hide_cmd.add_mutually_exclusive_group(required=True)
+    hide_key.add_argument("--public-key", help="ML-KEM-512 public key file")
+    hide_key.add_argument("--key-id", help="stored key ID (see /keys)")
+    hide_payload = hide_cmd.add_mutually_exclusive_group(required=True)
+    hide_payload.add_argument("--message")
+    hide_payload.add_argument("--payload", help="file to hide")
+    hide_cmd.add_argument("--density", type=int, default=1)
+
+    extract_cmd = commands.add_parser("extract", help="recover the payload of every stego file of a directory")
+    extract_cmd.add_argument("input_dir")
+    extract_cmd.add_argument("output_dir")
+    extract_key = extract_cmd.add_mutually_exclusive_group()
+    extract_key.add_argument("--private-key", help="ML-KEM-512 private key file")
+    extract_key.add_argument("--key-id", help="stored key ID; by default the one in each header")
+
+    args = parser.parse_args(argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.command == "hide":
+        paths = list_inputs(args.input_dir, COVER_SUFFIXES)
+        payload_path = os.path.abspath(args.payload) if args.payload else None
+        job_args = (args.output_dir, read_file(args.public_key), args.key_id, args.message, payload_path, args.density)
+        job = hide_one
+    else:
+        paths = list_inputs(args.input_dir, STEGO_SUFFIXES)
+        job_args = (args.output_dir, read_file(args.private_key), args.key_id)
+        job = extract_one
+
+    if not paths:
+        print(f"No supported files in {args.input_dir}", file=sys.stderr)
+        return 1
+
+    return 1 if run(job, paths, job_args, max(1, args.workers)) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+# ---------------- WORKER POOL ----------------
+# "process" runs each embed/extract job in a separate interpreter, so the
+# pure-Python stages scale across cores. "thread" avoids the pickling cost and
+# is enough when the heavy stages release the GIL (cv2, NumPy, PIL, zlib).
+EXECUTOR_KIND = os.environ.get("STEGO_EXECUTOR", "process")
+POOL_SIZE = _env_int("STEGO_POOL_SIZE", os.cpu_count() or 1)
+
+# Jobs allowed to wait for a free worker before new ones are rejected.
+QUEUE_SIZE = _env_int("STEGO_QUEUE_SIZE", 16)
+
+# Seconds a request waits for its job before giving up.
+JOB_TIMEOUT = _env_float("STEGO_JOB_TIMEOUT", 300)
+
+# Batch endpoints: most files accepted per request, and how many of a
+# batch's items may occupy the pool at once (so one batch cannot fill the
+# wait queue and starve single requests).
+BATCH_MAX_ITEMS = _env_int("STEGO_BATCH_MAX_ITEMS", 256)
+BATCH_CONCURRENCY = _env_int("STEGO_BATCH_CONCURRENCY", POOL_SIZE)
+
+# Async jobs (/jobs/*): how many may be queued or running at once, how many
+# of them occupy the pool together, how long one may run, and how many
+# seconds a finished job's result is kept before it is deleted.
+JOBS_MAX = _env_int("STEGO_JOBS_MAX", 64)
+JOBS_CONCURRENCY = _env_int("STEGO_JOBS_CONCURRENCY", POOL_SIZE)
+ASYNC_JOB_TIMEOUT = _env_float("STEGO_ASYNC_JOB_TIMEOUT", 3600)
+JOB_RESULT_TTL = _env_float("STEGO_JOB_RESULT_TTL", 3600)
+
+# Processes one video embed may use to decode and embed frames in parallel
+# (see stego/video_shards.py); 1 keeps it in the job's own worker. These
+# come on top of POOL_SIZE, so raise it only when videos are the bottleneck.
+VIDEO_WORKERS = _env_int("STEGO_VIDEO_WORKERS", 1)
+
+# Videos with fewer decoded frame bytes than this are embedded serially
+# even when VIDEO_WORKERS > 1: starting a shard process (~0.3 s) costs more
+# than it saves on short clips. Sharding also needs more than one core.
+VIDEO_SHARD_MIN_BYTES = _env_int("STEGO_VIDEO_SHARD_MIN_BYTES", 64 * 1024 * 1024)
+
+# ---------------- ADMISSION CONTROL ----------------
+# Each hide/extract job reserves its estimated peak memory (from the cover's
+# dimensions, sample or frame count) from STEGO_MEMORY_BUDGET bytes, by
+# default half the machine's RAM; 0 turns admission control off. A job that
+# does not fit waits up to STEGO_ADMISSION_WAIT seconds, with at most
+# STEGO_ADMISSION_QUEUE jobs waiting, before it is rejected with 429.
+def _physical_memory():
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+MEMORY_BUDGET = _env_int("STEGO_MEMORY_BUDGET", _physical_memory() // 2)
+ADMISSION_WAIT = _env_float("STEGO_ADMISSION_WAIT", 10)
+ADMISSION_QUEUE = _env_int("STEGO_ADMISSION_QUEUE", QUEUE_SIZE)
+
+# Most bytes one job's embed plan may take (about 112 per payload bit at
+# density 1, see stego/indices.py). Larger payloads are rejected before the
+# plan is built, on hide and on extract; 0 turns the limit off.
+PLAN_MEMORY_MAX = _env_int("STEGO_PLAN_MEMORY_MAX", 2 * 1024 * 1024 * 1024)
+
+# ---------------- SCRATCH FILES ----------------
+# Per-job scratch files go to SCRATCH_MEMORY_DIR (tmpfs) when they are at
+# most SCRATCH_MEMORY_MAX bytes and the tmpfs has room, else to SCRATCH_DIR
+# (None means the system temp dir). Set STEGO_SCRATCH_MEMORY_DIR="" to
+# always use disk.
+SCRATCH_DIR = os.environ.get("STEGO_SCRATCH_DIR") or None
+SCRATCH_MEMORY_DIR = os.environ.get(
+    "STEGO_SCRATCH_MEMORY_DIR",
+    "/dev/shm" if os.path.isdir("/dev/shm") else ""
+)
+SCRATCH_MEMORY_MAX = _env_int("STEGO_SCRATCH_MEMORY_MAX", 512 * 1024 * 1024)
+
+# ---------------- CACHE ----------------
+# Decoded covers (keyed by content hash) and index plans are kept in two
+# byte-bounded LRU caches, one pair per worker process. STEGO_CACHE=0 turns
+# both off. Covers bigger than a quarter of the cover budget are never
+# cached, so one huge upload cannot flush everything else.
+CACHE_ENABLED = os.environ.get("STEGO_CACHE", "1") != "0"
+COVER_CACHE_BYTES = _env_int("STEGO_COVER_CACHE_BYTES", 256 * 1024 * 1024)
+PLAN_CACHE_BYTES = _env_int("STEGO_PLAN_CACHE_BYTES", 64 * 1024 * 1024)
+
+# Cover metadata read for capacity checks (POST /capacity and hide), also
+# keyed by content hash.
+INFO_CACHE_BYTES = _env_int("STEGO_INFO_CACHE_BYTES", 1024 * 1024)
+
+# ---------------- COMPRESSION ----------------
+# Payloads are compressed before encryption when it makes them smaller;
+# STEGO_COMPRESSION=0 turns that off. Receivers refuse payloads that
+# decompress to more than STEGO_DECOMPRESS_LIMIT bytes.
+COMPRESSION_ENABLED = os.environ.get("STEGO_COMPRESSION", "1") != "0"
+DECOMPRESS_LIMIT = _env_int("STEGO_DECOMPRESS_LIMIT", 1024 * 1024 * 1024)
+
+# ---------------- TEXT COVERS ----------------
+# Zero-width chars per payload symbol: 8 (3 bits per char, default), 4
+# (2 bits) or 2 (the v1 ZWSP/ZWNJ encoding, for receivers that predate
+# the versioned block). Receivers read all three.
+TEXT_RADIX = _env_int("STEGO_TEXT_RADIX", 8)
+
+# ---------------- KEYSTORE ----------------
+# Stored key pairs live in KEYSTORE_DIR with private keys encrypted under
+# a master key derived from STEGO_KEYSTORE_SECRET (or, when unset, a random
+# key file in the same directory). Decoded keys are cached per worker.
+KEYSTORE_DIR = os.environ.get("STEGO_KEYSTORE_DIR") or os.path.expanduser("~/.stego/keys")
+KEYSTORE_SECRET = os.environ.get("STEGO_KEYSTORE_SECRET") or None
+KEY_CACHE_BYTES = _env_int("STEGO_KEY_CACHE_BYTES", 1024 * 1024)
+
+# Bearer token for the keystore over HTTP: /keys, /generate-keys?store=true,
+# hiding by key_id and extracting with a stored private key. Unset, those
+# requests are refused; stegolib and the CLI use the keystore directly.
+KEYSTORE_TOKEN = os.environ.get("STEGO_KEYSTORE_TOKEN") or None
+
+# ---------------- PROFILING ----------------
+# When set, a request carrying "X-Stego-Profile: 1" runs its job under
+# cProfile and the stats are written to a .prof file in this directory.
+# Unset (the default) ignores the header.
+PROFILE_DIR = os.environ.get("STEGO_PROFILE_DIR") or None
@@ -0,0 +1,202 @@
+import lzma
+import zlib
+
+from timing import stage
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# ---------------- PAYLOAD COMPRESSION ----------------
+# Payloads are compressed before encryption and the codec is recorded in
+# the header flags (see codec_flags). The codec is picked per payload:
+# nothing under MIN_SIZE, every available codec on small payloads (keeping
+# the smallest output), and for large ones a quick zlib probe on a sample
+# followed by the fastest good codec. A codec is only kept when it
+# actually shrinks the payload.
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODEC_ZSTD = 3
+
+CODEC_NAMES = {CODEC_NONE: "none", CODEC_ZLIB: "zlib", CODEC_LZMA: "lzma", CODEC_ZSTD: "zstd"}
+
+MIN_SIZE = 64
+SMALL_SIZE = 256 * 1024
+SAMPLE_SIZE = 64 * 1024
+
+# a zlib -1 probe that saves less than this fraction means "incompressible"
+MIN_SAVING = 0.05
+
+# largest piece of output a decompressor produces at once
+OUTPUT_CHUNK = 1024 * 1024
+
+
+def available_codecs():
+    return [CODEC_ZLIB, CODEC_LZMA] + ([CODEC_ZSTD] if zstandard else [])
+
+
+def compressor(codec, size):
+    """Return a streaming compressor with compress(data) and flush()."""
+    if codec == CODEC_ZLIB:
+        return zlib.compressobj(9)
+
+    if codec == CODEC_LZMA:
+        return lzma.LZMACompressor()
+
+    if codec == CODEC_ZSTD and zstandard:
+        return zstandard.ZstdCompressor(level=19 if size <= SMALL_SIZE else 6).compressobj()
+
+    raise ValueError(f"Unsupported compression codec {codec}")
+
+
+def decompressor(codec, emit):
+    """Return feed(data), which decompresses data and hands the output to
+    emit() in pieces of at most OUTPUT_CHUNK bytes. No piece is produced
+    before emit() has taken the previous one, so emit() can stop a
+    decompression bomb by raising."""
+    if codec == CODEC_ZLIB:
+        engine = zlib.decompressobj()
+
+        def feed(data):
+            while True:
+                piece = engine.decompress(data, OUTPUT_CHUNK)
+                emit(piece)
+                data = engine.unconsumed_tail
+
+                if not data and len(piece) < OUTPUT_CHUNK:
+                    return
+
+        return feed
+
+    if codec == CODEC_LZMA:
+        engine = lzma.LZMADecompressor()
+
+        def feed(data):
+            while not engine.eof:
+                piece = engine.decompress(data, OUTPUT_CHUNK)
+                data = b""
+                emit(piece)
+
+                if engine.needs_input:
+                    return
+
+        return feed
+
+    if codec == CODEC_ZSTD and zstandard:
+        return zstandard.ZstdDecompressor().stream_writer(_Sink(emit), write_size=OUTPUT_CHUNK).write
+
+    raise ValueError(f"Unsupported compression codec {codec}")
+
+
+class _Sink:
+    """File-like target for zstandard's stream_writer."""
+
+    def __init__(self, emit):
+        self.write = emit
+
+
+def _compress(codec, data):
+    engine = compressor(codec, len(data))
+    return engine.compress(data) + engine.flush()
+
+
+def candidate_codecs(size, sample):
+    """Codecs worth trying for a payload of `size` bytes starting with sample."""
+    if size < MIN_SIZE:
+        return []
+
+    if size <= SMALL_SIZE:
+        return available_codecs()
+
+    probe = sample[:SAMPLE_SIZE]
+
+    if len(zlib.compress(probe, 1)) > len(probe) * (1 - MIN_SAVING):
+        return []
+
+    # lzma is too slow for large payloads
+    return [CODEC_ZSTD if zstandard else CODEC_ZLIB]
+
+
+def compress_payload(data: bytes):
+    """Return (codec, data) with the smallest encoding of data."""
+    best = (CODEC_NONE, data)
+
+    with stage("compress", len(data)):
+        for codec in candidate_codecs(len(data), data):
+            packed = _compress(codec, data)
+
+            if len(packed) < len(best[1]):
+                best = (codec, packed)
+
+    return best
+
+
+def compress_file(src_path, dst_path, size):
+    """Compress src_path into dst_path. Small files go through
+    compress_payload; larger ones are streamed through the codec chosen
+    from the start of the file. Returns the codec, or CODEC_NONE (and leaves
+    dst_path unused) when compression does not help."""
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        sample = src.read(SMALL_SIZE)
+
+        if size <= SMALL_SIZE:
+            codec, packed = compress_payload(sample)
+            dst.write(packed)
+            return codec
+
+        codecs = candidate_codecs(size, sample)
+
+        if not codecs:
+            return CODEC_NONE
+
+        engine = compressor(codecs[0], size)
+        written = 0
+
+        with stage("compress", size):
+            chunk = sample
+
+            while chunk:
+                written += dst.write(engine.compress(chunk))
+                chunk = src.read(SMALL_SIZE)
+
+            written += dst.write(engine.flush())
+
+    return codecs[0] if written < size else CODEC_NONE
+
+
+def decompress_writer(codec, write, limit):
+    """Wrap write() so the bytes passed in are decompressed first. Raises
+    ValueError as soon as the output passes limit bytes; at most
+    OUTPUT_CHUNK bytes past the limit are ever decompressed."""
+    if codec == CODEC_NONE:
+        return write
+
+    total = 0
+
+    def emit(piece):
+        nonlocal total
+        total += len(piece)
+
+        if total > limit:
+            raise ValueError("Payload expands past the decompression limit")
+
+        write(piece)
+        return len(piece)
+
+    engine = decompressor(codec, emit)
+
+    def feed(data):
+        with stage("decompress", len(data)):
+            engine(data)
+
+    return feed
+
+
+def decompress_payload(codec, data: bytes, limit):
+    chunks = []
+    decompress_writer(codec, chunks.append, limit)(data)
+    return b"".join(chunks)
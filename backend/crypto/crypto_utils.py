@@ -1,25 +1,208 @@
 import hashlib
 import secrets
+import struct
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from pqcrypto.kem import ml_kem_512
 
-MAGIC = b"STEG"
+from timing import stage
+
+MAGIC = b"STEG"     # v1: body indices from the full-capacity LCG shuffle
+MAGIC_V2 = b"STG2"  # v2: lazy body indices, followed by a flags byte
+
+# Header flag bits. The low two bits hold the body embedding density - 1
+# (1-4 LSBs per sample); the header itself is always 1 LSB per sample.
+# FLAG_SEGMENTED marks a file payload in the segmented AEAD format below.
+# Bits 3-4 name the codec the plaintext was compressed with before
+# encryption (crypto.compression, 0 = none). FLAG_KEY_ID means the header
+# carries the recipient's key ID right after the flags byte.
+FLAG_DENSITY_MASK = 0x03
+FLAG_SEGMENTED = 0x04
+FLAG_CODEC_MASK = 0x18
+FLAG_CODEC_SHIFT = 3
+FLAG_KEY_ID = 0x20
+
+KNOWN_FLAGS = FLAG_DENSITY_MASK | FLAG_SEGMENTED | FLAG_CODEC_MASK | FLAG_KEY_ID
+
+KEY_ID_SIZE = 8
+
+def density_flags(density: int) -> int:
+    if not 1 <= density <= 4:
+        raise ValueError("Density must be between 1 and 4 bits per sample")
+    return density - 1
+
+def header_density(header) -> int:
+    return (header["flags"] & FLAG_DENSITY_MASK) + 1
+
+def codec_flags(codec: int) -> int:
+    return codec << FLAG_CODEC_SHIFT
+
+def header_codec(header) -> int:
+    return (header["flags"] & FLAG_CODEC_MASK) >> FLAG_CODEC_SHIFT
+
+def key_id_for(public_key: bytes) -> bytes:
+    return hashlib.sha256(public_key).digest()[:KEY_ID_SIZE]
 
 def derive_aes_key(shared_secret: bytes) -> bytes:
     return hashlib.sha256(shared_secret).digest()
 
 def aes_encrypt(data: bytes, key: bytes):
-    aes = AESGCM(key)
-    nonce = secrets.token_bytes(12)
-    ciphertext = aes.encrypt(nonce, data, None)
+    with stage("aes_encrypt", len(data)):
+        aes = AESGCM(key)
+        nonce = secrets.token_bytes(12)
+        ciphertext = aes.encrypt(nonce, data, None)
     return nonce, ciphertext
 
 def aes_decrypt(nonce: bytes, ciphertext: bytes, key: bytes):
+    with stage("aes_decrypt", len(ciphertext)):
+        aes = AESGCM(key)
+        return aes.decrypt(nonce, ciphertext, None)
+
+# ---------------- SEGMENTED AEAD ----------------
+# File payloads are encrypted as a run of independent AES-GCM segments of
+# SEGMENT_SIZE plaintext bytes each (the STREAM construction), so neither
+# side ever holds the whole plaintext. Segment i uses the nonce
+# header_nonce[:7] | i (4 bytes) | final (1 byte): reordering, dropping or
+# truncating segments fails authentication. An empty file is one empty
+# final segment.
+SEGMENT_SIZE = 64 * 1024
+TAG_SIZE = 16
+
+def segment_nonce(nonce: bytes, index: int, final: bool) -> bytes:
+    return nonce[:7] + struct.pack(">IB", index, final)
+
+def segmented_size(plain_len: int) -> int:
+    return plain_len + TAG_SIZE * max(1, -(-plain_len // SEGMENT_SIZE))
+
+def segmented_capacity(size: int) -> int:
+    """Largest plaintext whose segmented ciphertext fits in size bytes."""
+    full, rest = divmod(size, SEGMENT_SIZE + TAG_SIZE)
+    return full * SEGMENT_SIZE + max(0, rest - TAG_SIZE)
+
+def encrypt_segments(read, write, key: bytes) -> bytes:
+    """Encrypt the stream read(n) -> bytes into write(), segment by segment.
+    Returns the header nonce."""
     aes = AESGCM(key)
-    return aes.decrypt(nonce, ciphertext, None)
+    nonce = secrets.token_bytes(12)
+    index = 0
+    chunk = read(SEGMENT_SIZE)
+
+    while True:
+        following = read(SEGMENT_SIZE)
+        final = not following
+
+        with stage("aes_encrypt", len(chunk)):
+            sealed = aes.encrypt(segment_nonce(nonce, index, final), chunk, None)
+
+        write(sealed)
+
+        if final:
+            return nonce
+
+        chunk, index = following, index + 1
+
+def decrypt_segments(nonce: bytes, ciphertext, key: bytes, write):
+    """Authenticate and decrypt a segmented ciphertext buffer into write()."""
+    aes = AESGCM(key)
+    step = SEGMENT_SIZE + TAG_SIZE
+    total = len(ciphertext)
+
+    if total < TAG_SIZE:
+        raise ValueError("Truncated payload")
+
+    view = memoryview(ciphertext)
+
+    for index, start in enumerate(range(0, total, step)):
+        end = min(total, start + step)
+
+        with stage("aes_decrypt", end - start):
+            plain = aes.decrypt(segment_nonce(nonce, index, end == total), view[start:end], None)
+
+        write(plain)
+
+def check_public_key(public_key: bytes):
+    if len(public_key) != ml_kem_512.PUBLIC_KEY_SIZE:
+        raise ValueError(f"Public key must be {ml_kem_512.PUBLIC_KEY_SIZE} bytes (ML-KEM-512)")
+
+def check_private_key(private_key: bytes):
+    if len(private_key) != ml_kem_512.SECRET_KEY_SIZE:
+        raise ValueError(f"Private key must be {ml_kem_512.SECRET_KEY_SIZE} bytes (ML-KEM-512)")
+
+def is_key_pair(public_key: bytes, private_key: bytes) -> bool:
+    """Whether private_key decapsulates what public_key encapsulates; a
+    mismatched key yields another shared secret (implicit rejection)."""
+    kyber_ct, shared_secret = ml_kem_512.encrypt(public_key)
+    return ml_kem_512.decrypt(private_key, kyber_ct) == shared_secret
 
 def kyber_encapsulate(public_key: bytes):
-    return ml_kem_512.encrypt(public_key)
+    with stage("kyber_encaps"):
+        return ml_kem_512.encrypt(public_key)
 
 def kyber_decapsulate(private_key: bytes, ciphertext: bytes):
-    return ml_kem_512.decrypt(private_key, ciphertext)
\ No newline at end of file
+    with stage("kyber_decaps"):
+        return ml_kem_512.decrypt(private_key, ciphertext)
+
+# ---------------- PAYLOAD HEADER ----------------
+# MAGIC_V2 | flags (1) | [key_id (8)] | len(kyber_ct) (4) | kyber_ct | nonce (12) | len(ciphertext) (4)
+def build_header(kyber_ct: bytes, nonce: bytes, msg_len: int, flags: int = 0, key_id: bytes = None) -> bytes:
+    if key_id is not None:
+        flags |= FLAG_KEY_ID
+
+    return (
+        MAGIC_V2 +
+        bytes([flags]) +
+        (key_id or b"") +
+        struct.pack(">I", len(kyber_ct)) +
+        kyber_ct +
+        nonce +
+        struct.pack(">I", msg_len)
+    )
+
+def header_size(key_id: bool = False) -> int:
+    """Size of a v2 header carrying an ML-KEM-512 ciphertext."""
+    return len(build_header(
+        bytes(ml_kem_512.CIPHERTEXT_SIZE), bytes(12), 0, key_id=bytes(KEY_ID_SIZE) if key_id else None
+    ))
+
+def parse_header(read):
+    """Parse a payload header through read(n) -> n bytes.
+
+    Returns None when the magic does not match, otherwise a dict with the
+    header fields and its total size in bytes.
+    """
+    size = 0
+
+    def take(n):
+        nonlocal size
+        data = read(n)
+        if len(data) != n:
+            raise ValueError("Truncated header")
+        size += n
+        return data
+
+    magic = take(4)
+
+    if magic == MAGIC:
+        version, flags = 1, 0
+    elif magic == MAGIC_V2:
+        version, flags = 2, take(1)[0]
+    else:
+        return None
+
+    if flags & ~KNOWN_FLAGS:
+        raise ValueError("Unsupported header flags")
+
+    key_id = take(KEY_ID_SIZE) if flags & FLAG_KEY_ID else None
+    ct_len = struct.unpack(">I", take(4))[0]
+    kyber_ct = take(ct_len)
+    nonce = take(12)
+    msg_len = struct.unpack(">I", take(4))[0]
+
+    return {
+        "version": version,
+        "flags": flags,
+        "key_id": key_id,
+        "kyber_ct": kyber_ct,
+        "nonce": nonce,
+        "msg_len": msg_len,
+        "size": size,
+    }
@@ -1,10 +1,27 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from routes.stego_routes import router as stego_router
 from routes.key_routes import router as key_router
+from routes.metrics_routes import router as metrics_router
+from routes.job_routes import router as job_router
+from services.executor import shutdown_executor
+from services.jobs import expire_jobs_forever, drop_all_jobs
+
+
+@asynccontextmanager
+async def lifespan(app):
+    janitor = asyncio.create_task(expire_jobs_forever())
+    yield
+    janitor.cancel()
+    drop_all_jobs()
+    shutdown_executor()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,11 +29,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Stego-Profile-Dump"],
 )
 
 app.include_router(stego_router)
 app.include_router(key_router)
+app.include_router(metrics_router)
+app.include_router(job_router)
 
 @app.get("/")
 def root():
-    return {"message": "Quantum-Safe Multi-Media Steganography Backend Running"}
\ No newline at end of file
+    return {"message": "Quantum-Safe Multi-Media Steganography Backend Running"}
@@ -0,0 +1,105 @@
+import threading
+from bisect import bisect_left
+
+
+# ---------------- METRICS REGISTRY ----------------
+# A small Prometheus text-format registry, kept in the API process. Worker
+# jobs report their stages back with the result (see timing.run_timed), so
+# everything is recorded here on the event loop side.
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_metrics = {}   # name -> {"type", "help", "buckets", "series": {labels: value}}
+
+
+def _series(name, kind, help_text, labels, buckets=None):
+    metric = _metrics.setdefault(name, {
+        "type": kind,
+        "help": help_text,
+        "buckets": buckets,
+        "series": {},
+    })
+    return metric["series"], tuple(sorted(labels.items()))
+
+
+def inc_counter(name, help_text, labels, amount=1):
+    with _lock:
+        series, key = _series(name, "counter", help_text, labels)
+        series[key] = series.get(key, 0) + amount
+
+
+def set_gauge(name, help_text, labels, value):
+    with _lock:
+        series, key = _series(name, "gauge", help_text, labels)
+        series[key] = value
+
+
+def observe(name, help_text, labels, value, buckets=SECONDS_BUCKETS):
+    with _lock:
+        series, key = _series(name, "histogram", help_text, labels, buckets)
+        hist = series.get(key)
+
+        if hist is None:
+            hist = series[key] = {"counts": [0] * (len(buckets) + 1), "sum": 0.0}
+
+        hist["counts"][bisect_left(buckets, value)] += 1
+        hist["sum"] += value
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+
+    with _lock:
+        for name, metric in _metrics.items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+
+            for key, value in metric["series"].items():
+                if metric["type"] != "histogram":
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(metric["buckets"] + ("+Inf",), value["counts"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+
+                lines.append(f"{name}_sum{_format_labels(key)} {value['sum']}")
+                lines.append(f"{name}_count{_format_labels(key)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- STEGO METRICS ----------------
+
+def record_stages(endpoint, media, stages):
+    for stage_name, (seconds, nbytes) in stages.items():
+        labels = {"endpoint": endpoint, "media": media, "stage": stage_name}
+
+        observe("stego_stage_seconds", "Time spent per request stage.", labels, seconds)
+
+        if nbytes:
+            inc_counter("stego_stage_bytes_total", "Bytes processed per request stage.", labels, nbytes)
+
+
+def record_request(endpoint, media, status):
+    inc_counter(
+        "stego_requests_total",
+        "Completed stego requests by outcome.",
+        {"endpoint": endpoint, "media": media, "status": str(status)}
+    )
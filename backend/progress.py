@@ -0,0 +1,65 @@
+import json
+import os
+import time
+from contextvars import ContextVar
+
+
+# ---------------- JOB PROGRESS ----------------
+# Engines call report_progress(frames=..., bits_embedded=...) from their
+# main loops. Inside a job started by run_tracked the latest counters are
+# written to a small JSON file (at most every PROGRESS_INTERVAL seconds,
+# plus once at the end) that the API process polls; everywhere else the
+# call costs one ContextVar lookup. The file works the same whether the
+# job runs in a pool thread or a pool process.
+
+PROGRESS_INTERVAL = 0.5
+
+_reporter = ContextVar("stego_progress", default=None)
+
+
+def report_progress(**counters):
+    reporter = _reporter.get()
+
+    if reporter is not None:
+        reporter(counters)
+
+
+def _write_progress(path, counters):
+    tmp = path + ".tmp"
+
+    with open(tmp, "w") as f:
+        json.dump(counters, f)
+
+    os.replace(tmp, path)
+
+
+def run_tracked(progress_path, fn, *args):
+    """Run fn(*args) with report_progress writing to progress_path. Top
+    level so it can be shipped to pool workers."""
+    counters = {}
+    last = 0.0
+
+    def reporter(update):
+        nonlocal last
+        counters.update(update)
+        now = time.monotonic()
+
+        if now - last >= PROGRESS_INTERVAL:
+            last = now
+            _write_progress(progress_path, counters)
+
+    token = _reporter.set(reporter)
+
+    try:
+        return fn(*args)
+    finally:
+        _reporter.reset(token)
+        _write_progress(progress_path, counters)
+
+
+def read_progress(progress_path):
+    try:
+        with open(progress_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
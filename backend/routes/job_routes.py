@@ -0,0 +1,195 @@
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Request, UploadFile, File, Form
+from fastapi.responses import StreamingResponse, JSONResponse
+
+from scratch import remove_scratch
+from services.executor import PoolBusyError, JobTimeoutError
+from services.jobs import submit_job, get_job, job_progress, job_expires, drop_job, expire_jobs
+from services.stego_service import hide_payload, extract_payload, StegoError
+from routes.key_routes import keystore_denied
+from routes.stego_routes import (
+    error_body, error_response, hide_input_error, read_key, spool_upload, iter_file,
+    media_kind, remove_output, remove_extracted, job_memory
+)
+
+router = APIRouter()
+
+
+# ===========================
+# ASYNC JOBS
+# ===========================
+# POST /jobs/hide and /jobs/extract take the same fields as /sender/hide and
+# /receiver/extract but answer 202 with a job ID at once. GET /jobs/{id}
+# reports status and progress; once the job is done, its result (a stego
+# file, a recovered file or the message) stays available for
+# STEGO_JOB_RESULT_TTL seconds.
+
+def job_status(job):
+    body = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "created_at": job["created"],
+        "finished_at": job["finished"],
+        "expires_at": job_expires(job),
+        "progress": job_progress(job),
+    }
+
+    if job["status"] == "error":
+        if isinstance(job["error"], (StegoError, PoolBusyError, JobTimeoutError)):
+            status_code, error, _ = error_body(job["error"])
+        else:
+            # an unexpected failure in the job
+            status_code, error = 500, {"error": "Processing failed"}
+
+        body["error"] = {"code": status_code, **error}
+
+    elif job["status"] == "done":
+        result = job["result"]
+
+        if job["kind"] == "hide":
+            body["result"] = {
+                "url": f"/jobs/{job['id']}/result",
+                "media_type": result[1],
+                "size": os.path.getsize(result[0]),
+            }
+        elif "file" in result:
+            body["result"] = {"url": f"/jobs/{job['id']}/result", "size": os.path.getsize(result["file"])}
+        else:
+            body["result"] = result
+
+    return body
+
+
+async def spool_inputs(*uploads):
+    """Spool each upload (None stays None); on failure remove what was spooled."""
+    paths = []
+
+    try:
+        for upload in uploads:
+            paths.append(await spool_upload(upload) if upload is not None else None)
+    except BaseException:
+        for path in paths:
+            if path:
+                remove_scratch(path)
+        raise
+
+    return paths
+
+
+def accepted(kind, media, fn, args, inputs, discard, memory):
+    try:
+        job = submit_job(kind, media, fn, args, inputs, discard, memory)
+    except (PoolBusyError, StegoError) as e:
+        for path in inputs:
+            if path:
+                remove_scratch(path)
+
+        return error_response(e)
+
+    return JSONResponse(job_status(job), status_code=202, headers={"Location": f"/jobs/{job['id']}"})
+
+
+@router.post("/jobs/hide")
+async def submit_hide_job(
+    request: Request,
+    public_key: Optional[UploadFile] = File(None),
+    key_id: Optional[str] = Form(None),
+    cover_file: UploadFile = File(...),
+    message: Optional[str] = Form(None),
+    payload_file: Optional[UploadFile] = File(None),
+    density: int = Form(1)
+):
+    error = hide_input_error(public_key, key_id, message, payload_file)
+
+    if error is not None:
+        return error_response(error)
+
+    denied = keystore_denied(request) if key_id is not None else None
+
+    if denied is not None:
+        return denied
+
+    pk = await read_key(public_key)
+    filename = cover_file.filename.lower()
+    cover_path, payload_path = await spool_inputs(cover_file, payload_file)
+    memory = await job_memory(cover_path, filename, message, payload_path, density)
+
+    return accepted(
+        "hide", media_kind(filename), hide_payload,
+        (pk, cover_path, filename, message, density, payload_path, key_id),
+        [cover_path, payload_path], remove_output, memory
+    )
+
+
+@router.post("/jobs/extract")
+async def submit_extract_job(
+    request: Request,
+    private_key: Optional[UploadFile] = File(None),
+    key_id: Optional[str] = Form(None),
+    stego_file: UploadFile = File(...)
+):
+    denied = keystore_denied(request) if private_key is None else None
+
+    if denied is not None:
+        return denied
+
+    sk = await read_key(private_key)
+    filename = stego_file.filename.lower()
+    stego_path, = await spool_inputs(stego_file)
+    memory = await job_memory(stego_path, filename)
+
+    return accepted(
+        "extract", media_kind(filename), extract_payload,
+        (sk, stego_path, filename, key_id),
+        [stego_path], remove_extracted, memory
+    )
+
+
+@router.get("/jobs/{job_id}")
+async def read_job(job_id: str):
+    expire_jobs()
+    job = get_job(job_id)
+
+    if job is None:
+        return JSONResponse({"error": "Unknown or expired job"}, status_code=404)
+
+    return JSONResponse(job_status(job))
+
+
+@router.get("/jobs/{job_id}/result")
+async def read_job_result(job_id: str):
+    expire_jobs()
+    job = get_job(job_id)
+
+    if job is None:
+        return JSONResponse({"error": "Unknown or expired job"}, status_code=404)
+
+    if job["status"] != "done":
+        return JSONResponse({"error": "Job has no result", "status": job["status"]}, status_code=409)
+
+    result = job["result"]
+
+    if job["kind"] == "hide":
+        path, media_type = result
+    elif "file" in result:
+        path, media_type = result["file"], "application/octet-stream"
+    else:
+        return JSONResponse(result)
+
+    # the file stays until the job expires, so the result can be fetched again
+    return StreamingResponse(
+        iter_file(path, remove=False),
+        media_type=media_type,
+        headers={"Content-Length": str(os.path.getsize(path))}
+    )
+
+
+@router.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    if not drop_job(job_id):
+        return JSONResponse({"error": "Unknown or expired job"}, status_code=404)
+
+    return JSONResponse({"deleted": job_id})
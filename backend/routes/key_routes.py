@@ -1,15 +1,121 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, UploadFile, File, Request
 from fastapi.responses import JSONResponse
 from pqcrypto.kem import ml_kem_512
 import base64
+import hmac
+
+from config import KEYSTORE_TOKEN
+from services.keystore import store_key, load_public_key, list_keys, delete_key, KeyConflictError
 
 router = APIRouter()
 
+
+def keystore_denied(request: Request):
+    """The error response for a request that may not use the keystore, or
+    None. Access needs "Authorization: Bearer <STEGO_KEYSTORE_TOKEN>"; with
+    no token configured the keystore is closed to HTTP callers."""
+    if not KEYSTORE_TOKEN:
+        return JSONResponse({"error": "The keystore is disabled on this server"}, status_code=403)
+
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), KEYSTORE_TOKEN.encode()):
+        return JSONResponse(
+            {"error": "Keystore access needs a valid bearer token"},
+            status_code=401, headers={"WWW-Authenticate": "Bearer"}
+        )
+
+    return None
+
+
 @router.post("/generate-keys")
-def generate_keys():
+def generate_keys(request: Request, store: bool = False):
+    denied = keystore_denied(request) if store else None
+
+    if denied is not None:
+        return denied
+
     pk, sk = ml_kem_512.generate_keypair()
 
-    return JSONResponse({
+    body = {
         "public_key": base64.b64encode(pk).decode(),
         "private_key": base64.b64encode(sk).decode()
-    })
\ No newline at end of file
+    }
+
+    if store:
+        body["key_id"] = store_key(pk, sk)
+
+    return JSONResponse(body)
+
+
+# ===========================
+# KEYSTORE
+# ===========================
+# Stored keys are referenced by key_id in /sender/hide and
+# /receiver/extract instead of being uploaded with every request. Every
+# route here needs keystore access (see keystore_denied).
+
+@router.post("/keys")
+async def import_key(
+    request: Request,
+    public_key: UploadFile = File(...),
+    private_key: Optional[UploadFile] = File(None)
+):
+    denied = keystore_denied(request)
+
+    if denied is not None:
+        return denied
+
+    pk = await public_key.read()
+    sk = await private_key.read() if private_key is not None else None
+
+    try:
+        key_id = store_key(pk, sk)
+    except KeyConflictError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    return JSONResponse({"key_id": key_id})
+
+
+@router.get("/keys")
+def get_keys(request: Request):
+    denied = keystore_denied(request)
+
+    if denied is not None:
+        return denied
+
+    return JSONResponse({"keys": list_keys()})
+
+
+@router.get("/keys/{key_id}")
+def get_key(request: Request, key_id: str):
+    denied = keystore_denied(request)
+
+    if denied is not None:
+        return denied
+
+    try:
+        pk = load_public_key(key_id)
+    except KeyError:
+        return JSONResponse({"error": "Unknown key ID"}, status_code=404)
+
+    return JSONResponse({"key_id": key_id, "public_key": base64.b64encode(pk).decode()})
+
+
+@router.delete("/keys/{key_id}")
+def remove_key(request: Request, key_id: str):
+    denied = keystore_denied(request)
+
+    if denied is not None:
+        return denied
+
+    try:
+        delete_key(key_id)
+    except KeyError:
+        return JSONResponse({"error": "Unknown key ID"}, status_code=404)
+
+    return JSONResponse({"deleted": key_id})
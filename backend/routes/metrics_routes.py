@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from metrics import render
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
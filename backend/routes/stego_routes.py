@@ -1,372 +1,574 @@
-from fastapi import APIRouter, UploadFile, File, Form
+import asyncio
+import base64
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import List, Optional
+
+from fastapi import APIRouter, Request, UploadFile, File, Form
 from fastapi.responses import StreamingResponse, JSONResponse
-from io import BytesIO
-import struct
+from starlette.concurrency import run_in_threadpool
 
-from crypto.crypto_utils import *
-from stego.image_stego import *
-from stego.text_stego import *
+from config import PROFILE_DIR, BATCH_MAX_ITEMS, BATCH_CONCURRENCY
+from metrics import record_stages, record_request
+from scratch import create_scratch_file, remove_scratch
+from timing import run_timed, add_stage, server_timing
+from routes.key_routes import keystore_denied
+from services.admission import run_admitted, estimate_memory, MemoryBusyError, MemoryLimitError
+from services.executor import run_in_pool, PoolBusyError, WorkerLostError, JobTimeoutError
+from services.stego_service import hide_payload, extract_payload, probe_payload, cover_capacity, StegoError
 
 router = APIRouter()
 
+CHUNK_SIZE = 1 << 20
 
-# ===========================
-# UNIFIED SENDER (IN-MEMORY)
-# ===========================
-@router.post("/sender/hide")
-async def hide_file(
-    public_key: UploadFile = File(...),
-    cover_file: UploadFile = File(...),
-    message: str = Form(...)
-):
-    pk = await public_key.read()
-    file_bytes = await cover_file.read()
-    filename = cover_file.filename.lower()
 
-    kyber_ct, shared_secret = kyber_encapsulate(pk)
-    aes_key = derive_aes_key(shared_secret)
-    nonce, ciphertext = aes_encrypt(message.encode(), aes_key)
+def error_body(e):
+    """Return (status_code, body, headers) for a request-level failure."""
+    if isinstance(e, MemoryLimitError):
+        return 413, {"error": e.message, **e.details}, None
 
-    header = (
-        MAGIC +
-        struct.pack(">I", len(kyber_ct)) +
-        kyber_ct +
-        nonce +
-        struct.pack(">I", len(ciphertext))
-    )
+    if isinstance(e, MemoryBusyError):
+        return 429, {"error": "Server memory is committed, try again later"}, {"Retry-After": "5"}
 
-    # IMAGE MODE
-    if filename.endswith((".png", ".jpg", ".jpeg")):
-        from PIL import Image
+    if isinstance(e, StegoError):
+        return 400, {"error": e.message, **e.details}, None
 
-        img = Image.open(BytesIO(file_bytes)).convert("RGB")
-        pixels = [list(p) for p in img.getdata()]
+    if isinstance(e, WorkerLostError):
+        return 503, {"error": "Worker process died, try again"}, {"Retry-After": "1"}
 
-        header_bits = list(bytes_to_bits(header))
-        body_bits = list(bytes_to_bits(ciphertext))
+    if isinstance(e, PoolBusyError):
+        return 503, {"error": "Server busy, try again later"}, {"Retry-After": "5"}
 
-        used_bits = embed_sequential_lsb(pixels, header_bits, 0)
-        embed_random_lsb(pixels, body_bits, aes_key, used_bits)
+    return 504, {"error": "Processing timed out"}, None
 
-        img.putdata([tuple(p) for p in pixels])
 
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
+def error_response(e):
+    status_code, body, headers = error_body(e)
+    return JSONResponse(body, status_code=status_code, headers=headers)
 
-        return StreamingResponse(buffer, media_type="image/png")
 
-    # TEXT MODE
-    elif filename.endswith(".txt"):
-        original_text = file_bytes.decode("utf-8")
+# ---------------- STREAMING I/O ----------------
+# Covers are spooled to a scratch file in chunks and the workers get its
+# path; stego output is streamed back from its scratch file. Neither is ever
+# held whole in memory by the server process.
 
-        payload_bits = list(bytes_to_bits(header + ciphertext))
-        zwc_payload = bits_to_zwc(payload_bits)
+def _copy_upload(upload, path):
+    upload.file.seek(0)
 
-        stego_text = original_text + "\n\n" + zwc_payload
+    with open(path, "wb") as out:
+        shutil.copyfileobj(upload.file, out, CHUNK_SIZE)
 
-        return StreamingResponse(
-            BytesIO(stego_text.encode("utf-8")),
-            media_type="text/plain"
-        )
-        
-    elif filename.endswith(".wav"):
-        from stego.audio_stego import embed_audio, get_audio_capacity
-
-        payload_header = header
-        payload_body = ciphertext
-
-        header_size = len(header)
-        max_bytes = get_audio_capacity(file_bytes, header_size)
-
-        if len(ciphertext) > max_bytes:
-            return JSONResponse({
-                "error": "Message too large for this audio",
-                "max_bytes": max_bytes,
-                "ciphertext_bytes": len(ciphertext)
-            }, status_code=400)
-
-        try:
-            stego_audio = embed_audio(
-                file_bytes,
-                payload_header,
-                payload_body,
-                aes_key
-            )
-        except ValueError as e:
-            return JSONResponse({"error": str(e)}, status_code=400)
 
-        return StreamingResponse(
-            BytesIO(stego_audio),
-            media_type="audio/wav"
-        )
-    
-    elif filename.endswith(".mp3"):
-        from pydub import AudioSegment
-        from stego.audio_stego import embed_audio
-
-        try:
-            audio = AudioSegment.from_file(BytesIO(file_bytes), format="mp3")
-            wav_buffer = BytesIO()
-            audio.export(wav_buffer, format="wav")
-            wav_bytes = wav_buffer.getvalue()
-        except Exception:
-            return JSONResponse({"error": "MP3 conversion failed"}, status_code=400)
-
-        payload_header = header
-        payload_body = ciphertext
-
-        try:
-            stego_audio = embed_audio(
-                wav_bytes,
-                payload_header,
-                payload_body,
-                aes_key
-            )
-        except ValueError as e:
-            return JSONResponse({"error": str(e)}, status_code=400)
+async def spool_upload(upload):
+    suffix = os.path.splitext(upload.filename or "")[1].lower()
+    path = create_scratch_file(suffix, upload.size or 0)
 
-        return StreamingResponse(
-            BytesIO(stego_audio),
-            media_type="audio/wav"
-        )
-    
-    elif filename.endswith((".mp4", ".avi", ".mov", ".mkv")):
+    try:
+        await run_in_threadpool(_copy_upload, upload, path)
+    except BaseException:
+        remove_scratch(path)
+        raise
+
+    return path
 
-        import cv2
-        from stego.video_stego import embed_video, get_video_capacity
-        from tempfile import NamedTemporaryFile
 
-        # Convert uploaded video to AVI
-        with NamedTemporaryFile(delete=False, suffix=".mp4") as temp_in:
-            temp_in.write(file_bytes)
-            temp_in_path = temp_in.name
+def hide_input_error(public_key, key_id, message, payload_file):
+    """Return a StegoError when a hide request does not name exactly one
+    key and one payload."""
+    if (message is None) == (payload_file is None):
+        return StegoError("Send either a message or a payload_file")
 
-        cap = cv2.VideoCapture(temp_in_path)
+    if (public_key is None) == (key_id is None):
+        return StegoError("Send either a public_key or a key_id")
 
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    return None
 
-        fourcc = cv2.VideoWriter_fourcc(*"XVID")
 
-        with NamedTemporaryFile(delete=False, suffix=".avi") as temp_out:
-            temp_out_path = temp_out.name
+async def job_memory(path, filename, message=None, payload_path=None, density=1):
+    """Estimated peak memory of a job on the file at path; hide jobs also
+    pass their message or payload file and density."""
+    if payload_path is not None:
+        payload_bytes = os.path.getsize(payload_path)
+    elif message is not None:
+        payload_bytes = len(message.encode())
+    else:
+        payload_bytes = None
 
-        out = cv2.VideoWriter(temp_out_path, fourcc, fps, (width, height))
+    return await run_in_threadpool(estimate_memory, path, filename, payload_bytes, density)
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            out.write(frame)
 
-        cap.release()
-        out.release()
+async def read_key(upload):
+    return await upload.read() if upload is not None else None
 
-        with open(temp_out_path, "rb") as f:
-            avi_bytes = f.read()
 
-        # -------- CAPACITY CHECK --------
-        header_size = len(header)
+def iter_file(path, remove=True):
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+    finally:
+        if remove:
+            remove_scratch(path)
 
-        max_bytes = get_video_capacity(avi_bytes, header_size)
 
-        if len(ciphertext) > max_bytes:
-            return JSONResponse({
-                "error": "Message too large for this video",
-                "max_bytes": max_bytes,
-                "ciphertext_bytes": len(ciphertext)
-            }, status_code=400)
+def remove_output(result):
+    stego_path, _ = result
+    remove_scratch(stego_path)
 
-        # -------- EMBED VIDEO --------
-        try:
-            stego_video = embed_video(
-                avi_bytes,
-                header,
-                ciphertext,
-                aes_key
-            )
-        except ValueError as e:
-            return JSONResponse({"error": str(e)}, status_code=400)
 
-        return StreamingResponse(
-            BytesIO(stego_video),
-            media_type="video/x-msvideo"
+def remove_extracted(payload):
+    if "file" in payload:
+        remove_scratch(payload["file"])
+
+
+def discard_timed(remove):
+    """Adapt remove(result) to the (result, stages) pairs of run_timed."""
+    return lambda timed: remove(timed[0])
+
+
+async def iter_base64_field(line, path):
+    """Yield line as JSON with the file at path base64-streamed into a last
+    "data" field, so it is never held whole in memory. Removes the file."""
+    yield (json.dumps(line)[:-1] + ', "data": "').encode()
+
+    try:
+        with open(path, "rb") as f:
+            while chunk := await run_in_threadpool(f.read, 3 * CHUNK_SIZE):
+                yield base64.b64encode(chunk)
+    finally:
+        remove_scratch(path)
+
+    yield b'"}\n'
+
+
+# ---------------- INSTRUMENTATION ----------------
+# Each response carries its stage durations and byte counts in a
+# Server-Timing header; the same numbers feed the /metrics histograms.
+
+MEDIA_KINDS = {
+    ".png": "image", ".jpg": "image", ".jpeg": "image",
+    ".txt": "text",
+    ".wav": "audio", ".mp3": "audio",
+    ".mp4": "video", ".avi": "video", ".mov": "video", ".mkv": "video",
+}
+
+
+def media_kind(filename):
+    return MEDIA_KINDS.get(os.path.splitext(filename)[1], "other")
+
+
+def profile_target(request, endpoint):
+    if not PROFILE_DIR or request.headers.get("x-stego-profile") != "1":
+        return None
+
+    return os.path.join(PROFILE_DIR, f"{endpoint}-{uuid.uuid4().hex}.prof")
+
+
+async def timed_spool(upload, stages):
+    start = time.perf_counter()
+    path = await spool_upload(upload)
+    add_stage(stages, "upload", time.perf_counter() - start, os.path.getsize(path))
+    return path
+
+
+def finish(response, endpoint, media, stages, started, profile_path=None):
+    add_stage(stages, "total", time.perf_counter() - started)
+
+    record_stages(endpoint, media, stages)
+    record_request(endpoint, media, response.status_code)
+
+    response.headers["Server-Timing"] = server_timing(stages)
+
+    if profile_path and os.path.exists(profile_path):
+        response.headers["X-Stego-Profile-Dump"] = os.path.basename(profile_path)
+
+    return response
+
+
+# ===========================
+# UNIFIED SENDER (STREAMING)
+# ===========================
+@router.post("/sender/hide")
+async def hide_file(
+    request: Request,
+    public_key: Optional[UploadFile] = File(None),
+    key_id: Optional[str] = Form(None),
+    cover_file: UploadFile = File(...),
+    message: Optional[str] = Form(None),
+    payload_file: Optional[UploadFile] = File(None),
+    density: int = Form(1)
+):
+    started = time.perf_counter()
+    stages = {}
+
+    filename = cover_file.filename.lower()
+    media = media_kind(filename)
+
+    error = hide_input_error(public_key, key_id, message, payload_file)
+
+    if error is not None:
+        return finish(error_response(error), "hide", media, stages, started)
+
+    denied = keystore_denied(request) if key_id is not None else None
+
+    if denied is not None:
+        return finish(denied, "hide", media, stages, started)
+
+    pk = await read_key(public_key)
+
+    profile_path = profile_target(request, "hide")
+    cover_path = await timed_spool(cover_file, stages)
+    payload_path = None
+
+    try:
+        if payload_file is not None:
+            payload_path = await timed_spool(payload_file, stages)
+
+        memory = await job_memory(cover_path, filename, message, payload_path, density)
+
+        (stego_path, media_type), job_stages = await run_admitted(
+            memory, run_timed, profile_path, hide_payload, pk, cover_path, filename, message, density, payload_path, key_id,
+            discard=discard_timed(remove_output)
         )
+    except (StegoError, PoolBusyError, JobTimeoutError) as e:
+        return finish(error_response(e), "hide", media, stages, started)
+    finally:
+        remove_scratch(cover_path)
+        if payload_path:
+            remove_scratch(payload_path)
+
+    stages.update(job_stages)
+
+    response = StreamingResponse(
+        iter_file(stego_path),
+        media_type=media_type,
+        headers={"Content-Length": str(os.path.getsize(stego_path))}
+    )
 
-    else:
-        return JSONResponse({"error": "Unsupported file type"}, status_code=400)
+    return finish(response, "hide", media, stages, started, profile_path)
 
 
 # ===========================
-# UNIFIED RECEIVER (IN-MEMORY)
+# UNIFIED RECEIVER (STREAMING)
 # ===========================
 @router.post("/receiver/extract")
 async def extract_file(
-    private_key: UploadFile = File(...),
+    request: Request,
+    private_key: Optional[UploadFile] = File(None),
+    key_id: Optional[str] = Form(None),
     stego_file: UploadFile = File(...)
 ):
-    sk = await private_key.read()
-    file_bytes = await stego_file.read()
+    started = time.perf_counter()
+    stages = {}
+
     filename = stego_file.filename.lower()
+    media = media_kind(filename)
 
-    # IMAGE MODE
-    if filename.endswith((".png", ".jpg", ".jpeg")):
-        from PIL import Image
+    # without a key file the server would decrypt with a stored key
+    denied = keystore_denied(request) if private_key is None else None
 
-        img = Image.open(BytesIO(file_bytes)).convert("RGB")
-        pixels = [list(p) for p in img.getdata()]
+    if denied is not None:
+        return finish(denied, "extract", media, stages, started)
 
-        magic_bits, idx = extract_sequential_lsb(pixels, 4 * 8, 0)
-        magic = bits_to_bytes(magic_bits)
+    sk = await read_key(private_key)
+    profile_path = profile_target(request, "extract")
+    stego_path = await timed_spool(stego_file, stages)
 
-        if magic != MAGIC:
-            return JSONResponse({"error": "No hidden data found"}, status_code=400)
+    try:
+        memory = await job_memory(stego_path, filename)
 
-        ctlen_bits, idx = extract_sequential_lsb(pixels, 4 * 8, idx)
-        ct_len = struct.unpack(">I", bits_to_bytes(ctlen_bits))[0]
+        payload, job_stages = await run_admitted(
+            memory, run_timed, profile_path, extract_payload, sk, stego_path, filename, key_id,
+            discard=discard_timed(remove_extracted)
+        )
+    except (StegoError, PoolBusyError, JobTimeoutError) as e:
+        return finish(error_response(e), "extract", media, stages, started)
+    finally:
+        remove_scratch(stego_path)
+
+    stages.update(job_stages)
+
+    if "file" in payload:
+        response = StreamingResponse(
+            iter_file(payload["file"]),
+            media_type="application/octet-stream",
+            headers={
+                "Content-Length": str(os.path.getsize(payload["file"])),
+                "Content-Disposition": "attachment",
+            }
+        )
+    else:
+        response = JSONResponse(payload)
+
+    return finish(response, "extract", media, stages, started, profile_path)
 
-        kyber_ct_bits, idx = extract_sequential_lsb(pixels, ct_len * 8, idx)
-        kyber_ct = bits_to_bytes(kyber_ct_bits)
 
-        nonce_bits, idx = extract_sequential_lsb(pixels, 12 * 8, idx)
-        nonce = bits_to_bytes(nonce_bits)
+# ===========================
+# HEADER PROBE
+# ===========================
+@router.post("/receiver/probe")
+async def probe_file(
+    request: Request,
+    stego_file: UploadFile = File(...)
+):
+    started = time.perf_counter()
+    stages = {}
 
-        msglen_bits, idx = extract_sequential_lsb(pixels, 4 * 8, idx)
-        msg_len = struct.unpack(">I", bits_to_bytes(msglen_bits))[0]
+    filename = stego_file.filename.lower()
+    media = media_kind(filename)
+    profile_path = profile_target(request, "probe")
+    stego_path = await timed_spool(stego_file, stages)
 
-        shared_secret = kyber_decapsulate(sk, kyber_ct)
-        aes_key = derive_aes_key(shared_secret)
+    try:
+        header, job_stages = await run_in_pool(
+            run_timed, profile_path, probe_payload, stego_path, filename
+        )
+    except (StegoError, PoolBusyError, JobTimeoutError) as e:
+        return finish(error_response(e), "probe", media, stages, started)
+    finally:
+        remove_scratch(stego_path)
 
-        body_bits = extract_random_lsb(pixels, aes_key, idx, msg_len * 8)
-        ciphertext = bits_to_bytes(body_bits)
+    stages.update(job_stages)
 
-        plaintext = aes_decrypt(nonce, ciphertext, aes_key).decode()
+    if header is None:
+        body = {"stego": False}
+    else:
+        body = {
+            "stego": True,
+            "version": header["version"],
+            "flags": header["flags"],
+            "key_id": header["key_id"].hex() if header["key_id"] else None,
+            "header_bytes": header["size"],
+            "ciphertext_bytes": header["msg_len"],
+        }
 
-        return JSONResponse({"message": plaintext})
+    return finish(JSONResponse(body), "probe", media, stages, started, profile_path)
 
-    # TEXT MODE
-    elif filename.endswith(".txt"):
-        text = file_bytes.decode("utf-8")
-        bits = zwc_to_bits(text)
-        data = bits_to_bytes(bits)
 
-        if data[:4] != MAGIC:
-            return JSONResponse({"error": "No hidden data found"}, status_code=400)
+# ===========================
+# COVER CAPACITY
+# ===========================
+# Reads only the cover's container header, so clients can size a payload
+# before a full hide. Pass key_id (any value) to count the 8 header bytes
+# a keystore hide adds.
+@router.post("/capacity")
+async def capacity_file(
+    request: Request,
+    cover_file: UploadFile = File(...),
+    key_id: Optional[str] = Form(None)
+):
+    started = time.perf_counter()
+    stages = {}
 
-        idx = 4
-        ct_len = struct.unpack(">I", data[idx:idx+4])[0]
-        idx += 4
+    filename = cover_file.filename.lower()
+    media = media_kind(filename)
+    profile_path = profile_target(request, "capacity")
+    cover_path = await timed_spool(cover_file, stages)
 
-        kyber_ct = data[idx:idx+ct_len]
-        idx += ct_len
+    try:
+        body, job_stages = await run_in_pool(
+            run_timed, profile_path, cover_capacity, cover_path, filename, key_id is not None
+        )
+    except (StegoError, PoolBusyError, JobTimeoutError) as e:
+        return finish(error_response(e), "capacity", media, stages, started)
+    finally:
+        remove_scratch(cover_path)
 
-        nonce = data[idx:idx+12]
-        idx += 12
+    stages.update(job_stages)
 
-        msg_len = struct.unpack(">I", data[idx:idx+4])[0]
-        idx += 4
+    return finish(JSONResponse(body), "capacity", media, stages, started, profile_path)
 
-        ciphertext = data[idx:idx+msg_len]
 
-        shared_secret = kyber_decapsulate(sk, kyber_ct)
-        aes_key = derive_aes_key(shared_secret)
+# ===========================
+# BATCH ENDPOINTS
+# ===========================
+# Every file of a batch becomes its own pool job, at most BATCH_CONCURRENCY
+# at a time. Results stream back as NDJSON, one line per file in completion
+# order, tagged with the file's index in the upload. A failed item yields an
+# error line; it never fails the batch.
 
-        plaintext = aes_decrypt(nonce, ciphertext, aes_key).decode()
+def ndjson(obj):
+    return (json.dumps(obj) + "\n").encode()
 
-        return JSONResponse({"message": plaintext})
 
-    elif filename.endswith(".wav"):
-        from stego.audio_stego import extract_audio_header, extract_audio_body
+async def spool_all(uploads):
+    paths = []
 
-        # Step 1: extract sequential header bits
-        header_bits = extract_audio_header(file_bytes, 8192)
-        header_data = bits_to_bytes(header_bits)
+    try:
+        for upload in uploads:
+            paths.append(await spool_upload(upload))
+    except BaseException:
+        for path in paths:
+            remove_scratch(path)
+        raise
 
-        if header_data[:4] != MAGIC:
-            return JSONResponse({"error": "No hidden data found"}, status_code=400)
+    return paths
 
-        idx = 4
-        ct_len = struct.unpack(">I", header_data[idx:idx+4])[0]
-        idx += 4
 
-        kyber_ct = header_data[idx:idx+ct_len]
-        idx += ct_len
+async def run_batch_item(index, upload, path, semaphore, endpoint, fn, make_args, discard=None, message=None,
+                         density=1):
+    """Run fn(*make_args(path, filename)) for one batch item; message and
+    density are those of hide batches, for the memory estimate.
 
-        nonce = header_data[idx:idx+12]
-        idx += 12
+    Returns (line, result): line is the item's NDJSON fields, result is
+    None when the item failed.
+    """
+    started = time.perf_counter()
+    filename = (upload.filename or "").lower()
+    media = media_kind(filename)
+    line = {"index": index, "filename": upload.filename}
+    stages = {}
 
-        msg_len = struct.unpack(">I", header_data[idx:idx+4])[0]
-        idx += 4
+    try:
+        async with semaphore:
+            memory = await job_memory(path, filename, message, density=density)
 
-        # Step 2: derive AES key
-        shared_secret = kyber_decapsulate(sk, kyber_ct)
-        aes_key = derive_aes_key(shared_secret)
+            result, stages = await run_admitted(
+                memory, run_timed, None, fn, *make_args(path, filename), discard=discard
+            )
+        status = 200
+    except (StegoError, PoolBusyError, JobTimeoutError) as e:
+        status, body, _ = error_body(e)
+        line.update(status="error", code=status, **body)
+        result = None
+    except Exception:
+        # an unexpected failure; report it on this item instead of
+        # breaking the stream
+        status = 500
+        line.update(status="error", code=status, error="Processing failed")
+        result = None
+    finally:
+        remove_scratch(path)
+
+    add_stage(stages, "total", time.perf_counter() - started)
+    record_stages(endpoint, media, stages)
+    record_request(endpoint, media, status)
+
+    if result is not None:
+        line.update(status="ok", server_timing=server_timing(stages))
+
+    return line, result
+
+
+async def stream_batch(tasks, render, cleanup):
+    """Yield render(line, result) for each task as it finishes.
+
+    If the client goes away mid-stream, unfinished jobs are cancelled and
+    finished-but-unsent results are passed to cleanup.
+    """
+    sent = set()
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            line, result = await next_done
+            sent.add(line["index"])
+
+            async for chunk in render(line, result):
+                yield chunk
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled() and task.exception() is None:
+                line, result = task.result()
+                if result is not None and line["index"] not in sent:
+                    cleanup(result)
+
+
+@router.post("/sender/hide-batch")
+async def hide_batch(
+    request: Request,
+    public_key: Optional[UploadFile] = File(None),
+    key_id: Optional[str] = Form(None),
+    cover_files: List[UploadFile] = File(...),
+    message: str = Form(...),
+    density: int = Form(1)
+):
+    if len(cover_files) > BATCH_MAX_ITEMS:
+        return JSONResponse({"error": f"At most {BATCH_MAX_ITEMS} files per batch"}, status_code=400)
 
-        # Step 3: extract ciphertext randomly
-        body_bits = extract_audio_body(
-            file_bytes,
-            aes_key,
-            idx * 8,
-            msg_len * 8
-        )
+    if (public_key is None) == (key_id is None):
+        return JSONResponse({"error": "Send either a public_key or a key_id"}, status_code=400)
 
-        ciphertext = bits_to_bytes(body_bits)
+    denied = keystore_denied(request) if key_id is not None else None
 
-        # Step 4: decrypt
-        plaintext = aes_decrypt(nonce, ciphertext, aes_key).decode()
+    if denied is not None:
+        return denied
 
-        return JSONResponse({"message": plaintext})
-    
-    elif filename.endswith(".avi"):
+    pk = await read_key(public_key)
+    paths = await spool_all(cover_files)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
 
-        from stego.video_stego import extract_video
+    tasks = [
+        asyncio.ensure_future(run_batch_item(
+            i, upload, path, semaphore, "hide_batch", hide_payload,
+            lambda cover_path, filename: (pk, cover_path, filename, message, density, None, key_id),
+            discard=discard_timed(remove_output), message=message, density=density
+        ))
+        for i, (upload, path) in enumerate(zip(cover_files, paths))
+    ]
 
-        # Read first large chunk for header
-        header_bits_count = 65536
+    async def render(line, result):
+        if result is None:
+            yield ndjson(line)
+            return
 
-        header_data, _ = extract_video(
-            file_bytes,
-            b"temp",
-            header_bits_count,
-            0
-        )
+        stego_path, media_type = result
+        line.update(media_type=media_type, size=os.path.getsize(stego_path))
 
-        if header_data[:4] != MAGIC:
-            return JSONResponse({"error": "No hidden data found"}, status_code=400)
+        async for chunk in iter_base64_field(line, stego_path):
+            yield chunk
 
-        idx = 4
+    return StreamingResponse(
+        stream_batch(tasks, render, remove_output),
+        media_type="application/x-ndjson"
+    )
 
-        ct_len = struct.unpack(">I", header_data[idx:idx+4])[0]
-        idx += 4
 
-        kyber_ct = header_data[idx:idx+ct_len]
-        idx += ct_len
+@router.post("/receiver/extract-batch")
+async def extract_batch(
+    request: Request,
+    private_key: Optional[UploadFile] = File(None),
+    key_id: Optional[str] = Form(None),
+    stego_files: List[UploadFile] = File(...)
+):
+    if len(stego_files) > BATCH_MAX_ITEMS:
+        return JSONResponse({"error": f"At most {BATCH_MAX_ITEMS} files per batch"}, status_code=400)
 
-        nonce = header_data[idx:idx+12]
-        idx += 12
+    denied = keystore_denied(request) if private_key is None else None
 
-        msg_len = struct.unpack(">I", header_data[idx:idx+4])[0]
-        idx += 4
+    if denied is not None:
+        return denied
 
-        shared_secret = kyber_decapsulate(sk, kyber_ct)
-        aes_key = derive_aes_key(shared_secret)
+    sk = await read_key(private_key)
+    paths = await spool_all(stego_files)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
 
-        total_bits = (4 + 4 + ct_len + 12 + 4 + msg_len) * 8
+    tasks = [
+        asyncio.ensure_future(run_batch_item(
+            i, upload, path, semaphore, "extract_batch", extract_payload,
+            lambda stego_path, filename: (sk, stego_path, filename, key_id),
+            discard=discard_timed(remove_extracted)
+        ))
+        for i, (upload, path) in enumerate(zip(stego_files, paths))
+    ]
 
-        header_data, body_data = extract_video(
-            file_bytes,
-            aes_key,
-            idx * 8,
-            msg_len * 8
-        )
+    async def render(line, payload):
+        if payload is None or "message" in payload:
+            yield ndjson({**line, **(payload or {})})
+            return
 
-        ciphertext = body_data
+        # file payloads go out base64-encoded, like hide-batch stego files
+        line["size"] = os.path.getsize(payload["file"])
 
-        plaintext = aes_decrypt(nonce, ciphertext, aes_key).decode()
+        async for chunk in iter_base64_field(line, payload["file"]):
+            yield chunk
 
-        return JSONResponse({"message": plaintext})
+    return StreamingResponse(
+        stream_batch(tasks, render, remove_extracted),
+        media_type="application/x-ndjson"
+    )
 
-    else:
-        return JSONResponse({"error": "Unsupported file type"}, status_code=400)
\ No newline at end of file
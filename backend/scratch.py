@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from config import SCRATCH_DIR, SCRATCH_MEMORY_DIR, SCRATCH_MEMORY_MAX
+
+
+# ---------------- SCRATCH SPACE ----------------
+# Uploads, stego outputs and video temp files all live in uniquely named
+# per-job files. Files that fit go to tmpfs (/dev/shm) and never touch the
+# disk; larger ones fall back to SCRATCH_DIR or the system temp dir.
+
+def _scratch_root(size_hint):
+    if SCRATCH_MEMORY_DIR and size_hint <= SCRATCH_MEMORY_MAX:
+        try:
+            free = shutil.disk_usage(SCRATCH_MEMORY_DIR).free
+        except OSError:
+            free = 0
+
+        # leave headroom for the other jobs sharing the tmpfs
+        if free >= 2 * size_hint:
+            return SCRATCH_MEMORY_DIR
+
+    return SCRATCH_DIR
+
+
+def create_scratch_file(suffix, size_hint=0):
+    """Create an empty scratch file and return its path. The caller owns it."""
+    fd, path = tempfile.mkstemp(prefix="stego-", suffix=suffix, dir=_scratch_root(size_hint))
+    os.close(fd)
+    return path
+
+
+def remove_scratch(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def scratch_path(suffix, size_hint=0):
+    """Yield a fresh scratch path and delete it on exit."""
+    path = create_scratch_file(suffix, size_hint)
+
+    try:
+        yield path
+    finally:
+        remove_scratch(path)
+
+
+@contextmanager
+def scratch_output(suffix, size_hint=0):
+    """Yield a fresh scratch path that is handed on to the caller on success
+    and deleted only if the block raises."""
+    path = create_scratch_file(suffix, size_hint)
+
+    try:
+        yield path
+    except BaseException:
+        remove_scratch(path)
+        raise
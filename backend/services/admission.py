@@ -0,0 +1,230 @@
+import asyncio
+import os
+import wave
+from collections import deque
+
+from config import MEMORY_BUDGET, ADMISSION_WAIT, ADMISSION_QUEUE, VIDEO_WORKERS
+from metrics import set_gauge, inc_counter
+from crypto.crypto_utils import header_density
+from stego.cache import cover_cache
+from stego.indices import plan_memory
+from services.executor import run_in_pool, PoolBusyError
+from services.stego_service import StegoError, probe_payload
+
+
+class MemoryBusyError(PoolBusyError):
+    """The job's memory estimate did not fit the free budget in time."""
+
+
+class MemoryLimitError(StegoError):
+    """The job's memory estimate exceeds the whole budget."""
+
+    def __init__(self, estimate):
+        super().__init__("File needs more memory than this server allows", {
+            "estimated_bytes": estimate,
+            "memory_budget_bytes": MEMORY_BUDGET
+        })
+
+
+# ---------------- COST ESTIMATES ----------------
+# Peak memory of one job, from metadata that costs a header read: PIL image
+# size, WAV frame count, container frame count x width x height. The
+# multipliers count the decoded copies each engine holds at once (image:
+# decoded cover, writable copy, PNG encoder input). Video streams frames,
+# so only covers the cover cache would keep are charged in full.
+# The embed plan (hide and extract alike) is charged per entry with
+# plan_memory; extraction reads the payload size and density from the
+# header with probe_payload. That runs on the event loop, so it never
+# decodes a whole image: a cover the PNG row reader cannot probe is
+# charged without a plan, and the job reports what it finds.
+
+JOB_BASE_BYTES = 8 * 1024 * 1024
+IMAGE_COPIES = 3
+AUDIO_COPIES = 2
+MP3_PCM_RATIO = 10
+VIDEO_FRAMES_HELD = 4
+
+
+def _image_bytes(path):
+    from PIL import Image
+
+    with Image.open(path) as img:
+        width, height = img.size
+
+    return width * height * 3 * IMAGE_COPIES
+
+
+def _wav_bytes(path):
+    with wave.open(path, "rb") as wf:
+        return wf.getnframes() * wf.getnchannels() * wf.getsampwidth() * AUDIO_COPIES
+
+
+def _video_bytes(path):
+    from stego.video_io import open_capture, read_metadata
+    from stego.video_shards import CHUNK_FRAMES, SLOTS_PER_WORKER
+
+    with open_capture(path) as cap:
+        meta = read_metadata(cap)
+
+    frame_size = meta["width"] * meta["height"] * 3
+    raw_size = max(0, meta["frame_count"]) * frame_size
+    held = frame_size * VIDEO_FRAMES_HELD
+
+    if cover_cache.fits(raw_size):
+        held += raw_size
+
+    if VIDEO_WORKERS > 1:
+        held += VIDEO_WORKERS * SLOTS_PER_WORKER * CHUNK_FRAMES * frame_size
+
+    return held
+
+
+def _payload_plan(path, filename):
+    header = probe_payload(path, filename, decode=False)
+
+    if header is None:
+        return 0
+
+    return plan_memory(header["msg_len"], header_density(header))
+
+
+def estimate_memory(path, filename, payload_bytes=None, density=1):
+    """Estimate the peak bytes a hide (payload_bytes given) or extract job
+    on the file at path holds. Unreadable files get the base cost; the job
+    itself reports why they are unusable."""
+    try:
+        if filename.endswith((".png", ".jpg", ".jpeg")):
+            cover = _image_bytes(path)
+        elif filename.endswith(".wav"):
+            cover = _wav_bytes(path)
+        elif filename.endswith(".mp3"):
+            cover = os.path.getsize(path) * MP3_PCM_RATIO * AUDIO_COPIES
+        elif filename.endswith((".mp4", ".avi", ".mov", ".mkv")):
+            cover = _video_bytes(path)
+        else:
+            # text covers are rewritten in place, with no plan
+            return JOB_BASE_BYTES + os.path.getsize(path) + (payload_bytes or 0)
+    except Exception:
+        cover = 0
+
+    if payload_bytes is not None:
+        plan = plan_memory(payload_bytes, density)
+    else:
+        try:
+            plan = _payload_plan(path, filename)
+        except Exception:
+            plan = 0
+
+    return JOB_BASE_BYTES + cover + plan
+
+
+# ---------------- MEMORY BUDGET ----------------
+# Reservations are granted in arrival order, so a large job is not starved
+# by a stream of small ones. Everything runs on the event loop; release()
+# is called from the pool future's done callback.
+
+_reserved = 0
+_reservations = 0
+_waiters = deque()    # (nbytes, future)
+
+
+def _publish():
+    set_gauge("stego_memory_budget_bytes", "Memory budget for admitted jobs.", {}, MEMORY_BUDGET)
+    set_gauge("stego_memory_reserved_bytes", "Estimated memory reserved by admitted jobs.", {}, _reserved)
+    set_gauge("stego_memory_reservations", "Jobs holding a memory reservation.", {}, _reservations)
+    set_gauge("stego_admission_waiting", "Jobs waiting for memory budget.", {}, len(_waiters))
+
+
+_publish()
+
+
+def _reject(reason):
+    inc_counter("stego_admission_rejected_total", "Jobs rejected by admission control.", {"reason": reason})
+
+
+def _grant(nbytes):
+    global _reserved, _reservations
+    _reserved += nbytes
+    _reservations += 1
+
+
+def _wake():
+    while _waiters and _reserved + _waiters[0][0] <= MEMORY_BUDGET:
+        nbytes, future = _waiters.popleft()
+
+        if not future.done():
+            _grant(nbytes)
+            future.set_result(None)
+
+    _publish()
+
+
+def release(nbytes):
+    global _reserved, _reservations
+
+    if not nbytes or MEMORY_BUDGET <= 0:
+        return
+
+    _reserved -= nbytes
+    _reservations -= 1
+    _wake()
+
+
+def check_fits(nbytes):
+    """Raise MemoryLimitError if nbytes could never be reserved."""
+    if MEMORY_BUDGET > 0 and nbytes > MEMORY_BUDGET:
+        _reject("too_large")
+        raise MemoryLimitError(nbytes)
+
+
+async def reserve(nbytes, wait=ADMISSION_WAIT):
+    """Reserve nbytes of the budget, waiting up to wait seconds (None: no
+    limit and no ADMISSION_QUEUE cap, for callers that bound their own
+    queue). Raises MemoryLimitError or MemoryBusyError."""
+    if not nbytes or MEMORY_BUDGET <= 0:
+        return
+
+    check_fits(nbytes)
+
+    if not _waiters and _reserved + nbytes <= MEMORY_BUDGET:
+        _grant(nbytes)
+        _publish()
+        return
+
+    if wait is not None and (wait <= 0 or len(_waiters) >= ADMISSION_QUEUE):
+        _reject("busy")
+        raise MemoryBusyError()
+
+    future = asyncio.get_running_loop().create_future()
+    _waiters.append((nbytes, future))
+    _publish()
+
+    try:
+        await asyncio.wait_for(asyncio.shield(future), wait)
+    except asyncio.TimeoutError:
+        _withdraw(nbytes, future)
+        _reject("timeout")
+        raise MemoryBusyError()
+    except asyncio.CancelledError:
+        _withdraw(nbytes, future)
+        raise
+
+
+def _withdraw(nbytes, future):
+    if future.done():
+        # granted while the waiter was giving up
+        release(nbytes)
+        return
+
+    future.cancel()
+    _waiters.remove((nbytes, future))
+    _wake()
+
+
+async def run_admitted(memory, fn, *args, wait=ADMISSION_WAIT, **kwargs):
+    """run_in_pool(fn, *args, **kwargs) once memory bytes are reserved. The
+    reservation is held until the worker finishes, even if the caller
+    stops waiting first."""
+    await reserve(memory, wait)
+
+    return await run_in_pool(fn, *args, on_finish=lambda: release(memory), **kwargs)
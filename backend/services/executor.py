@@ -0,0 +1,125 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import EXECUTOR_KIND, POOL_SIZE, QUEUE_SIZE, JOB_TIMEOUT
+
+
+class PoolBusyError(Exception):
+    """Every worker is busy and the wait queue is full."""
+
+
+class WorkerLostError(PoolBusyError):
+    """A worker process died during the job; the pool has been replaced."""
+
+
+class JobTimeoutError(Exception):
+    """The job did not finish within its timeout."""
+
+
+_executor = None
+_in_flight = 0
+
+
+def get_executor():
+    global _executor
+
+    if _executor is None:
+        if EXECUTOR_KIND == "thread":
+            _executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="stego")
+        elif EXECUTOR_KIND == "process":
+            _executor = ProcessPoolExecutor(max_workers=POOL_SIZE)
+        else:
+            raise ValueError(f"Unknown STEGO_EXECUTOR: {EXECUTOR_KIND}")
+
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _replace_broken(broken):
+    """Swap out a pool whose worker died. Every job that was on it fails
+    with BrokenProcessPool, so only the first caller to notice rebuilds."""
+    global _executor
+
+    if _executor is broken:
+        broken.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _release(_future):
+    global _in_flight
+    _in_flight -= 1
+
+
+async def run_in_pool(fn, *args, discard=None, timeout=JOB_TIMEOUT, on_finish=None):
+    """Run fn(*args) on the worker pool without blocking the event loop.
+
+    At most POOL_SIZE + QUEUE_SIZE jobs are admitted at once. A job that
+    times out keeps its slot until the worker actually finishes, so the
+    bound holds even though a running job cannot be interrupted.
+
+    The caller waits at most timeout seconds (JOB_TIMEOUT by default).
+    If the caller gives up (timeout or disconnect) before the job finishes,
+    discard(result) is called on the late result, so jobs that hand back
+    scratch files do not leak them.
+
+    on_finish() is called once the worker is done with the job, whether or
+    not the caller still waits for it (or at once if it is rejected).
+
+    If a worker process dies (OOM kill, segfault), the pool is replaced
+    and the jobs it held raise WorkerLostError.
+    """
+    global _in_flight
+
+    if _in_flight >= POOL_SIZE + QUEUE_SIZE:
+        if on_finish is not None:
+            on_finish()
+        raise PoolBusyError()
+
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+
+    try:
+        future = loop.run_in_executor(executor, fn, *args)
+    except BrokenProcessPool:
+        _replace_broken(executor)
+
+        if on_finish is not None:
+            on_finish()
+        raise WorkerLostError()
+
+    _in_flight += 1
+    future.add_done_callback(_release)
+
+    if on_finish is not None:
+        future.add_done_callback(lambda _future: on_finish())
+
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+    except BrokenProcessPool:
+        _replace_broken(executor)
+        raise WorkerLostError()
+    except asyncio.TimeoutError:
+        _discard_late(future, discard)
+        raise JobTimeoutError()
+    except asyncio.CancelledError:
+        _discard_late(future, discard)
+        raise
+
+
+def _discard_late(future, discard):
+    if discard is None:
+        return
+
+    def on_done(f):
+        if not f.cancelled() and f.exception() is None:
+            discard(f.result())
+
+    future.add_done_callback(on_done)
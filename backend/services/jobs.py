@@ -0,0 +1,164 @@
+import asyncio
+import time
+import uuid
+
+from config import JOBS_MAX, JOBS_CONCURRENCY, ASYNC_JOB_TIMEOUT, JOB_RESULT_TTL
+from metrics import record_stages, record_request
+from progress import run_tracked, read_progress
+from scratch import create_scratch_file, remove_scratch
+from timing import run_timed, add_stage
+from services.admission import run_admitted, check_fits, MemoryLimitError
+from services.executor import PoolBusyError, JobTimeoutError
+from services.stego_service import StegoError
+
+
+class JobQueueFullError(PoolBusyError):
+    """JOBS_MAX jobs are already queued or running."""
+
+
+# ---------------- JOB REGISTRY ----------------
+# Jobs live in this process only: a dict of records, each run by an asyncio
+# task that waits for a JOBS_CONCURRENCY slot and then for the worker pool.
+# Workers report progress through a per-job scratch file (see progress.py).
+# Finished jobs keep their result for JOB_RESULT_TTL seconds; expire_jobs()
+# then drops the record and its result files.
+
+_jobs = {}
+_slots = asyncio.Semaphore(JOBS_CONCURRENCY)
+
+
+def _unfinished():
+    return sum(job["status"] in ("queued", "running") for job in _jobs.values())
+
+
+def submit_job(kind, media, fn, args, inputs, discard, memory=0):
+    """Queue fn(*args) as a job and return its record.
+
+    inputs are scratch files the job owns and deletes when it ends;
+    discard(result) releases a result's scratch files. The job waits in
+    the queue until memory bytes of the admission budget are free.
+    """
+    check_fits(memory)
+
+    if _unfinished() >= JOBS_MAX:
+        raise JobQueueFullError()
+
+    job = {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "media": media,
+        "status": "queued",
+        "created": time.time(),
+        "finished": None,
+        "progress_path": create_scratch_file(".progress"),
+        "progress": {},
+        "result": None,
+        "error": None,
+        "discard": discard,
+    }
+
+    _jobs[job["id"]] = job
+    job["task"] = asyncio.ensure_future(_run(job, fn, args, inputs, memory))
+
+    return job
+
+
+async def _run(job, fn, args, inputs, memory):
+    started = time.perf_counter()
+    stages = {}
+    status = 200
+
+    try:
+        async with _slots:
+            job["status"] = "running"
+
+            job["result"], stages = await run_admitted(
+                memory, run_tracked, job["progress_path"], run_timed, None, fn, *args,
+                wait=None, discard=lambda result: job["discard"](result[0]), timeout=ASYNC_JOB_TIMEOUT
+            )
+
+        job["status"] = "done"
+    except asyncio.CancelledError:
+        job["status"] = "cancelled"
+        status = 499
+        raise
+    except Exception as e:
+        job["status"] = "error"
+        job["error"] = e
+        status = _status_of(e)
+    finally:
+        job["finished"] = time.time()
+        job["progress"] = read_progress(job["progress_path"])
+        remove_scratch(job["progress_path"])
+
+        for path in inputs:
+            if path:
+                remove_scratch(path)
+
+        add_stage(stages, "total", time.perf_counter() - started)
+        record_stages(job["kind"] + "_job", job["media"], stages)
+        record_request(job["kind"] + "_job", job["media"], status)
+
+
+def _status_of(e):
+    if isinstance(e, MemoryLimitError):
+        return 413
+    if isinstance(e, StegoError):
+        return 400
+    if isinstance(e, PoolBusyError):
+        return 503
+    if isinstance(e, JobTimeoutError):
+        return 504
+    return 500
+
+
+def get_job(job_id):
+    return _jobs.get(job_id)
+
+
+def job_progress(job):
+    if job["status"] in ("queued", "running"):
+        return read_progress(job["progress_path"])
+
+    return job["progress"]
+
+
+def job_expires(job):
+    return job["finished"] + JOB_RESULT_TTL if job["finished"] else None
+
+
+def drop_job(job_id):
+    """Forget a job, cancelling it if unfinished and deleting its result."""
+    job = _jobs.pop(job_id, None)
+
+    if job is None:
+        return False
+
+    if not job["task"].done():
+        job["task"].cancel()
+    elif job["result"] is not None:
+        job["discard"](job["result"])
+
+    return True
+
+
+def expire_jobs(now=None):
+    now = time.time() if now is None else now
+
+    for job in list(_jobs.values()):
+        expires = job_expires(job)
+
+        if expires is not None and expires <= now:
+            drop_job(job["id"])
+
+
+def drop_all_jobs():
+    for job_id in list(_jobs):
+        drop_job(job_id)
+
+
+async def expire_jobs_forever(interval=60):
+    while True:
+        # at least a second, so a zero TTL does not spin the event loop
+        await asyncio.sleep(max(1, min(interval, JOB_RESULT_TTL)))
+        expire_jobs()
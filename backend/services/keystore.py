@@ -0,0 +1,205 @@
+import base64
+import functools
+import hashlib
+import json
+import os
+import re
+import secrets
+import tempfile
+import time
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from config import KEYSTORE_DIR, KEYSTORE_SECRET, KEY_CACHE_BYTES
+from crypto.crypto_utils import key_id_for, check_public_key, check_private_key, is_key_pair
+from stego.cache import LRUCache
+
+
+# ---------------- KEYSTORE ----------------
+# One JSON file per key pair, named by its key ID (hex of the first bytes
+# of SHA-256 over the public key). Private keys are sealed with AES-GCM
+# under a master key: derived with scrypt from STEGO_KEYSTORE_SECRET when
+# it is set, else a random key file created next to the keys. Decoded keys
+# are kept in a per-process LRU keyed by the file's identity, so a key
+# deleted or replaced by another process is never served stale.
+
+KEY_ID_PATTERN = re.compile(r"[0-9a-f]{16}")
+
+CREATE_WAIT_STEPS = 100
+CREATE_WAIT_STEP = 0.01
+
+key_cache = LRUCache(KEY_CACHE_BYTES)
+
+
+def _key_path(key_id):
+    if not isinstance(key_id, str) or not KEY_ID_PATTERN.fullmatch(key_id):
+        raise KeyError(key_id)
+
+    return os.path.join(KEYSTORE_DIR, key_id + ".key")
+
+
+def _write_private(path, data):
+    os.makedirs(KEYSTORE_DIR, mode=0o700, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=KEYSTORE_DIR, suffix=".tmp")
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _create_once(path, size):
+    """Return the contents of path, first filling it with size random bytes
+    if it does not exist. O_EXCL makes exactly one of several racing worker
+    processes the writer; the others read back what it wrote."""
+    os.makedirs(KEYSTORE_DIR, mode=0o700, exist_ok=True)
+
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, "wb") as f:
+            f.write(secrets.token_bytes(size))
+
+    # the winner may still be writing
+    for _ in range(CREATE_WAIT_STEPS):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        if len(data) == size:
+            return data
+
+        time.sleep(CREATE_WAIT_STEP)
+
+    raise OSError(f"Keystore file {path} is incomplete")
+
+
+@functools.lru_cache(maxsize=1)
+def _master_key():
+    if KEYSTORE_SECRET:
+        salt = _create_once(os.path.join(KEYSTORE_DIR, "salt"), 16)
+        return hashlib.scrypt(KEYSTORE_SECRET.encode(), salt=salt, n=1 << 14, r=8, p=1, dklen=32)
+
+    return _create_once(os.path.join(KEYSTORE_DIR, "master.key"), 32)
+
+
+class KeyConflictError(ValueError):
+    """A different private key is already stored for the public key."""
+
+
+def store_key(public_key: bytes, private_key: bytes = None) -> str:
+    """Save a key pair (or a bare public key) and return its key ID.
+
+    Raises ValueError for keys that are not ML-KEM-512 or a private key
+    that does not belong to the public key. Storing a bare public key
+    keeps a private key already stored for it; replacing that private key
+    with a different one raises KeyConflictError.
+    """
+    check_public_key(public_key)
+
+    if private_key is not None:
+        check_private_key(private_key)
+
+        if not is_key_pair(public_key, private_key):
+            raise ValueError("Private key does not belong to the public key")
+
+    key_id = key_id_for(public_key).hex()
+    path = _key_path(key_id)
+    record = {"public_key": base64.b64encode(public_key).decode()}
+
+    try:
+        with open(path, "rb") as f:
+            stored = json.load(f).get("private_key")
+    except FileNotFoundError:
+        stored = None
+
+    if private_key is None:
+        if stored is not None:
+            record["private_key"] = stored
+    elif stored is not None:
+        sealed = base64.b64decode(stored)
+
+        if AESGCM(_master_key()).decrypt(sealed[:12], sealed[12:], key_id.encode()) != private_key:
+            raise KeyConflictError("A different private key is already stored for this public key")
+
+        return key_id
+    else:
+        nonce = secrets.token_bytes(12)
+        sealed = AESGCM(_master_key()).encrypt(nonce, private_key, key_id.encode())
+        record["private_key"] = base64.b64encode(nonce + sealed).decode()
+
+    _write_private(path, json.dumps(record).encode())
+
+    return key_id
+
+
+def _load(key_id):
+    """Return (public_key, private_key or None); KeyError when unknown."""
+    path = _key_path(key_id)
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        raise KeyError(key_id)
+
+    cache_key = (key_id, st.st_ino, st.st_mtime_ns)
+    cached = key_cache.get(cache_key)
+
+    if cached is not None:
+        return cached
+
+    with open(path, "rb") as f:
+        record = json.load(f)
+
+    public_key = base64.b64decode(record["public_key"])
+    private_key = None
+
+    if "private_key" in record:
+        sealed = base64.b64decode(record["private_key"])
+        private_key = AESGCM(_master_key()).decrypt(sealed[:12], sealed[12:], key_id.encode())
+
+    entry = (public_key, private_key)
+    key_cache.put(cache_key, entry, len(public_key) + len(private_key or b""))
+
+    return entry
+
+
+def load_public_key(key_id: str) -> bytes:
+    return _load(key_id)[0]
+
+
+def load_private_key(key_id: str) -> bytes:
+    private_key = _load(key_id)[1]
+
+    if private_key is None:
+        raise KeyError(key_id)
+
+    return private_key
+
+
+def list_keys():
+    if not os.path.isdir(KEYSTORE_DIR):
+        return []
+
+    keys = []
+
+    for name in sorted(os.listdir(KEYSTORE_DIR)):
+        key_id, ext = os.path.splitext(name)
+
+        if ext == ".key" and KEY_ID_PATTERN.fullmatch(key_id):
+            with open(os.path.join(KEYSTORE_DIR, name), "rb") as f:
+                keys.append({"key_id": key_id, "private": "private_key" in json.load(f)})
+
+    return keys
+
+
+def delete_key(key_id: str):
+    try:
+        os.remove(_key_path(key_id))
+    except FileNotFoundError:
+        raise KeyError(key_id)
@@ -0,0 +1,437 @@
+import lzma
+import mmap
+import os
+import struct
+import wave
+import zlib
+
+from PIL import UnidentifiedImageError
+from cryptography.exceptions import InvalidTag
+from pqcrypto.kem import ml_kem_512
+
+from config import TEXT_RADIX, COMPRESSION_ENABLED, DECOMPRESS_LIMIT, VIDEO_WORKERS, PLAN_MEMORY_MAX
+from crypto.compression import *
+from crypto.crypto_utils import *
+from stego.image_stego import *
+from stego.text_stego import *
+from scratch import scratch_path, scratch_output
+from stego.cache import info_cache, file_digest, INFO_ENTRY_BYTES
+from stego.indices import plan_memory, PLAN_BYTES_PER_ENTRY
+from services.keystore import load_public_key, load_private_key
+from timing import stage
+
+
+# What a truncated or foreign file raises while its header is read: it
+# carries no payload rather than being a server fault.
+UNREADABLE_ERRORS = (ValueError, OSError, EOFError, struct.error, wave.Error, UnidentifiedImageError)
+
+
+class StegoError(Exception):
+    """A request-level failure reported to the client as a 400 response."""
+
+    def __init__(self, message, details=None):
+        super().__init__(message, details)
+        self.message = message
+        self.details = details or {}
+
+    def __str__(self):
+        return self.message
+
+
+# ===========================
+# UNIFIED SENDER
+# ===========================
+def hide_payload(pk: bytes, cover_path: str, filename: str, message: str, density: int = 1,
+                 payload_path: str = None, key_id: str = None):
+    """Encrypt message (or the file at payload_path) for pk and hide it in
+    the cover file.
+
+    With a key_id instead of pk the public key comes from the keystore and
+    the header records the key ID, so the receiver can find its private key.
+
+    density is the number of LSBs (1-4) each image, audio or video sample
+    carries; it is recorded in the header and ignored for text. A file
+    payload is encrypted segment by segment into a scratch file, which the
+    embedder reads through a memory map.
+
+    Returns (stego_path, media_type). The stego file is a scratch file owned
+    by the caller, who streams it out and removes it.
+    """
+
+    if filename.endswith(".txt"):
+        density = 1
+
+    try:
+        flags = density_flags(density)
+    except ValueError as e:
+        raise StegoError(str(e))
+
+    header_key_id = None
+
+    if key_id is not None:
+        try:
+            pk = load_public_key(key_id)
+        except KeyError:
+            raise StegoError("Unknown key ID", {"key_id": key_id})
+
+        header_key_id = bytes.fromhex(key_id)
+
+    try:
+        check_public_key(pk)
+        kyber_ct, shared_secret = kyber_encapsulate(pk)
+    except (TypeError, ValueError):
+        raise StegoError("Invalid public key")
+
+    aes_key = derive_aes_key(shared_secret)
+
+    if payload_path is None:
+        data = message.encode()
+        codec, data = compress_payload(data) if COMPRESSION_ENABLED else (CODEC_NONE, data)
+
+        nonce, ciphertext = aes_encrypt(data, aes_key)
+        header = build_header(kyber_ct, nonce, len(ciphertext), flags | codec_flags(codec), header_key_id)
+
+        return embed_payload(cover_path, filename, header, ciphertext, aes_key, density)
+
+    payload_size = os.path.getsize(payload_path)
+
+    with scratch_path(".z", payload_size) as packed_path:
+        codec = compress_file(payload_path, packed_path, payload_size) if COMPRESSION_ENABLED else CODEC_NONE
+        plain_path = packed_path if codec != CODEC_NONE else payload_path
+
+        with scratch_path(".seg", segmented_size(os.path.getsize(plain_path))) as body_path:
+            with open(plain_path, "rb") as src, open(body_path, "wb") as dst:
+                nonce = encrypt_segments(src.read, dst.write, aes_key)
+
+            with open(body_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as body:
+                flags |= FLAG_SEGMENTED | codec_flags(codec)
+                header = build_header(kyber_ct, nonce, len(body), flags, header_key_id)
+
+                return embed_payload(cover_path, filename, header, body, aes_key, density)
+
+
+def check_plan_memory(payload_bytes: int, density: int):
+    """Reject payloads whose embed plan would exceed PLAN_MEMORY_MAX. The
+    plan holds one entry per body symbol, so it is sized before it is built."""
+    if PLAN_MEMORY_MAX <= 0 or plan_memory(payload_bytes, density) <= PLAN_MEMORY_MAX:
+        return
+
+    raise StegoError("Payload too large for this server's plan memory limit", {
+        "max_bytes": PLAN_MEMORY_MAX // PLAN_BYTES_PER_ENTRY * max(1, density) // 8,
+        "ciphertext_bytes": payload_bytes,
+        "density": density
+    })
+
+
+def embed_payload(cover_path: str, filename: str, header: bytes, ciphertext, aes_key: bytes, density: int):
+    """Embed header and ciphertext (any buffer) in the cover, by file type."""
+
+    cover_size = os.path.getsize(cover_path)
+
+    # -------- CAPACITY CHECK --------
+    # From the container header (cached by content hash, so a preceding
+    # /capacity call already did the work), before anything is decoded.
+    if not filename.endswith(".mp3"):
+        media, max_bytes = cover_capacity_bytes(cover_path, filename, len(header), density)
+
+        if max_bytes is not None and len(ciphertext) > max_bytes:
+            raise StegoError(f"Message too large for this {media}", {
+                "max_bytes": max_bytes,
+                "ciphertext_bytes": len(ciphertext),
+                "density": density
+            })
+
+    if not filename.endswith(".txt"):
+        check_plan_memory(len(ciphertext), density)
+
+    # IMAGE MODE
+    if filename.endswith((".png", ".jpg", ".jpeg")):
+
+        with scratch_output(".png", cover_size) as stego_path:
+            try:
+                embed_image(cover_path, stego_path, header, ciphertext, aes_key, density=density)
+            except ValueError as e:
+                raise StegoError(str(e))
+
+        return stego_path, "image/png"
+
+    # TEXT MODE
+    elif filename.endswith(".txt"):
+
+        with scratch_output(".txt", cover_size) as stego_path:
+            try:
+                embed_text(cover_path, stego_path, header, ciphertext, TEXT_RADIX)
+            except UnicodeDecodeError:
+                raise StegoError("Text cover must be UTF-8")
+            except ValueError as e:
+                raise StegoError(str(e))
+
+        return stego_path, "text/plain"
+        
+    elif filename.endswith(".wav"):
+        from stego.audio_stego import embed_audio
+
+        with scratch_output(".wav", cover_size) as stego_path:
+            try:
+                embed_audio(cover_path, stego_path, header, ciphertext, aes_key, density=density)
+            except ValueError as e:
+                raise StegoError(str(e))
+
+        return stego_path, "audio/wav"
+    
+    elif filename.endswith(".mp3"):
+        from pydub import AudioSegment
+        from stego.audio_stego import embed_audio
+
+        # Decoded PCM is roughly ten times the size of the MP3
+        with scratch_path(".wav", cover_size * 10) as wav_path:
+            try:
+                with stage("transcode", cover_size):
+                    audio = AudioSegment.from_file(cover_path, format="mp3")
+                    audio.export(wav_path, format="wav")
+                    del audio
+            except Exception:
+                raise StegoError("MP3 conversion failed")
+
+            with scratch_output(".wav", os.path.getsize(wav_path)) as stego_path:
+                try:
+                    embed_audio(wav_path, stego_path, header, ciphertext, aes_key, density=density)
+                except ValueError as e:
+                    raise StegoError(str(e))
+
+        return stego_path, "audio/wav"
+    
+    elif filename.endswith((".mp4", ".avi", ".mov", ".mkv")):
+
+        from stego.video_stego import embed_video
+
+        # Decode the upload once and stream its frames straight into the
+        # FFV1 stego writer; FFV1 is lossless, budget about half the raw
+        # frame size.
+        _, info = cover_info(cover_path, filename)
+        raw_size = info["frame_count"] * info["width"] * info["height"] * 3
+
+        # -------- EMBED VIDEO --------
+        with scratch_output(".avi", raw_size // 2) as stego_path:
+            try:
+                embed_video(cover_path, stego_path, header, ciphertext, aes_key,
+                            density=density, workers=VIDEO_WORKERS)
+            except ValueError as e:
+                raise StegoError(str(e))
+
+        return stego_path, "video/x-msvideo"
+
+    else:
+        raise StegoError("Unsupported file type")
+
+
+# ===========================
+# UNIFIED RECEIVER
+# ===========================
+def extract_payload(sk: bytes, stego_path: str, filename: str, key_id: str = None):
+    """Recover and decrypt the payload hidden in a stego file.
+
+    The private key is sk, else the stored key key_id, else the stored key
+    named by the header's key ID.
+
+    Returns {"message": text} for a message payload, or {"file": path} for
+    a file payload; the plaintext file is a scratch file owned by the
+    caller, written only once every segment has authenticated.
+    """
+
+    def derive_seed(header):
+        if not filename.endswith(".txt"):
+            check_plan_memory(header["msg_len"], header_density(header))
+
+        private_key = sk
+
+        if private_key is None:
+            wanted = key_id or (header["key_id"] or b"").hex()
+
+            if not wanted:
+                raise StegoError("No private key given and the payload names no key ID")
+
+            try:
+                private_key = load_private_key(wanted)
+            except KeyError:
+                raise StegoError("Unknown key ID", {"key_id": wanted})
+            except (OSError, ValueError, InvalidTag):
+                raise StegoError("Invalid private key", {"key_id": wanted})
+
+        if len(header["kyber_ct"]) != ml_kem_512.CIPHERTEXT_SIZE:
+            # a damaged header, not a key problem
+            raise ValueError("Bad KEM ciphertext length")
+
+        # Raised as StegoError: the engine's caller reads ValueError and
+        # OSError from here as "no payload in this file".
+        try:
+            check_private_key(private_key)
+            shared_secret = kyber_decapsulate(private_key, header["kyber_ct"])
+        except (TypeError, ValueError):
+            raise StegoError("Invalid private key")
+
+        return derive_aes_key(shared_secret)
+
+    if filename.endswith((".png", ".jpg", ".jpeg")):
+        extract = extract_image
+
+    elif filename.endswith(".txt"):
+        extract = extract_text
+
+    elif filename.endswith(".wav"):
+        from stego.audio_stego import extract_audio
+        extract = extract_audio
+
+    elif filename.endswith(".avi"):
+        from stego.video_stego import extract_video
+        extract = extract_video
+
+    else:
+        raise StegoError("Unsupported file type")
+
+    try:
+        header, aes_key, ciphertext = extract(stego_path, derive_seed)
+    except UNREADABLE_ERRORS:
+        header = None
+
+    if header is None:
+        raise StegoError("No hidden data found")
+
+    codec = header_codec(header)
+
+    try:
+        if not header["flags"] & FLAG_SEGMENTED:
+            data = aes_decrypt(header["nonce"], ciphertext, aes_key)
+            return {"message": decompress_payload(codec, data, DECOMPRESS_LIMIT).decode()}
+
+        with scratch_output(".bin", len(ciphertext)) as plain_path:
+            with open(plain_path, "wb") as out:
+                write = decompress_writer(codec, out.write, DECOMPRESS_LIMIT)
+                decrypt_segments(header["nonce"], ciphertext, aes_key, write)
+    except InvalidTag:
+        # a wrong private key derives another AES key (and other positions)
+        raise StegoError("Decryption failed")
+    except (ValueError, zlib.error, lzma.LZMAError) as e:
+        raise StegoError(str(e))
+
+    return {"file": plain_path}
+
+
+# ===========================
+# COVER CAPACITY
+# ===========================
+# Each engine reads its cover's container header only (<media>_info) and
+# turns it into body bytes per density (<media>_capacity). The metadata is
+# cached by content hash, per worker, alongside the decoded covers.
+
+def _capacity_api(filename: str):
+    """(media, info, capacity) functions for a cover file type."""
+
+    if filename.endswith((".png", ".jpg", ".jpeg")):
+        return "image", image_info, image_capacity
+
+    elif filename.endswith(".txt"):
+        return "text", text_info, text_capacity
+
+    elif filename.endswith(".wav"):
+        from stego.audio_stego import audio_info, audio_capacity
+        return "audio", audio_info, audio_capacity
+
+    elif filename.endswith((".mp4", ".avi", ".mov", ".mkv")):
+        from stego.video_stego import video_info, video_capacity
+        return "video", video_info, video_capacity
+
+    elif filename.endswith(".mp3"):
+        raise StegoError("MP3 capacity is only known after decoding; convert it to WAV first")
+
+    raise StegoError("Unsupported file type")
+
+
+def cover_info(cover_path: str, filename: str):
+    """Return (media, info) for a cover from its container header."""
+    media, info_of, _ = _capacity_api(filename)
+    # the same bytes read as another media type give other fields
+    key = ("info", media, file_digest(cover_path)) if info_cache.enabled else None
+    info = info_cache.get(key) if key else None
+
+    if info is None:
+        try:
+            with stage("cover_info"):
+                info = info_of(cover_path)
+        except Exception:
+            raise StegoError("Unreadable cover file")
+
+        if key:
+            info_cache.put(key, info, INFO_ENTRY_BYTES)
+
+    return media, dict(info)
+
+
+def cover_capacity_bytes(cover_path: str, filename: str, header_bytes: int, density: int = 1):
+    """(media, body bytes the cover holds); None bytes means no limit."""
+    media, _, capacity = _capacity_api(filename)
+    _, info = cover_info(cover_path, filename)
+
+    return media, capacity(info, header_bytes, density)
+
+
+def cover_capacity(cover_path: str, filename: str, key_id: bool = False):
+    """Report what a cover can carry at every density, from its header only.
+
+    max_bytes is the ciphertext the cover holds; max_message_bytes and
+    max_file_bytes are the largest message and file payloads (before
+    compression) that fit. None means no limit (text covers).
+    """
+    media, _, capacity = _capacity_api(filename)
+    _, info = cover_info(cover_path, filename)
+    header_bytes = header_size(key_id)
+    densities = [1] if media == "text" else range(1, 5)
+    rows = []
+
+    for density in densities:
+        max_bytes = capacity(info, header_bytes, density)
+
+        rows.append({
+            "density": density,
+            "max_bytes": max_bytes,
+            "max_message_bytes": None if max_bytes is None else max(0, max_bytes - TAG_SIZE),
+            "max_file_bytes": None if max_bytes is None else segmented_capacity(max_bytes),
+        })
+
+    return {"media": media, **info, "header_bytes": header_bytes, "capacity": rows}
+
+
+# ===========================
+# HEADER PROBE
+# ===========================
+def probe_payload(stego_path: str, filename: str, decode: bool = True):
+    """Check a file for a payload header without decoding the whole cover.
+
+    Returns the parsed header dict, or None when the file carries no
+    payload. No key is needed: the header holds no secrets. With decode
+    False, an image the row reader cannot handle gives None instead of a
+    full decode (and a cover cache entry).
+    """
+
+    if filename.endswith((".png", ".jpg", ".jpeg")):
+        probe = lambda path: probe_image(path, decode)
+
+    elif filename.endswith(".txt"):
+        probe = probe_text
+
+    elif filename.endswith(".wav"):
+        from stego.audio_stego import probe_audio
+        probe = probe_audio
+
+    elif filename.endswith(".avi"):
+        from stego.video_stego import probe_video
+        probe = probe_video
+
+    else:
+        raise StegoError("Unsupported file type")
+
+    try:
+        return probe(stego_path)
+    except UNREADABLE_ERRORS:
+        return None
+
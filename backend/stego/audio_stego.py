@@ -1,126 +1,218 @@
 import wave
 import struct
-import hashlib
-from io import BytesIO
+import numpy as np
 
+from crypto.crypto_utils import parse_header, header_density
+from progress import report_progress
+from timing import stage
+from stego.cache import cover_cache, file_digest, freeze
+from stego.bits import (
+    bytes_to_bits, bits_to_bytes, bits_to_symbols, symbols_to_bits, symbol_count,
+    capacity_bytes, write_planned, read_lsb
+)
+from stego.indices import get_random_indices, plan_embedding
 
-# ---------------- BIT UTILS ----------------
-def bytes_to_bits(data: bytes):
-    for b in data:
-        for i in range(7, -1, -1):
-            yield (b >> i) & 1
 
+# ---------------- SAMPLE ACCESS ----------------
+# WAV PCM is little-endian, so bit 0 of every sample lives in the first byte
+# of the sample whatever its width (8/16/24/32-bit) or channel count. The
+# engine only ever touches that byte, through a strided uint8 view of the
+# memory-mapped data chunk, so the file is never loaded whole.
 
-def bits_to_bytes(bits):
-    out = bytearray()
-    b = 0
-    count = 0
-    for bit in bits:
-        b = (b << 1) | bit
-        count += 1
-        if count == 8:
-            out.append(b)
-            b = 0
-            count = 0
-    return bytes(out)
+BLOCK_FRAMES = 1 << 18
 
 
-# ---------------- RANDOM INDEX GENERATOR ----------------
-def get_random_indices(capacity, seed, offset, count):
-    rng_seed = int.from_bytes(hashlib.sha256(seed).digest(), "big")
-    indices = list(range(offset, capacity))
+def _find_data_chunk(f):
+    f.seek(12)
 
-    for i in range(len(indices) - 1, 0, -1):
-        rng_seed = (1103515245 * rng_seed + 12345) & 0x7fffffff
-        j = rng_seed % (i + 1)
-        indices[i], indices[j] = indices[j], indices[i]
+    while True:
+        head = f.read(8)
 
-    return indices[:count]
+        if len(head) < 8:
+            raise ValueError("WAV file has no data chunk")
 
+        chunk_id, size = head[:4], struct.unpack("<I", head[4:])[0]
 
-# ---------------- EMBED AUDIO ----------------
-def embed_audio(wav_bytes: bytes, header: bytes, body: bytes, seed: bytes) -> bytes:
-    input_buffer = BytesIO(wav_bytes)
-    output_buffer = BytesIO()
+        if chunk_id == b"data":
+            return f.tell()
+
+        f.seek(size + (size & 1), 1)
 
-    with wave.open(input_buffer, 'rb') as wf:
+
+def map_wav(wav_path):
+    """Return (params, frames) with frames a read-only uint8 memmap of the PCM data."""
+    with wave.open(wav_path, 'rb') as wf:
         params = wf.getparams()
-        frames = wf.readframes(wf.getnframes())
 
-    samples = list(struct.unpack("<" + "h" * (len(frames) // 2), frames))
-    capacity = len(samples)
+    size = params.nframes * params.nchannels * params.sampwidth
 
-    header_bits = list(bytes_to_bits(header))
-    body_bits = list(bytes_to_bits(body))
+    if size == 0:
+        return params, np.empty(0, dtype=np.uint8)
 
-    if len(header_bits) + len(body_bits) > capacity:
-        raise ValueError("Audio file too small for payload")
+    with open(wav_path, "rb") as f:
+        offset = _find_data_chunk(f)
+
+    return params, np.memmap(wav_path, dtype=np.uint8, mode="r", offset=offset, shape=(size,))
+
+
+def load_wav(wav_path):
+    """map_wav, but covers that fit the cover cache are read into memory
+    once and served from the cache by content hash afterwards."""
+    key = ("wav", file_digest(wav_path)) if cover_cache.enabled else None
+    cached = cover_cache.get(key) if key else None
+
+    if cached is not None:
+        return cached
+
+    with stage("decode"):
+        params, frames = map_wav(wav_path)
+
+        if key and cover_cache.fits(frames.nbytes):
+            entry = (params, freeze(np.array(frames)))
+            cover_cache.put(key, entry, frames.nbytes)
+            return entry
+
+    return params, frames
+
+
+def sample_lsb_bytes(frames, stride: int):
+    count = len(frames) // stride
+
+    return frames[:count * stride:stride]
 
-    # 1️⃣ Embed header sequentially
-    for i, bit in enumerate(header_bits):
-        samples[i] = (samples[i] & ~1) | bit
 
-    used_bits = len(header_bits)
+# ---------------- EMBED AUDIO ----------------
+def embed_audio(wav_path, stego_path, header: bytes, body: bytes, seed: bytes, legacy: bool = False, density: int = 1):
+    params, frames = load_wav(wav_path)
+
+    stride = params.sampwidth
+    capacity = len(frames) // stride
 
-    # 2️⃣ Embed body randomly AFTER header
-    rand_indices = get_random_indices(capacity, seed, used_bits, len(body_bits))
+    header_bits = bytes_to_bits(header)
+    body_symbols = bits_to_symbols(bytes_to_bits(body), density)
+
+    if len(header_bits) + len(body_symbols) > capacity:
+        raise ValueError("Audio file too small for payload")
 
-    for bit, idx in zip(body_bits, rand_indices):
-        samples[idx] = (samples[idx] & ~1) | bit
+    # Header sequentially, then body randomly AFTER header, applied block by
+    # block while the frames are copied to the output.
+    positions, values = plan_embedding(header_bits, body_symbols, capacity, seed, legacy)
+    header_count = len(header_bits)
 
-    modified_frames = struct.pack("<" + "h" * len(samples), *samples)
+    block = BLOCK_FRAMES * params.nchannels
+    total_bits = header_count + len(body_symbols) * density
 
-    with wave.open(output_buffer, 'wb') as wf:
+    with wave.open(stego_path, 'wb') as wf:
         wf.setparams(params)
-        wf.writeframes(modified_frames)
 
-    return output_buffer.getvalue()
+        for start in range(0, capacity, block):
+            end = min(capacity, start + block)
+
+            with stage("decode", (end - start) * stride):
+                chunk = np.array(frames[start * stride:end * stride])
+
+            lo, hi = np.searchsorted(positions, (start, end))
+
+            if hi > lo:
+                with stage("embed", (hi - lo) * density // 8):
+                    samples = chunk[::stride]
+                    split = max(0, min(hi, header_count) - lo)
+                    write_planned(samples, positions[lo:hi] - start, values[lo:hi], split, density)
+
+            with stage("encode", len(chunk)):
+                wf.writeframes(chunk)
+
+            report_progress(
+                samples=end, total_samples=capacity,
+                bits_embedded=int(min(hi, header_count) + max(0, hi - header_count) * density), total_bits=total_bits
+            )
 
 
 # ---------------- EXTRACT AUDIO ----------------
-def extract_audio_header(wav_bytes: bytes, num_bits: int):
-    input_buffer = BytesIO(wav_bytes)
+def _read_header(params, frames):
+    """Parse the header from the first samples. Returns (header, samples),
+    with samples the strided LSB-byte view the payload lives in."""
+
+    # v1 senders treated every WAV as 16-bit, so non-16-bit v1 files keep
+    # their bits in every second byte.
+    for stride in dict.fromkeys((params.sampwidth, 2)):
+        samples = sample_lsb_bytes(frames, stride)
+        pos = 0
+
+        def read(num_bytes):
+            nonlocal pos
+            bits = read_lsb(samples, slice(pos, pos + num_bytes * 8))
+            pos += len(bits)
+            return bits_to_bytes(bits)
+
+        try:
+            header = parse_header(read)
+        except ValueError:
+            header = None
+
+        if header is not None and (stride == params.sampwidth or header["version"] == 1):
+            return header, samples
+
+    return None, None
 
-    with wave.open(input_buffer, 'rb') as wf:
-        frames = wf.readframes(wf.getnframes())
 
-    samples = list(struct.unpack("<" + "h" * (len(frames) // 2), frames))
+def probe_audio(wav_path):
+    """Parse the payload header from the first samples only; the memmap
+    pages past the header are never touched. Returns the header dict, or None."""
+    with stage("probe"):
+        params, frames = map_wav(wav_path)
+        return _read_header(params, frames)[0]
 
-    bits = []
-    for i in range(num_bits):
-        bits.append(samples[i] & 1)
 
-    return bits
+def extract_audio(wav_path, derive_seed):
+    """Map the WAV once, read the header, then the randomly placed body.
 
+    derive_seed(header) turns the parsed header into the index seed.
+    Returns (header, seed, body_data), or (None, None, None) when the audio
+    carries no payload. Stego files are read through the memmap rather than
+    the cover cache, so a file without a payload is rejected after its
+    first few kilobytes.
+    """
+    params, frames = map_wav(wav_path)
+    header, samples = _read_header(params, frames)
 
-def extract_audio_body(wav_bytes: bytes, seed: bytes, offset: int, num_bits: int):
-    input_buffer = BytesIO(wav_bytes)
+    if header is None:
+        return None, None, None
 
-    with wave.open(input_buffer, 'rb') as wf:
-        frames = wf.readframes(wf.getnframes())
+    seed = derive_seed(header)
+    density = header_density(header)
+    num_bits = header["msg_len"] * 8
 
-    samples = list(struct.unpack("<" + "h" * (len(frames) // 2), frames))
+    rand_indices = get_random_indices(
+        len(samples),
+        seed,
+        header["size"] * 8,
+        symbol_count(num_bits, density),
+        header["version"] == 1
+    )
 
-    rand_indices = get_random_indices(len(samples), seed, offset, num_bits)
+    with stage("extract", header["msg_len"]):
+        symbols = read_lsb(samples, rand_indices, density)
 
-    bits = []
-    for idx in rand_indices:
-        bits.append(samples[idx] & 1)
+    return header, seed, bits_to_bytes(symbols_to_bits(symbols, density, num_bits))
 
-    return bits
 
-def get_audio_capacity(wav_bytes: bytes, header_size_bytes: int):
-    from io import BytesIO
-    import wave
+# ---------------- CAPACITY ----------------
 
-    buffer = BytesIO(wav_bytes)
+def audio_info(wav_path):
+    """Sample layout from the WAV header; the data chunk is not read."""
+    with wave.open(wav_path, 'rb') as wf:
+        return {
+            "frames": wf.getnframes(),
+            "channels": wf.getnchannels(),
+            "sampwidth": wf.getsampwidth(),
+            "rate": wf.getframerate(),
+        }
 
-    with wave.open(buffer, 'rb') as wf:
-        frames = wf.getnframes()
 
-    capacity_bits = frames
-    capacity_bytes = capacity_bits // 8
+def audio_capacity(info, header_size_bytes: int, density: int = 1):
+    return capacity_bytes(info["frames"] * info["channels"], header_size_bytes, density)
 
-    usable_bytes = capacity_bytes - header_size_bytes
 
-    return max(0, usable_bytes)
\ No newline at end of file
+def get_audio_capacity(wav_path, header_size_bytes: int, density: int = 1):
+    return audio_capacity(audio_info(wav_path), header_size_bytes, density)
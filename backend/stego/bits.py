@@ -0,0 +1,106 @@
+import numpy as np
+
+
+# ---------------- BIT PACKING ----------------
+# Every engine moves payloads around as flat uint8 arrays holding one bit
+# per element, most significant bit of each byte first. bytes_to_bits reads
+# any buffer (bytes, bytearray, memoryview, mmap) without copying it first.
+
+def bytes_to_bits(data):
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+
+def bits_to_bytes(bits):
+    return np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes()
+
+
+# ---------------- EMBEDDING DENSITY ----------------
+# At density k every body sample carries a k-bit symbol in its k lowest
+# bits, so a body of n bits needs ceil(n / k) samples. The header is always
+# written at density 1, which lets a receiver parse it before it knows k.
+
+MAX_DENSITY = 4
+
+
+def symbol_count(num_bits, density=1):
+    return -(-num_bits // density)
+
+
+def bits_to_symbols(bits, density=1):
+    """Group bits (MSB first) into density-bit symbols, zero-padding the last."""
+    if density == 1:
+        return bits
+
+    pad = (-len(bits)) % density
+    if pad:
+        bits = np.concatenate((bits, np.zeros(pad, dtype=np.uint8)))
+
+    weights = (1 << np.arange(density - 1, -1, -1)).astype(np.uint8)
+    return (bits.reshape(-1, density) * weights).sum(axis=1, dtype=np.uint8)
+
+
+def symbols_to_bits(symbols, density=1, num_bits=None):
+    if density != 1:
+        shifts = np.arange(density - 1, -1, -1, dtype=np.uint8)
+        symbols = ((symbols[:, None] >> shifts) & 1).reshape(-1)
+
+    return symbols if num_bits is None else symbols[:num_bits]
+
+
+def capacity_bytes(samples, header_size, density=1):
+    """Body bytes that fit in `samples` cover samples after a header of
+    header_size bytes."""
+    free = samples - header_size * 8
+    return max(0, free * density // 8)
+
+
+# ---------------- LSB ACCESS ----------------
+
+def write_lsb(samples, positions, values, density=1):
+    """Set the `density` low bits of samples[positions] to values, in place."""
+    keep = 0xFF ^ ((1 << density) - 1)
+    samples[positions] = (samples[positions] & keep) | values
+
+
+def read_lsb(samples, positions=slice(None), density=1):
+    return samples[positions] & ((1 << density) - 1)
+
+
+def write_planned(samples, positions, values, header_count, density=1):
+    """write_lsb for a slice of an embedding plan whose first header_count
+    entries are single header bits and the rest body symbols."""
+    write_lsb(samples, positions[:header_count], values[:header_count])
+    write_lsb(samples, positions[header_count:], values[header_count:], density)
+
+
+# ---------------- STREAMED READS ----------------
+
+def stream_reader(bit_chunks):
+    """Return read(n) -> n bytes over an iterator of LSB bit arrays.
+
+    Chunks are pulled only as far as the reads go, so a header can be
+    parsed from the first rows, samples or frames of a cover without
+    decoding the rest. A short result means the stream ran out.
+    """
+    chunks = iter(bit_chunks)
+    pending = np.empty(0, dtype=np.uint8)
+
+    def read(num_bytes):
+        nonlocal pending
+        need = num_bytes * 8
+        parts = [pending]
+        have = len(pending)
+
+        while have < need:
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            have += len(chunk)
+
+        bits = np.concatenate(parts) if len(parts) > 1 else pending
+        taken, pending = bits[:need], bits[need:]
+
+        return bits_to_bytes(taken[:len(taken) // 8 * 8])
+
+    return read
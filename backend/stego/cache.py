@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from config import CACHE_ENABLED, COVER_CACHE_BYTES, PLAN_CACHE_BYTES, INFO_CACHE_BYTES
+
+
+# ---------------- LRU CACHE ----------------
+# Entries are charged by their size in bytes and the least recently used
+# ones are evicted once the budget is exceeded. Cached arrays are marked
+# read-only; callers that need to modify one take a copy.
+
+class LRUCache:
+
+    def __init__(self, max_bytes, max_item_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_bytes if max_item_bytes is None else max_item_bytes
+        self.enabled = CACHE_ENABLED and max_bytes > 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def fits(self, nbytes):
+        return self.enabled and nbytes <= self.max_item_bytes
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        if not self.fits(nbytes):
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+
+            self._entries[key] = (value, nbytes)
+            self._size += nbytes
+
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+cover_cache = LRUCache(COVER_CACHE_BYTES, COVER_CACHE_BYTES // 4)
+plan_cache = LRUCache(PLAN_CACHE_BYTES, PLAN_CACHE_BYTES // 4)
+info_cache = LRUCache(INFO_CACHE_BYTES)
+
+# Cover metadata entries are a few small ints; charge a flat size.
+INFO_ENTRY_BYTES = 512
+
+
+def cache_stats():
+    return {"covers": cover_cache.stats(), "plans": plan_cache.stats(), "info": info_cache.stats()}
+
+
+def freeze(array):
+    array.flags.writeable = False
+    return array
+
+
+# ---------------- KEYS ----------------
+
+def file_digest(path):
+    """Content hash of a cover file, used as its cache key. Remembered per
+    (path, inode, size, mtime), so the capacity check and the cover cache
+    of one job hash the upload once."""
+    st = os.stat(path)
+    return _digest(path, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+@lru_cache(maxsize=64)
+def _digest(path, ino, size, mtime_ns):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "blake2b").hexdigest()
+
+
+def seed_key(seed):
+    # Seeds are AES keys; keep only a hash of them in the cache keys.
+    return hashlib.sha256(b"stego-plan" + seed).digest()
@@ -1,71 +1,159 @@
+import os
+from contextlib import closing
+
 from PIL import Image
-import hashlib
-
-def bytes_to_bits(data: bytes):
-    for b in data:
-        for i in range(7, -1, -1):
-            yield (b >> i) & 1
-
-def bits_to_bytes(bits):
-    out = bytearray()
-    b = 0
-    count = 0
-    for bit in bits:
-        b = (b << 1) | bit
-        count += 1
-        if count == 8:
-            out.append(b)
-            b = 0
-            count = 0
-    return bytes(out)
-
-def embed_sequential_lsb(pixels, payload_bits, start_index=0):
-    idx = start_index
-    for bit in payload_bits:
-        px = idx // 3
-        ch = idx % 3
-        pixels[px][ch] = (pixels[px][ch] & 0xFE) | bit
-        idx += 1
-    return idx
-
-def extract_sequential_lsb(pixels, num_bits, start_index=0):
-    bits = []
-    idx = start_index
-    for _ in range(num_bits):
-        px = idx // 3
-        ch = idx % 3
-        bits.append(pixels[px][ch] & 1)
-        idx += 1
-    return bits, idx
-
-def get_random_indices(capacity, seed, offset, count):
-    rng_seed = int.from_bytes(hashlib.sha256(seed).digest(), "big")
-    available = list(range(offset, capacity))
-
-    if count > len(available):
+import numpy as np
+
+from crypto.crypto_utils import parse_header, header_density
+from progress import report_progress
+from timing import stage, count_bytes
+from stego.cache import cover_cache, file_digest, freeze
+from stego.bits import (
+    bytes_to_bits, bits_to_bytes, bits_to_symbols, symbols_to_bits, symbol_count,
+    capacity_bytes, write_lsb, read_lsb, stream_reader
+)
+from stego.png_rows import png_channel_rows
+from stego.indices import get_random_indices
+
+# Channel index i addresses pixel i // 3, channel i % 3, which is exactly
+# the flat index into the (height, width, 3) array PIL hands out for RGB.
+def image_to_channels(img, writable=False):
+    if writable:
+        return np.array(img, dtype=np.uint8).reshape(-1)
+    return np.asarray(img, dtype=np.uint8).reshape(-1)
+
+def channels_to_image(img, channels):
+    img.frombytes(channels.tobytes())
+    return img
+
+def embed_sequential_lsb(channels, payload_bits, start_index=0):
+    end = start_index + len(payload_bits)
+    if end > channels.size:
+        raise ValueError("Not enough capacity")
+    write_lsb(channels, slice(start_index, end), payload_bits)
+    return end
+
+def extract_sequential_lsb(channels, num_bits, start_index=0):
+    end = start_index + num_bits
+    if end > channels.size:
         raise ValueError("Not enough capacity")
+    return read_lsb(channels, slice(start_index, end)), end
+
+def sequential_reader(channels, start_index=0):
+    idx = start_index
+
+    def read(num_bytes):
+        nonlocal idx
+        bits, idx = extract_sequential_lsb(channels, num_bytes * 8, idx)
+        return bits_to_bytes(bits)
+
+    return read
+
+def embed_random_lsb(channels, bits, seed, used_bits, legacy=False, density=1):
+    symbols = bits_to_symbols(bits, density)
+    indices = get_random_indices(channels.size, seed, used_bits, len(symbols), legacy)
+    write_lsb(channels, indices, symbols, density)
+
+def extract_random_lsb(channels, seed, used_bits, num_bits, legacy=False, density=1):
+    count = symbol_count(num_bits, density)
+    indices = get_random_indices(channels.size, seed, used_bits, count, legacy)
+    return symbols_to_bits(read_lsb(channels, indices, density), density, num_bits)
+
+# ---------------- CAPACITY ----------------
+# Every engine exposes <media>_info(path), read from the container header
+# only, and <media>_capacity(info, header_size, density) in body bytes.
+
+def image_info(image_path):
+    """Cover dimensions from the image header; pixels are not decoded."""
+    with Image.open(image_path) as img:
+        return {"width": img.width, "height": img.height}
+
+def image_capacity(info, header_size, density=1):
+    return capacity_bytes(info["width"] * info["height"] * 3, header_size, density)
+
+# ---------------- FILE API ----------------
+# The service hands over scratch paths rather than bytes, so the encoded
+# cover and the encoded stego PNG never sit in memory next to the pixels.
+
+def load_image(image_path):
+    """Decode image_path to RGB. Returns (channels, size, info) with
+    channels read-only; decoded covers are cached by content hash."""
+    key = ("image", file_digest(image_path)) if cover_cache.enabled else None
+    cached = cover_cache.get(key) if key else None
+
+    if cached is not None:
+        return cached
+
+    with stage("decode", os.path.getsize(image_path)):
+        with Image.open(image_path) as src:
+            img = src.convert("RGB")
+
+        entry = (freeze(image_to_channels(img)), img.size, dict(img.info))
+
+    if key:
+        cover_cache.put(key, entry, entry[0].nbytes)
+
+    return entry
+
+def embed_image(image_path, stego_path, header, body, seed, legacy=False, density=1):
+    cover, size, info = load_image(image_path)
+
+    with stage("embed", len(header) + len(body)):
+        channels = cover.copy()
+
+        used_bits = embed_sequential_lsb(channels, bytes_to_bits(header), 0)
+        embed_random_lsb(channels, bytes_to_bits(body), seed, used_bits, legacy, density)
+
+    total_bits = used_bits + len(body) * 8
+    report_progress(bits_embedded=total_bits, total_bits=total_bits)
+
+    with stage("encode"):
+        img = Image.new("RGB", size)
+        img.info = dict(info)
+
+        channels_to_image(img, channels).save(stego_path, format="PNG")
+
+    count_bytes("encode", os.path.getsize(stego_path))
+
+def probe_image(image_path, decode: bool = True):
+    """Parse the payload header from the first pixel rows only.
+
+    PNGs are inflated row by row until the header is complete, so an image
+    without a payload is rejected after its first row. Other formats fall
+    back to a full decode, or return None when decode is False. Returns the
+    header dict, or None.
+    """
+    rows = png_channel_rows(image_path)
+
+    if rows is None:
+        if not decode:
+            return None
+
+        channels, _, _ = load_image(image_path)
+        return parse_header(sequential_reader(channels))
+
+    with stage("probe"), closing(rows):
+        return parse_header(stream_reader(read_lsb(row) for row in rows))
+
+def extract_image(image_path, derive_seed):
+    """Returns (header, seed, body_data), or (None, None, None) when the
+    image carries no payload."""
+    header = probe_image(image_path)
+
+    if header is None:
+        return None, None, None
+
+    channels, _, _ = load_image(image_path)
+    seed = derive_seed(header)
+
+    with stage("extract", header["msg_len"]):
+        body_bits = extract_random_lsb(
+            channels,
+            seed,
+            header["size"] * 8,
+            header["msg_len"] * 8,
+            header["version"] == 1,
+            header_density(header)
+        )
 
-    for i in range(len(available) - 1, 0, -1):
-        rng_seed = (1103515245 * rng_seed + 12345) & 0x7fffffff
-        j = rng_seed % (i + 1)
-        available[i], available[j] = available[j], available[i]
-
-    return available[:count]
-
-def embed_random_lsb(pixels, bits, seed, used_bits):
-    capacity = len(pixels) * 3
-    indices = get_random_indices(capacity, seed, used_bits, len(bits))
-    for bit, idx in zip(bits, indices):
-        px = idx // 3
-        ch = idx % 3
-        pixels[px][ch] = (pixels[px][ch] & 0xFE) | bit
-
-def extract_random_lsb(pixels, seed, used_bits, num_bits):
-    capacity = len(pixels) * 3
-    indices = get_random_indices(capacity, seed, used_bits, num_bits)
-    bits = []
-    for idx in indices:
-        px = idx // 3
-        ch = idx % 3
-        bits.append(pixels[px][ch] & 1)
-    return bits
\ No newline at end of file
+    return header, seed, bits_to_bytes(body_bits)
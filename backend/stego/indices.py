@@ -0,0 +1,218 @@
+import hashlib
+from math import isqrt
+
+import numpy as np
+
+from timing import stage
+from stego.cache import plan_cache, freeze, seed_key
+
+
+# ---------------- RANDOM INDEX GENERATOR ----------------
+# Shared by the image, audio and video embedders. Returns `count` distinct
+# indices from range(offset, capacity) as an int64 array.
+#
+# legacy=False  lazy partial Fisher-Yates with a sparse swap map. Time and
+#               memory are O(count), independent of the cover size.
+# legacy=True   the original full-capacity LCG shuffle, kept so stego files
+#               written before the v2 header still extract.
+#
+# In both modes a shorter plan is a prefix of a longer one, so plans are
+# cached per (seed, capacity, offset) and a cached plan serves every count up
+# to its own length. The returned array is read-only.
+def get_random_indices(capacity, seed, offset, count, legacy=False):
+    if count > max(0, capacity - offset):
+        raise ValueError("Not enough capacity")
+
+    key = (seed_key(seed), capacity, offset, legacy)
+    cached = plan_cache.get(key)
+
+    if cached is not None and len(cached) >= count:
+        return cached[:count]
+
+    with stage("indices"):
+        if legacy:
+            indices = legacy_random_indices(capacity, seed, offset, count)
+        else:
+            indices = lazy_random_indices(capacity, seed, offset, count)
+
+    plan_cache.put(key, freeze(indices), indices.nbytes)
+
+    return indices
+
+
+def lazy_random_indices(capacity, seed, offset, count):
+    span = capacity - offset
+
+    # 64-bit draws from SHAKE-256, so the sequence is pinned by hashlib and
+    # any prefix of a longer plan is the plan for a shorter payload.
+    stream = hashlib.shake_256(b"stego-indices" + seed).digest(8 * count)
+    draws = np.frombuffer(stream, dtype=">u8").astype(np.uint64)
+    steps = np.arange(count, dtype=np.int64)
+    targets = (draws % (np.uint64(span) - steps.astype(np.uint64))).astype(np.int64) + steps
+
+    # Step t swaps positions t and targets[t] and picks what lands at t.
+    # Instead of replaying the swaps through a dict, resolve them in bulk:
+    # if targets[t] was already hit at an earlier step s, it now holds
+    # whatever sat at position s when step s ran, and so on back.
+    order = np.argsort(targets, kind="stable")
+    repeat = targets[order[1:]] == targets[order[:-1]]
+    previous = np.full(count, -1, dtype=np.int64)
+    previous[order[1:][repeat]] = order[:-1][repeat]
+
+    early = np.flatnonzero((targets < count) & (targets > steps))
+    last_hit = np.full(count, -1, dtype=np.int64)
+    np.maximum.at(last_hit, targets[early], early)
+
+    origin = np.where(last_hit < 0, steps, last_hit)
+    while True:
+        jumped = origin[origin]
+        if np.array_equal(jumped, origin):
+            break
+        origin = jumped
+
+    picked = np.where(previous < 0, targets, origin[np.maximum(previous, 0)])
+
+    return picked + offset
+
+
+# ---------------- EMBED PLAN ----------------
+
+def plan_embedding(header_bits, body_symbols, capacity, seed, legacy=False):
+    """Cover positions for every header bit and body symbol, sorted by position.
+
+    Header bits go to positions 0..len(header_bits)-1, body symbols to
+    random positions after them. Sorting lets a streaming pass over video
+    frames or sample blocks consume the plan with one cursor; the header
+    entries stay the first len(header_bits) of the result.
+    """
+    used_bits = len(header_bits)
+
+    positions = np.concatenate((
+        np.arange(used_bits, dtype=np.int64),
+        get_random_indices(capacity, seed, used_bits, len(body_symbols), legacy)
+    ))
+    values = np.concatenate((header_bits, body_symbols))
+
+    order = np.argsort(positions, kind="stable")
+
+    return positions[order], values[order]
+
+
+# Peak bytes per plan entry while a plan is built and consumed: the random
+# draws, swap resolution and argsort scratch, plus the sorted positions and
+# values. Measured at ~92 B (density 1) to ~99 B (density 4) as RSS growth
+# of video hide and extract; rounded up for headroom.
+PLAN_BYTES_PER_ENTRY = 112
+
+
+def plan_memory(payload_bytes, density=1):
+    """Peak bytes of the embed plan for payload_bytes of ciphertext."""
+    return -(-payload_bytes * 8 // max(1, density)) * PLAN_BYTES_PER_ENTRY
+
+
+# ---------------- LEGACY LCG SHUFFLE ----------------
+
+_LCG_MUL = 1103515245
+_LCG_INC = 12345
+_LCG_MASK = 0x7fffffff
+_LCG_MAX_CHUNK = 1 << 22
+
+
+def _lcg_skip(state, steps):
+    mul, inc = _LCG_MUL, _LCG_INC
+
+    while steps:
+        if steps & 1:
+            state = (mul * state + inc) & _LCG_MASK
+        inc = (mul * inc + inc) & _LCG_MASK
+        mul = (mul * mul) & _LCG_MASK
+        steps >>= 1
+
+    return state
+
+
+def _lcg_coefficients(length):
+    # state after m steps == (mul[m] * state + inc[m]) & mask
+    mul = np.ones(1, dtype=np.uint64)
+    inc = np.zeros(1, dtype=np.uint64)
+    mask = np.uint64(_LCG_MASK)
+
+    while mul.size < length:
+        next_mul = (mul[-1] * np.uint64(_LCG_MUL)) & mask
+        next_inc = (inc[-1] * np.uint64(_LCG_MUL) + np.uint64(_LCG_INC)) & mask
+        mul, inc = (
+            np.concatenate((mul, (mul * next_mul) & mask)),
+            np.concatenate((inc, (mul * next_inc + inc) & mask)),
+        )
+
+    return mul[:length], inc[:length]
+
+
+def legacy_random_indices(capacity, seed, offset, count):
+    # The original code shuffled range(offset, capacity) with swaps
+    # i = size-1 .. 1, drawing j for swap i from the (size - i)-th LCG state,
+    # and kept the first `count` entries. Undoing the swaps in ascending i
+    # traces each output slot back to the value it started with, and only
+    # swaps that touch a traced position matter. The LCG is evaluated in
+    # vectorized chunks, so memory stays O(count + chunk).
+    size = capacity - offset
+    result = np.empty(count, dtype=np.int64)
+
+    if count == 0:
+        return result
+
+    state = int.from_bytes(hashlib.sha256(seed).digest(), "big") & _LCG_MASK
+    mask = np.uint64(_LCG_MASK)
+
+    chunk_limit = min(_LCG_MAX_CHUNK, size)
+    coef_mul, coef_inc = _lcg_coefficients(chunk_limit)
+
+    slots = {p: p for p in range(count)}  # traced position -> output slot
+
+    # Hashed occupancy counts of the traced positions: a cheap vectorized
+    # prefilter, false positives are no-ops in the swap loop below.
+    table_mask = min(1 << 24, 1 << max(16, (count * 64).bit_length())) - 1
+    table = np.zeros(table_mask + 1, dtype=np.uint32)
+    np.add.at(table, np.arange(count) & table_mask, 1)
+
+    start = 1
+
+    while start < size:
+        # Below `count` every swap may move a traced slot, so that range is
+        # replayed in full. Past it, a swap matters only if j hits a traced
+        # position; chunks grow with sqrt(start) to keep j >= start rare.
+        if start < count:
+            end = min(count, start + chunk_limit)
+        else:
+            end = min(size, start + min(chunk_limit, max(1 << 12, isqrt(start << 13))))
+
+        length = end - start
+        first = np.uint64(_lcg_skip(state, size - end + 1))
+        states = (coef_mul[:length] * first + coef_inc[:length]) & mask
+        i = np.arange(start, end, dtype=np.uint64)
+        j = (states[::-1] % (i + np.uint64(1))).astype(np.int64)
+
+        if start < count:
+            hits = zip(range(start, end), j.tolist())
+        else:
+            keep = np.flatnonzero((j >= start) | (table[j & table_mask] != 0))
+            hits = zip((keep + start).tolist(), j[keep].tolist())
+
+        for i_swap, j_swap in hits:
+            a = slots.pop(i_swap, None)
+            b = slots.pop(j_swap, None)
+            if a is not None:
+                slots[j_swap] = a
+            if b is not None:
+                slots[i_swap] = b
+            if (a is None) != (b is None):
+                moved_from, moved_to = (i_swap, j_swap) if b is None else (j_swap, i_swap)
+                table[moved_from & table_mask] -= 1
+                table[moved_to & table_mask] += 1
+
+        start = end
+
+    for position, slot in slots.items():
+        result[slot] = position + offset
+
+    return result
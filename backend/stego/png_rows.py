@@ -0,0 +1,171 @@
+import struct
+import zlib
+
+import numpy as np
+
+
+# ---------------- PNG ROW DECODER ----------------
+# Just enough of PNG to hand out the first rows of an image as the RGB
+# channel bytes PIL's convert("RGB") would produce, inflating IDAT only as
+# far as the caller reads. Used to probe for a payload header without
+# decoding the whole image. Layouts it does not cover (16-bit, sub-byte,
+# interlaced) return None and the caller falls back to a full decode.
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# colour type -> samples per pixel, for 8-bit images
+_SAMPLES = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+_READ_SIZE = 1 << 16
+
+
+def png_channel_rows(path):
+    """Return an iterator over the RGB channel rows of the PNG at path, or
+    None when the file is not a PNG this decoder handles."""
+    f = open(path, "rb")
+
+    try:
+        if f.read(8) != PNG_SIGNATURE:
+            f.close()
+            return None
+
+        header = None
+        palette = None
+
+        while True:
+            head = f.read(8)
+
+            if len(head) < 8:
+                f.close()
+                return None
+
+            length, kind = struct.unpack(">I4s", head)
+
+            if kind == b"IDAT":
+                break
+
+            data = f.read(length)
+            f.seek(4, 1)
+
+            if kind == b"IHDR":
+                header = struct.unpack(">IIBBBBB", data)
+            elif kind == b"PLTE":
+                palette = np.zeros((256, 3), dtype=np.uint8)
+                entries = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)[:256]
+                palette[:len(entries)] = entries
+
+        if header is None:
+            f.close()
+            return None
+
+        width, height, depth, color_type, _, _, interlace = header
+
+        if depth != 8 or interlace or color_type not in _SAMPLES or (color_type == 3 and palette is None):
+            f.close()
+            return None
+    except (OSError, struct.error, ValueError):
+        f.close()
+        return None
+
+    return _rows(f, length, width, height, color_type, palette)
+
+
+def _rows(f, idat_left, width, height, color_type, palette):
+    bpp = _SAMPLES[color_type]
+    stride = width * bpp
+    inflate = zlib.decompressobj()
+    buffer = bytearray()
+    prior = np.zeros(stride, dtype=np.uint8)
+
+    with f:
+        for _ in range(height):
+            while len(buffer) < stride + 1:
+                if idat_left == 0:
+                    f.seek(4, 1)
+                    head = f.read(8)
+
+                    if len(head) < 8:
+                        return
+
+                    idat_left, kind = struct.unpack(">I4s", head)
+
+                    if kind != b"IDAT":
+                        return
+
+                    continue
+
+                data = f.read(min(idat_left, _READ_SIZE))
+
+                if not data:
+                    return
+
+                idat_left -= len(data)
+                buffer += inflate.decompress(data)
+
+            filter_type = buffer[0]
+            raw = np.frombuffer(bytes(buffer[1:stride + 1]), dtype=np.uint8)
+            del buffer[:stride + 1]
+
+            row = _unfilter(filter_type, raw, prior, bpp)
+            prior = row
+
+            yield _to_rgb(row, color_type, palette)
+
+
+def _unfilter(filter_type, raw, prior, bpp):
+    if filter_type == 0:
+        return raw
+
+    if filter_type == 1:
+        # Sub: a running sum per channel, mod 256
+        return np.cumsum(raw.reshape(-1, bpp), axis=0, dtype=np.uint8).reshape(-1)
+
+    if filter_type == 2:
+        return raw + prior
+
+    if filter_type not in (3, 4):
+        raise ValueError("Bad PNG filter type")
+
+    # Average and Paeth depend on the previous output byte of the same
+    # channel, so they are undone byte by byte.
+    out = bytearray(raw.tobytes())
+    up = prior.tobytes()
+
+    for i in range(len(out)):
+        a = out[i - bpp] if i >= bpp else 0
+        b = up[i]
+
+        if filter_type == 3:
+            out[i] = (out[i] + ((a + b) >> 1)) & 0xFF
+            continue
+
+        c = up[i - bpp] if i >= bpp else 0
+        p = a + b - c
+        pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+
+        if pa <= pb and pa <= pc:
+            predictor = a
+        elif pb <= pc:
+            predictor = b
+        else:
+            predictor = c
+
+        out[i] = (out[i] + predictor) & 0xFF
+
+    return np.frombuffer(bytes(out), dtype=np.uint8)
+
+
+def _to_rgb(row, color_type, palette):
+    if color_type == 2:
+        return row
+
+    if color_type == 6:
+        return row.reshape(-1, 4)[:, :3].reshape(-1)
+
+    if color_type == 0:
+        return np.repeat(row, 3)
+
+    if color_type == 4:
+        return np.repeat(row[::2], 3)
+
+    return palette[row].reshape(-1)
@@ -1,14 +1,202 @@
+import codecs
+import os
+from io import BytesIO
+
+import numpy as np
+
+from crypto.crypto_utils import parse_header
+from timing import stage, count_bytes
+from stego.bits import bits_to_bytes, symbols_to_bits, symbol_count
+
+
+# ---------------- ZWC BLOCK FORMAT ----------------
+# The payload is appended to the cover as "\n\n" followed by one trailing
+# block of zero-width code points.
+#
+# v1 block   ZWSP/ZWNJ only, one bit per char.
+# versioned  MARK, then a mode char naming the radix, then log2(radix)
+#            bits per char drawn from the first `radix` ALPHABET chars.
+#            MARK never occurs in a v1 block, so the first char tells the
+#            two apart.
+#
+# Every ALPHABET char is three UTF-8 bytes, E2 80 xx or E2 81 xx, with a
+# distinct last byte, so blocks are decoded straight from the file bytes.
+
 ZWSP = "\u200B"
 ZWNJ = "\u200C"
 
-def bits_to_zwc(bits):
-    return "".join(ZWNJ if bit else ZWSP for bit in bits)
-
-def zwc_to_bits(text):
-    bits = []
-    for ch in text:
-        if ch == ZWSP:
-            bits.append(0)
-        elif ch == ZWNJ:
-            bits.append(1)
-    return bits
\ No newline at end of file
+ALPHABET = "\u200B\u200C\u200D\u2060\u2061\u2062\u2063\u2064"
+MARK = "\u2064"
+MODES = {4: "\u200C", 8: "\u200D"}
+
+RADICES = (2, 4, 8)
+DEFAULT_RADIX = 8
+
+CHUNK_SIZE = 1 << 20
+TAIL_CHUNK = 3 << 16
+
+_MARK_SYMBOL = ALPHABET.index(MARK)
+_MODE_RADIX = {ALPHABET.index(char): radix for radix, char in MODES.items()}
+
+
+def _byte_table(radix):
+    # byte -> the 8 / log2(radix) chars spelling it, for str.translate
+    width = radix.bit_length() - 1
+    return {
+        byte: "".join(ALPHABET[(byte >> shift) & (radix - 1)] for shift in range(8 - width, -1, -width))
+        for byte in range(256)
+    }
+
+
+_BYTE_TABLES = {2: _byte_table(2), 4: _byte_table(4)}
+_SYMBOL_TABLE = str.maketrans(dict(enumerate(ALPHABET)))
+_WORD_SHIFTS = np.arange(21, -1, -3, dtype=np.uint32)
+
+# last UTF-8 byte -> (symbol, expected middle byte); 0xFF marks non-ZWC
+_SYMBOLS = np.full(256, 0xFF, dtype=np.uint8)
+_MIDDLE = np.zeros(256, dtype=np.uint8)
+
+for _symbol, _char in enumerate(ALPHABET):
+    _lead, _middle, _last = _char.encode("utf-8")
+    _SYMBOLS[_last] = _symbol
+    _MIDDLE[_last] = _middle
+
+
+def encode_zwc(payload: bytes, radix: int = DEFAULT_RADIX) -> str:
+    """Return the ZWC block spelling payload at the given radix (2 writes a v1 block)."""
+    if radix not in RADICES:
+        raise ValueError(f"Text radix must be one of {RADICES}")
+
+    if radix in _BYTE_TABLES:
+        block = payload.decode("latin-1").translate(_BYTE_TABLES[radix])
+    else:
+        # every 3 bytes are exactly 8 symbols of 3 bits
+        data = np.frombuffer(payload + bytes(-len(payload) % 3), dtype=np.uint8).reshape(-1, 3)
+        words = (data[:, 0].astype(np.uint32) << 16) | (data[:, 1].astype(np.uint32) << 8) | data[:, 2]
+        symbols = ((words[:, None] >> _WORD_SHIFTS) & 7).astype(np.uint8).reshape(-1)
+        block = symbols[:symbol_count(len(payload) * 8, 3)].tobytes().decode("latin-1").translate(_SYMBOL_TABLE)
+
+    return block if radix == 2 else MARK + MODES[radix] + block
+
+
+def _zwc_symbols(raw):
+    """Return (symbols, valid) for a buffer of whole 3-byte chars."""
+    triples = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+    symbols = _SYMBOLS[triples[:, 2]]
+    valid = (triples[:, 0] == 0xE2) & (triples[:, 1] == _MIDDLE[triples[:, 2]]) & (symbols != 0xFF)
+
+    return symbols, valid
+
+
+def trailing_symbols(text_path):
+    """Symbols of the run of ZWC chars ending the file (trailing whitespace
+    ignored), read backwards in chunks; the cover before it is never read."""
+    symbols = []
+
+    with open(text_path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        f.seek(max(0, end - 64))
+        tail = f.read()
+        end -= len(tail) - len(tail.rstrip(b" \t\r\n"))
+
+        while end >= 3:
+            size = min(TAIL_CHUNK, end - end % 3)
+            f.seek(end - size)
+            chunk, valid = _zwc_symbols(f.read(size))
+
+            bad = np.flatnonzero(~valid)
+            if bad.size:
+                symbols.append(chunk[bad[-1] + 1:])
+                break
+
+            symbols.append(chunk)
+            end -= size
+
+    if not symbols:
+        return np.empty(0, dtype=np.uint8)
+
+    return np.concatenate(symbols[::-1])
+
+
+def decode_zwc(symbols):
+    """Return the payload bytes of a trailing ZWC block's symbols."""
+    if len(symbols) and symbols[0] == _MARK_SYMBOL:
+        radix = _MODE_RADIX.get(int(symbols[1])) if len(symbols) > 1 else None
+
+        if radix is None:
+            raise ValueError("Unknown text payload mode")
+
+        symbols = symbols[2:]
+    else:
+        radix = 2
+
+    if len(symbols) and symbols.max() >= radix:
+        raise ValueError("Corrupt text payload")
+
+    # radix 8 pads the last symbol; the padding bits are not a byte
+    width = radix.bit_length() - 1
+    return bits_to_bytes(symbols_to_bits(symbols, width, len(symbols) * width // 8 * 8))
+
+
+# ---------------- FILE API ----------------
+
+def embed_text(text_path, stego_path, header: bytes, body: bytes, radix: int = DEFAULT_RADIX):
+    """Copy the cover to stego_path in chunks and append the ZWC payload.
+
+    The cover must be valid UTF-8; it is checked with an incremental decoder
+    so only one chunk is held at a time.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    with open(text_path, "rb") as src, open(stego_path, "wb") as dst:
+        with stage("decode", os.path.getsize(text_path)):
+            while chunk := src.read(CHUNK_SIZE):
+                decoder.decode(chunk)
+                dst.write(chunk)
+
+            decoder.decode(b"", final=True)
+
+        with stage("embed", len(header) + len(body)):
+            dst.write(("\n\n" + encode_zwc(b"".join((header, body)), radix)).encode("utf-8"))
+
+
+def probe_text(text_path):
+    """Parse the payload header from the trailing ZWC block. Returns the
+    header dict, or None."""
+    with stage("probe"):
+        data = decode_zwc(trailing_symbols(text_path))
+        return parse_header(BytesIO(data).read)
+
+
+def extract_text(text_path, derive_seed):
+    """Decode the trailing ZWC block and split it into header and body.
+
+    Returns (header, seed, body_data), or (None, None, None) when the text
+    carries no payload.
+    """
+    with stage("extract"):
+        data = decode_zwc(trailing_symbols(text_path))
+        header = parse_header(BytesIO(data).read)
+
+    count_bytes("extract", len(data))
+
+    if header is None:
+        return None, None, None
+
+    body = data[header["size"]:header["size"] + header["msg_len"]]
+
+    if len(body) < header["msg_len"]:
+        raise ValueError("Truncated payload")
+
+    return header, derive_seed(header), body
+
+
+# ---------------- CAPACITY ----------------
+
+def text_info(text_path):
+    return {"bytes": os.path.getsize(text_path)}
+
+
+def text_capacity(info, header_size, density=1):
+    """None: the ZWC block is appended, so any payload fits."""
+    return None
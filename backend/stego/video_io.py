@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+
+import cv2
+
+
+@contextmanager
+def open_capture(video_path):
+    """Yield a cv2.VideoCapture over video_path and release it on exit."""
+    cap = cv2.VideoCapture(video_path)
+
+    try:
+        yield cap
+    finally:
+        cap.release()
+
+
+def read_metadata(cap):
+    return {
+        "fps": cap.get(cv2.CAP_PROP_FPS),
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+    }
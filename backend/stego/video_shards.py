@@ -0,0 +1,221 @@
+import multiprocessing as mp
+import os
+import queue
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from config import VIDEO_SHARD_MIN_BYTES
+from progress import report_progress
+from timing import stage, run_timed, merge_stages
+from stego.bits import write_planned
+from stego.video_io import open_capture
+from stego.video_stego import frame_plan, embedded_bits, open_writer, embed_frames, read_frames, ShortVideo
+
+
+# ---------------- SHARDED EMBED ----------------
+# The frame range is cut into chunks of CHUNK_FRAMES frames, dealt round
+# robin to `workers` spawned processes. Each worker seeks to its chunks,
+# decodes them straight into a slot of one shared_memory ring and applies
+# the plan's LSB writes for those frames. The parent only encodes: it
+# takes the slots back in frame order and feeds them to the FFV1 writer,
+# so the output is byte-identical to embed_frames. Every worker owns
+# SLOTS_PER_WORKER slots, so it can decode ahead while the parent encodes.
+#
+# Workers rely on frame-accurate seeking (CAP_PROP_POS_FRAMES), which the
+# FFmpeg backend provides for the containers we accept.
+# A worker that runs out of frames before the reported count raises
+# ShortVideo in the parent, and embed_video redoes the embed serially.
+#
+# Each spawned worker takes ~0.3 s to import cv2 and NumPy, and only the
+# decode runs in parallel (the parent still encodes every frame), so
+# videos under VIDEO_SHARD_MIN_BYTES of decoded frames, or machines with
+# one core, take the serial path.
+
+CHUNK_FRAMES = 16
+SLOTS_PER_WORKER = 2
+
+CPU_COUNT = os.cpu_count() or 1
+
+WAIT_POLL = 0.5
+
+
+def shard_count(meta, workers):
+    """Worker processes embed_sharded starts for this video; 1 means it
+    embeds serially."""
+    frame_size = meta["height"] * meta["width"] * 3
+    workers = min(workers, -(-meta["frame_count"] // CHUNK_FRAMES))
+
+    if CPU_COUNT <= 1 or meta["frame_count"] * frame_size < VIDEO_SHARD_MIN_BYTES:
+        return 1
+
+    return max(1, workers)
+
+
+def embed_sharded(video_path, meta, stego_path, header: bytes, body: bytes, seed: bytes, legacy: bool = False,
+                  density: int = 1, workers: int = 2):
+    frame_count = meta["frame_count"]
+    frame_size = meta["height"] * meta["width"] * 3
+    chunk_count = -(-frame_count // CHUNK_FRAMES)
+    workers = shard_count(meta, workers)
+
+    if workers <= 1:
+        with open_capture(video_path) as cap:
+            return embed_frames(meta, read_frames(cap, meta), stego_path, header, body, seed, legacy, density)
+
+    positions, values, header_count, bounds = frame_plan(meta, header, body, seed, legacy, density)
+    total_bits = embedded_bits(len(positions), header_count, density)
+
+    slots = workers * SLOTS_PER_WORKER
+    chunk_bytes = CHUNK_FRAMES * frame_size
+
+    ctx = mp.get_context("spawn")
+    free = [ctx.Semaphore(1) for _ in range(slots)]
+    filled = [ctx.Semaphore(0) for _ in range(slots)]
+    reports = ctx.Queue()
+
+    ring = shared_memory.SharedMemory(create=True, size=slots * chunk_bytes)
+    procs = []
+
+    try:
+        for worker in range(workers):
+            tasks = []
+
+            for chunk in range(worker, chunk_count, workers):
+                first = chunk * CHUNK_FRAMES
+                last = min(frame_count, first + CHUNK_FRAMES)
+                lo, hi = bounds[first], bounds[last]
+                split = max(0, min(hi, header_count) - lo)
+                tasks.append((chunk, positions[lo:hi] - first * frame_size, values[lo:hi], split))
+
+            proc = ctx.Process(
+                target=_shard_worker,
+                args=(video_path, meta, ring.name, slots, tasks, density, free, filled, reports),
+                daemon=True
+            )
+            proc.start()
+            procs.append(proc)
+
+        out = open_writer(stego_path, meta)
+        done = []
+
+        try:
+            for chunk in range(chunk_count):
+                slot = chunk % slots
+                first = chunk * CHUNK_FRAMES
+                count = min(CHUNK_FRAMES, frame_count - first)
+
+                with stage("shard_wait"):
+                    _wait(filled[slot], procs, reports, done)
+
+                frames = np.ndarray((count, meta["height"], meta["width"], 3), dtype=np.uint8,
+                                    buffer=ring.buf, offset=slot * chunk_bytes)
+
+                with stage("encode", count * frame_size):
+                    for frame in frames:
+                        out.write(frame)
+
+                del frames
+                free[slot].release()
+
+                end = bounds[first + count]
+                report_progress(
+                    frames=first + count, total_frames=frame_count,
+                    bits_embedded=embedded_bits(end, header_count, density), total_bits=total_bits
+                )
+        finally:
+            out.release()
+
+        while len(done) < workers:
+            _drain(reports, done, block=True)
+
+        for stages in done:
+            merge_stages(stages)
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+
+        ring.close()
+        ring.unlink()
+
+
+def _drain(reports, done, block=False):
+    try:
+        kind, data = reports.get(block, WAIT_POLL)
+    except queue.Empty:
+        return
+
+    if kind == "error":
+        raise ValueError(data)
+
+    if kind == "short":
+        raise ShortVideo(data)
+
+    done.append(data)
+
+
+def _wait(semaphore, procs, reports, done):
+    while not semaphore.acquire(timeout=WAIT_POLL):
+        _drain(reports, done)
+
+        if any(proc.exitcode not in (None, 0) for proc in procs):
+            _drain(reports, done, block=True)
+            raise RuntimeError("A video shard worker died")
+
+
+def _shard_worker(video_path, meta, ring_name, slots, tasks, density, free, filled, reports):
+    ring = shared_memory.SharedMemory(name=ring_name)
+
+    try:
+        _, stages = run_timed(None, _fill_chunks, video_path, meta, ring, slots, tasks, density, free, filled)
+        reports.put(("done", stages))
+    except ShortVideo as e:
+        reports.put(("short", e.frames))
+    except Exception as e:
+        reports.put(("error", str(e)))
+    finally:
+        ring.close()
+
+
+def _fill_chunks(video_path, meta, ring, slots, tasks, density, free, filled):
+    shape = (meta["height"], meta["width"], 3)
+    frame_size = meta["height"] * meta["width"] * 3
+    chunk_bytes = CHUNK_FRAMES * frame_size
+
+    with open_capture(video_path) as cap:
+        position = 0
+
+        for chunk, positions, values, split in tasks:
+            slot = chunk % slots
+            first = chunk * CHUNK_FRAMES
+            count = min(CHUNK_FRAMES, meta["frame_count"] - first)
+
+            free[slot].acquire()
+
+            frames = np.ndarray((count, *shape), dtype=np.uint8, buffer=ring.buf, offset=slot * chunk_bytes)
+
+            if position != first:
+                with stage("seek"):
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+            for index, target in enumerate(frames):
+                with stage("decode", frame_size):
+                    ret, frame = cap.read(target)
+
+                if not ret or frame.shape != shape:
+                    raise ShortVideo(first + index)
+
+                if frame.ctypes.data != target.ctypes.data:
+                    target[...] = frame
+
+            position = first + count
+
+            if len(positions):
+                with stage("embed", len(values) * density // 8):
+                    write_planned(frames.reshape(-1), positions, values, split, density)
+
+            del frames
+            filled[slot].release()
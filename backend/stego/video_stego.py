@@ -1,205 +1,332 @@
+from contextlib import contextmanager
+
 import cv2
 import numpy as np
-import hashlib
-from io import BytesIO
-import random
 
+from crypto.crypto_utils import parse_header, header_density
+from progress import report_progress
+from timing import stage
+from stego.cache import cover_cache, file_digest, freeze
+from stego.bits import (
+    bytes_to_bits, bits_to_bytes, bits_to_symbols, symbols_to_bits, symbol_count,
+    capacity_bytes, write_planned, read_lsb, stream_reader
+)
+from stego.indices import get_random_indices, plan_embedding
+from stego.video_io import open_capture, read_metadata
 
-# ---------------- BIT UTILS ----------------
 
-def bytes_to_bits(data: bytes):
-    for b in data:
-        for i in range(7, -1, -1):
-            yield (b >> i) & 1
+# ---------------- EMBED VIDEO ----------------
 
+class ShortVideo(ValueError):
+    """The decoder ran out after `frames` frames, before the container's
+    reported frame count (MP4/MOV headers often overstate it)."""
 
-def bits_to_bytes(bits):
-    out = bytearray()
-    b = 0
-    count = 0
+    def __init__(self, frames):
+        super().__init__("Video ended before its reported frame count")
+        self.frames = frames
 
-    for bit in bits:
-        b = (b << 1) | bit
-        count += 1
 
-        if count == 8:
-            out.append(b)
-            b = 0
-            count = 0
+def embed_video(video_path, stego_path, header: bytes, body: bytes, seed: bytes, legacy: bool = False, density: int = 1,
+                workers: int = 1):
+    """Embed into the cover at video_path and write stego_path as FFV1.
 
-    return bytes(out)
+    The index plan is built for the reported frame count. If the cover
+    holds fewer frames, the embed starts over for the frames that exist
+    (serially), so capacity is rechecked against the real count and the
+    stego file's frame count matches its plan.
+    """
+    frame_count = None
 
+    while True:
+        try:
+            with open_cover(video_path, frame_count) as (meta, frames):
+                if workers > 1 and frame_count is None:
+                    from stego.video_shards import embed_sharded
+                    embed_sharded(video_path, meta, stego_path, header, body, seed, legacy, density, workers)
+                else:
+                    embed_frames(meta, frames, stego_path, header, body, seed, legacy, density)
+            return
+        except ShortVideo as e:
+            frame_count = e.frames
+
+
+def frame_plan(meta, header: bytes, body: bytes, seed: bytes, legacy: bool = False, density: int = 1):
+    """Plan the LSB writes for a video. Returns (positions, values,
+    header_count, bounds), with the writes for frame f in
+    positions[bounds[f]:bounds[f + 1]]."""
+    w = meta["width"]
+    h = meta["height"]
+    frame_count = meta["frame_count"]
+
+    if frame_count <= 0 or w <= 0 or h <= 0:
+        raise ValueError("Video contains no frames")
 
-# ---------------- RANDOM GENERATOR ----------------
+    frame_size = h * w * 3
+    capacity = frame_count * frame_size
 
-def get_random_indices(capacity, seed, offset, count):
-    rng_seed = int.from_bytes(hashlib.sha256(seed).digest(), "big")
+    header_bits = bytes_to_bits(header)
+    body_symbols = bits_to_symbols(bytes_to_bits(body), density)
 
-    indices = list(range(offset, capacity))
+    if len(header_bits) + len(body_symbols) > capacity:
+        raise ValueError("Video too small for payload")
 
-    for i in range(len(indices) - 1, 0, -1):
-        rng_seed = (1103515245 * rng_seed + 12345) & 0x7fffffff
-        j = rng_seed % (i + 1)
-        indices[i], indices[j] = indices[j], indices[i]
+    positions, values = plan_embedding(header_bits, body_symbols, capacity, seed, legacy)
+    bounds = np.searchsorted(positions, np.arange(frame_count + 1) * frame_size)
 
-    return indices[:count]
+    return positions, values, len(header_bits), bounds
 
 
-# ---------------- FRAME FLATTEN ----------------
+def embedded_bits(end, header_count, density):
+    """Payload bits written by the first `end` entries of a frame plan."""
+    return int(min(end, header_count) + max(0, end - header_count) * density)
 
-def flatten_frames(frames):
-    pixels = []
 
-    for frame in frames:
-        h, w, _ = frame.shape
-        for y in range(h):
-            for x in range(w):
-                for c in range(3):
-                    pixels.append((frame, y, x, c))
+def embed_frames(meta, frames, stego_path, header: bytes, body: bytes, seed: bytes, legacy: bool = False, density: int = 1):
+    """Embed into the writable frames yielded by `frames` and write them to
+    stego_path as FFV1."""
+    w = meta["width"]
+    h = meta["height"]
+    frame_count = meta["frame_count"]
+    frame_size = h * w * 3
 
-    return pixels
+    positions, values, header_count, bounds = frame_plan(meta, header, body, seed, legacy, density)
+    total_bits = embedded_bits(len(positions), header_count, density)
 
+    # ---------------- STREAM FRAMES ----------------
+    # Exactly frame_count frames are written, so the receiver sees the same
+    # capacity in the output container that the index plan was built for.
 
-# ---------------- EMBED VIDEO ----------------
+    out = open_writer(stego_path, meta)
 
-def embed_video(video_bytes: bytes, header: bytes, body: bytes, seed: bytes):
+    try:
+        for f, frame in enumerate(frames):
+            lo, hi = bounds[f], bounds[f + 1]
 
-    # Save video temporarily in memory
-    temp_input = "temp_input.avi"
+            if hi > lo:
+                with stage("embed", (hi - lo) * density // 8):
+                    flat = frame.reshape(-1)
+                    split = max(0, min(hi, header_count) - lo)
+                    write_planned(flat, positions[lo:hi] - f * frame_size, values[lo:hi], split, density)
 
-    with open(temp_input, "wb") as f:
-        f.write(video_bytes)
+            with stage("encode", frame_size):
+                out.write(frame)
 
-    cap = cv2.VideoCapture(temp_input)
+            report_progress(
+                frames=f + 1, total_frames=frame_count,
+                bits_embedded=embedded_bits(hi, header_count, density), total_bits=total_bits
+            )
+    finally:
+        out.release()
 
-    frames = []
-    fps = cap.get(cv2.CAP_PROP_FPS)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
+def open_writer(stego_path, meta):
+    fourcc = cv2.VideoWriter_fourcc(*"FFV1")
+    return cv2.VideoWriter(stego_path, fourcc, meta["fps"], (meta["width"], meta["height"]))
 
-    cap.release()
 
-    if len(frames) == 0:
-        raise ValueError("Video contains no frames")
+# ---------------- FRAME SOURCES ----------------
 
-    h, w, _ = frames[0].shape
+def read_frames(cap, meta):
+    """Yield meta["frame_count"] frames from cap; raises ShortVideo if the
+    decoder runs out first."""
+    shape = (meta["height"], meta["width"], 3)
+    frame_size = meta["height"] * meta["width"] * 3
 
-    pixels = flatten_frames(frames)
-    capacity = len(pixels)
+    for f in range(meta["frame_count"]):
+        with stage("decode", frame_size):
+            ret, frame = cap.read()
 
-    header_bits = list(bytes_to_bits(header))
-    body_bits = list(bytes_to_bits(body))
+        if not ret or frame.shape != shape:
+            raise ShortVideo(f)
 
-    if len(header_bits) + len(body_bits) > capacity:
-        raise ValueError("Video too small for payload")
-
-    # ---------------- HEADER EMBED ----------------
+        yield frame
 
-    for i, bit in enumerate(header_bits):
-        frame, y, x, c = pixels[i]
-        frame[y, x, c] = (frame[y, x, c] & 0xFE) | bit
 
-    used_bits = len(header_bits)
+@contextmanager
+def open_cover(video_path, frame_count=None):
+    """Yield (meta, frames) for a cover video, using only its first
+    frame_count frames when given.
 
-    # ---------------- RANDOM BODY EMBED ----------------
+    Covers whose decoded frames fit the cover cache are decoded once and
+    then served from the cache by content hash, each frame handed out as a
+    fresh copy. Larger ones stream straight from the decoder. Only complete
+    decodes are cached.
+    """
+    key = ("video", file_digest(video_path)) if cover_cache.enabled else None
+    cached = cover_cache.get(key) if key else None
 
-    rand_indices = get_random_indices(capacity, seed, used_bits, len(body_bits))
+    if cached is not None:
+        meta, stack = cached
+        yield meta, (frame.copy() for frame in stack)
+        return
 
-    for bit, idx in zip(body_bits, rand_indices):
-        frame, y, x, c = pixels[idx]
-        frame[y, x, c] = (frame[y, x, c] & 0xFE) | bit
+    with open_capture(video_path) as cap:
+        meta = read_metadata(cap)
 
-    # ---------------- REBUILD VIDEO ----------------
+        if frame_count is not None:
+            meta["frame_count"] = min(meta["frame_count"], frame_count)
+        raw_size = max(0, meta["frame_count"] * meta["width"] * meta["height"] * 3)
 
-    temp_output = "temp_output.avi"
+        if not key or not cover_cache.fits(raw_size):
+            yield meta, read_frames(cap, meta)
+            return
 
-    fourcc = cv2.VideoWriter_fourcc(*"FFV1")
-    out = cv2.VideoWriter(temp_output, fourcc, fps, (w, h))
+        stack = np.empty((meta["frame_count"], meta["height"], meta["width"], 3), dtype=np.uint8)
 
-    for frame in frames:
-        out.write(frame)
+        def fill():
+            for f, frame in enumerate(read_frames(cap, meta)):
+                stack[f] = frame
+                yield frame
 
-    out.release()
+            cover_cache.put(key, (meta, freeze(stack)), stack.nbytes)
 
-    with open(temp_output, "rb") as f:
-        return f.read()
+        yield meta, fill()
 
 
 # ---------------- EXTRACT VIDEO ----------------
 
-def extract_video(video_bytes: bytes, seed: bytes, header_bits_count: int, body_bits_count: int):
+def probe_video(video_path):
+    """Parse the payload header from the first frame(s) only.
 
-    temp_input = "temp_extract.avi"
+    Frames are decoded lazily, so a video without a payload is rejected
+    after its first frame. Returns the header dict, or None.
+    """
+    with open_capture(video_path) as cap:
+        meta = read_metadata(cap)
+        frames = read_frames(cap, meta)
 
-    with open(temp_input, "wb") as f:
-        f.write(video_bytes)
+        with stage("probe"):
+            return parse_header(stream_reader(read_lsb(frame.reshape(-1)) for frame in frames))
 
-    cap = cv2.VideoCapture(temp_input)
 
-    frames = []
+def extract_video(video_path, derive_seed):
+    """Read the header from the first frame(s), then only the body frames.
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
+    derive_seed(header) turns the parsed header into the index seed.
+    Returns (header, seed, body_data), or (None, None, None) when the video
+    carries no payload. Frames without payload bits are grabbed but never
+    retrieved, and decoding stops after the last frame holding a body bit.
+    """
+
+    with open_capture(video_path) as cap:
+        return extract_capture(cap, derive_seed)
+
+
+def extract_capture(cap, derive_seed):
+    meta = read_metadata(cap)
+
+    w = meta["width"]
+    h = meta["height"]
+    frame_count = meta["frame_count"]
 
-    cap.release()
+    frame_size = h * w * 3
+    capacity = frame_count * frame_size
 
-    pixels = flatten_frames(frames)
+    current = {"index": -1, "pixels": None}
+
+    def frame_pixels(f):
+        if current["index"] == f:
+            return current["pixels"]
+
+        with stage("skip"):
+            while current["index"] < f - 1:
+                if not cap.grab():
+                    raise ValueError("Video ended before its reported frame count")
+                current["index"] += 1
+
+        with stage("decode", frame_size):
+            ret, frame = cap.read()
+
+        if not ret or frame.shape != (h, w, 3):
+            raise ValueError("Video ended before its reported frame count")
+
+        current["index"] = f
+        current["pixels"] = frame.reshape(-1)
+
+        return current["pixels"]
 
     # ---------------- READ HEADER ----------------
 
-    header_bits = []
+    pos = 0
+
+    def read(num_bytes):
+        nonlocal pos
+        end = min(pos + num_bytes * 8, capacity)
+        chunks = []
+
+        while pos < end:
+            f = pos // frame_size
+            take = min(end, (f + 1) * frame_size) - pos
+            chunks.append(read_lsb(frame_pixels(f), slice(pos - f * frame_size, pos - f * frame_size + take)))
+            pos += take
 
-    for i in range(header_bits_count):
-        frame, y, x, c = pixels[i]
-        header_bits.append(frame[y, x, c] & 1)
+        if not chunks:
+            return b""
 
-    header_data = bits_to_bytes(header_bits)
+        return bits_to_bytes(np.concatenate(chunks))
 
-    # ---------------- RANDOM BODY ----------------
+    header = parse_header(read)
 
-    rand_indices = get_random_indices(
-        len(pixels),
+    if header is None:
+        return None, None, None
+
+    seed = derive_seed(header)
+    density = header_density(header)
+    num_bits = header["msg_len"] * 8
+
+    # ---------------- SELECTIVE BODY ----------------
+
+    indices = get_random_indices(
+        capacity,
         seed,
-        header_bits_count,
-        body_bits_count
+        header["size"] * 8,
+        symbol_count(num_bits, density),
+        header["version"] == 1
     )
 
-    body_bits = []
+    order = np.argsort(indices, kind="stable")
+    positions = indices[order]
+    frames_of = positions // frame_size
+
+    values = np.empty(len(positions), dtype=np.uint8)
+    last_frame = int(frames_of[-1]) + 1 if len(frames_of) else 0
+    lo = 0
+
+    for f in np.unique(frames_of).tolist():
+        hi = np.searchsorted(frames_of, f, side="right")
+        values[lo:hi] = read_lsb(frame_pixels(f), positions[lo:hi] - f * frame_size, density)
+        lo = hi
+
+        report_progress(frames=f + 1, total_frames=last_frame, bits_extracted=int(hi) * density, total_bits=num_bits)
+
+    symbols = np.empty(len(positions), dtype=np.uint8)
+    symbols[order] = values
+
+    return header, seed, bits_to_bytes(symbols_to_bits(symbols, density, num_bits))
 
-    for idx in rand_indices:
-        frame, y, x, c = pixels[idx]
-        body_bits.append(frame[y, x, c] & 1)
+# ---------------- CAPACITY ----------------
 
-    body_data = bits_to_bytes(body_bits)
+def video_info(video_path):
+    """Container metadata (fps, size, frame count); no frame is decoded.
+    Raises ValueError when the container cannot be opened or reports no
+    frames."""
+    with open_capture(video_path) as cap:
+        if not cap.isOpened():
+            raise ValueError("Cannot open video")
 
-    return header_data, body_data
+        meta = read_metadata(cap)
 
-def get_video_capacity(video_bytes, header_size):
-    import cv2
-    import tempfile
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".avi") as temp:
-        temp.write(video_bytes)
-        path = temp.name
+    if meta["width"] <= 0 or meta["height"] <= 0 or meta["frame_count"] <= 0:
+        raise ValueError("Video reports no frames")
 
-    cap = cv2.VideoCapture(path)
+    return meta
 
-    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-    cap.release()
+def get_video_capacity(video_path, header_size, density=1):
+    return video_capacity(video_info(video_path), header_size, density)
 
-    capacity_bits = frames * width * height * 3
-    capacity_bytes = capacity_bits // 8
 
-    usable = capacity_bytes - header_size
+def video_capacity(meta, header_size, density=1):
+    samples = meta["frame_count"] * meta["width"] * meta["height"] * 3
 
-    return max(0, usable)
\ No newline at end of file
+    return capacity_bytes(samples, header_size, density)
@@ -0,0 +1,123 @@
+"""Hide and extract payloads without the HTTP API.
+
+Run from backend/ (or with it on sys.path):
+
+    from stegolib import hide, extract
+
+    hide("cover.png", "meet at noon", public_key, "out/")
+    extract("out/cover.png.stego.png", private_key)    # -> ("message", "meet at noon")
+
+These call the same service functions the routes use, so the stego files
+are interchangeable with the server's, and the same STEGO_* settings
+(compression, text radix, caches, keystore) apply.
+"""
+import os
+import shutil
+
+from scratch import scratch_path, remove_scratch
+from services.stego_service import hide_payload, extract_payload, cover_capacity, StegoError
+
+COVER_SUFFIXES = (".png", ".jpg", ".jpeg", ".txt", ".wav", ".mp3", ".mp4", ".avi", ".mov", ".mkv")
+STEGO_SUFFIXES = (".png", ".txt", ".wav", ".avi")
+
+MEDIA_SUFFIXES = {
+    "image/png": ".png",
+    "text/plain": ".txt",
+    "audio/wav": ".wav",
+    "video/x-msvideo": ".avi",
+}
+
+
+def _filename(path):
+    return os.path.basename(path).lower()
+
+
+def stego_name(cover, media_type):
+    """Default stego file name: the cover's full name plus .stego and the
+    suffix of the format the engine writes (PNG, WAV, FFV1 AVI or text),
+    so c.png and c.jpg do not collide."""
+    return os.path.basename(cover) + ".stego" + MEDIA_SUFFIXES[media_type]
+
+
+def _place(scratch, output):
+    try:
+        shutil.move(scratch, output)
+    finally:
+        remove_scratch(scratch)
+
+    return output
+
+
+def hide(cover, payload, public_key=None, output=None, key_id=None, density=1):
+    """Hide payload in the cover file for public_key (or a keystore key_id).
+
+    payload is a message (str), the path of a file to hide (os.PathLike)
+    or raw bytes, which are hidden as a file payload. output is the stego
+    file's path or a directory for stego_name(); by default the stego file
+    goes next to the cover. Returns the path written.
+
+    Raises StegoError when the cover, key or payload is unusable.
+    """
+    if (public_key is None) == (key_id is None):
+        raise StegoError("Send either a public_key or a key_id")
+
+    cover = os.fspath(cover)
+    filename = _filename(cover)
+
+    if isinstance(payload, str):
+        stego_path, media_type = hide_payload(public_key, cover, filename, payload, density, None, key_id)
+    elif isinstance(payload, os.PathLike):
+        stego_path, media_type = hide_payload(
+            public_key, cover, filename, None, density, os.fspath(payload), key_id
+        )
+    else:
+        with scratch_path(".bin", len(payload)) as payload_path:
+            with open(payload_path, "wb") as f:
+                f.write(payload)
+
+            stego_path, media_type = hide_payload(public_key, cover, filename, None, density, payload_path, key_id)
+
+    if output is None:
+        output = os.path.dirname(os.path.abspath(cover))
+
+    output = os.fspath(output)
+
+    if os.path.isdir(output):
+        output = os.path.join(output, stego_name(cover, media_type))
+
+    return _place(stego_path, output)
+
+
+def extract(stego, private_key=None, output=None, key_id=None):
+    """Recover the payload hidden in a stego file.
+
+    The private key is private_key, else the stored key key_id, else the
+    stored key named by the header's key ID.
+
+    Returns (kind, value): ("message", text) for message payloads, and
+    ("file", value) for file payloads, where value is the path written
+    when output is given and the file's bytes otherwise.
+
+    Raises StegoError when the file is unusable, carries no payload, names
+    no usable key or does not decrypt with the key.
+    """
+    stego = os.fspath(stego)
+    payload = extract_payload(private_key, stego, _filename(stego), key_id)
+
+    if "message" in payload:
+        return "message", payload["message"]
+
+    if output is not None:
+        return "file", _place(payload["file"], os.fspath(output))
+
+    try:
+        with open(payload["file"], "rb") as f:
+            return "file", f.read()
+    finally:
+        remove_scratch(payload["file"])
+
+
+def capacity(cover, key_id=False):
+    """What the cover can carry at each density; see POST /capacity."""
+    cover = os.fspath(cover)
+    return cover_capacity(cover, _filename(cover), key_id)
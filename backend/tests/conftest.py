@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+# The backend modules import each other as top-level modules (config,
+# timing, stego.*), as they do when uvicorn runs from backend/.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import executor  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client():
+    # jobs run on threads, so the test needs no worker processes
+    original = executor.EXECUTOR_KIND
+    executor.shutdown_executor()
+    executor.EXECUTOR_KIND = "thread"
+
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+    executor.shutdown_executor()
+    executor.EXECUTOR_KIND = original
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+from PIL import Image
+from pqcrypto.kem import ml_kem_512
+
+from services.admission import estimate_memory, JOB_BASE_BYTES
+from stego.indices import plan_memory, PLAN_BYTES_PER_ENTRY
+from stegolib import hide
+
+
+def test_plan_memory_counts_entries():
+    assert plan_memory(1000, 1) == 8000 * PLAN_BYTES_PER_ENTRY
+    assert plan_memory(1000, 4) == 2000 * PLAN_BYTES_PER_ENTRY
+    assert plan_memory(1, 3) == 3 * PLAN_BYTES_PER_ENTRY
+
+
+def test_extract_is_charged_for_its_payload(tmp_path):
+    cover = tmp_path / "cover.png"
+    Image.fromarray(np.random.default_rng(0).integers(0, 256, (400, 400, 3), dtype=np.uint8)).save(cover)
+    pk, _ = ml_kem_512.generate_keypair()
+
+    stego = hide(cover, os.urandom(20000), pk, tmp_path, density=2)
+    name = os.path.basename(stego)
+
+    plain = estimate_memory(str(cover), "cover.png", 0)
+    loaded = estimate_memory(stego, name)
+
+    assert plain > JOB_BASE_BYTES
+    # random bytes do not compress, so the ciphertext is at least as long
+    assert loaded - plain >= plan_memory(20000, 2)
+    assert loaded < estimate_memory(stego, name, 20000, 1)
+
+
+def test_unprobeable_image_is_not_decoded(tmp_path, monkeypatch):
+    from stego import image_stego
+
+    cover = tmp_path / "cover.jpg"
+    Image.fromarray(np.random.default_rng(1).integers(0, 256, (300, 300, 3), dtype=np.uint8)).save(cover)
+    decoded = []
+    monkeypatch.setattr(image_stego, "load_image", lambda path: decoded.append(path))
+
+    estimate = estimate_memory(str(cover), "cover.jpg")
+
+    # no row reader for JPEG: charged for the cover, with no plan
+    assert decoded == []
+    assert estimate == estimate_memory(str(cover), "cover.jpg", 0)
@@ -0,0 +1,52 @@
+import struct
+from pathlib import Path
+
+import numpy as np
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from PIL import Image
+
+from crypto.crypto_utils import MAGIC, derive_aes_key, kyber_decapsulate
+from stego.image_stego import embed_image, probe_image
+from stegolib import extract
+
+# baseline_stego.png was written by the original list-of-pixels engine
+# (commit 887003e, /sender/hide) into baseline_cover.png with a v1 (STEG)
+# header, for the ML-KEM key in baseline_sk.bin.
+FIXTURES = Path(__file__).parent / "fixtures"
+MESSAGE = "written by the baseline"
+
+
+def pixels(path):
+    with Image.open(path) as img:
+        return np.asarray(img.convert("RGB"))
+
+
+def test_baseline_stego_still_extracts():
+    sk = (FIXTURES / "baseline_sk.bin").read_bytes()
+
+    assert extract(FIXTURES / "baseline_stego.png", sk) == ("message", MESSAGE)
+
+
+def test_embed_matches_baseline_pixels(tmp_path):
+    sk = (FIXTURES / "baseline_sk.bin").read_bytes()
+    header = probe_image(str(FIXTURES / "baseline_stego.png"))
+
+    assert header["version"] == 1
+
+    # AES-GCM is deterministic for a given nonce, so the baseline's
+    # ciphertext can be rebuilt from its header and the private key
+    aes_key = derive_aes_key(kyber_decapsulate(sk, header["kyber_ct"]))
+    ciphertext = AESGCM(aes_key).encrypt(header["nonce"], MESSAGE.encode(), None)
+    raw_header = (
+        MAGIC +
+        struct.pack(">I", len(header["kyber_ct"])) +
+        header["kyber_ct"] +
+        header["nonce"] +
+        struct.pack(">I", len(ciphertext))
+    )
+
+    stego = tmp_path / "stego.png"
+    embed_image(str(FIXTURES / "baseline_cover.png"), str(stego), raw_header, ciphertext, aes_key, legacy=True)
+
+    assert np.array_equal(pixels(stego), pixels(FIXTURES / "baseline_stego.png"))
+    assert not np.array_equal(pixels(stego), pixels(FIXTURES / "baseline_cover.png"))
@@ -0,0 +1,84 @@
+import lzma
+import os
+import tracemalloc
+import zlib
+
+import pytest
+
+from crypto.compression import (
+    CODEC_ZLIB, CODEC_LZMA, CODEC_ZSTD, OUTPUT_CHUNK, available_codecs, compressor,
+    compress_payload, decompress_payload, decompress_writer
+)
+
+MIB = 1024 * 1024
+
+BOMB_SIZE = 128 * MIB
+LIMIT = 1 * MIB
+
+# decoder state (lzma keeps an 8 MiB dictionary) plus a few output pieces;
+# far below what the bomb expands to
+PEAK_BOUND = 24 * MIB
+
+
+def bomb(codec):
+    if codec == CODEC_ZLIB:
+        engine = zlib.compressobj(9)
+    elif codec == CODEC_LZMA:
+        engine = lzma.LZMACompressor()
+    else:
+        zstandard = pytest.importorskip("zstandard")
+        engine = zstandard.ZstdCompressor().compressobj()
+
+    zeros = bytes(MIB)
+    return b"".join(engine.compress(zeros) for _ in range(BOMB_SIZE // MIB)) + engine.flush()
+
+
+def compress_with(codec, data):
+    engine = compressor(codec, len(data))
+    return engine.compress(data) + engine.flush()
+
+
+@pytest.mark.parametrize("codec", [CODEC_ZLIB, CODEC_LZMA, CODEC_ZSTD])
+def test_bomb_stops_at_limit(codec):
+    packed = bomb(codec)
+    written = []
+
+    tracemalloc.start()
+
+    try:
+        with pytest.raises(ValueError, match="decompression limit"):
+            decompress_writer(codec, written.append, LIMIT)(packed)
+
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert sum(map(len, written)) <= LIMIT
+    assert peak < PEAK_BOUND
+
+
+@pytest.mark.parametrize("codec", [CODEC_ZLIB, CODEC_LZMA])
+def test_bomb_payload_rejected(codec):
+    with pytest.raises(ValueError):
+        decompress_payload(codec, bomb(codec), LIMIT)
+
+
+@pytest.mark.parametrize("codec", available_codecs())
+def test_streamed_round_trip(codec):
+    data = os.urandom(3 * OUTPUT_CHUNK) + bytes(5 * OUTPUT_CHUNK) + b"tail"
+    packed = compress_with(codec, data)
+    out = []
+    feed = decompress_writer(codec, out.append, len(data))
+
+    # fed in uneven pieces, as decrypt_segments does
+    for start in range(0, len(packed), 65536 + 7):
+        feed(packed[start:start + 65536 + 7])
+
+    assert b"".join(out) == data
+
+
+def test_small_payload_round_trip():
+    data = b"meet at noon " * 100
+    codec, packed = compress_payload(data)
+
+    assert decompress_payload(codec, packed, len(data)) == data
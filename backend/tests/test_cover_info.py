@@ -0,0 +1,32 @@
+import shutil
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from services.stego_service import cover_info, StegoError
+from stego.cache import info_cache
+
+
+def test_info_cache_is_keyed_by_media_type(tmp_path):
+    png = tmp_path / "cover.png"
+    Image.fromarray(np.zeros((20, 30, 3), dtype=np.uint8)).save(png)
+    txt = tmp_path / "cover.txt"
+    shutil.copy(png, txt)
+
+    assert info_cache.enabled
+
+    image_media, image = cover_info(str(png), "cover.png")
+    text_media, text = cover_info(str(txt), "cover.txt")
+
+    assert (image_media, text_media) == ("image", "text")
+    assert text != image
+    assert cover_info(str(png), "cover.png") == (image_media, image)
+
+
+def test_unreadable_video_rejected(tmp_path):
+    junk = tmp_path / "cover.avi"
+    junk.write_bytes(b"RIFF" + bytes(4096))
+
+    with pytest.raises(StegoError, match="Unreadable cover file"):
+        cover_info(str(junk), "cover.avi")
@@ -0,0 +1,76 @@
+import os
+import wave
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+from pqcrypto.kem import ml_kem_512
+
+from crypto.crypto_utils import header_density
+from services.stego_service import probe_payload
+from stegolib import hide, extract
+
+DENSITIES = [1, 2, 3, 4]
+
+
+def write_png(path):
+    Image.fromarray(np.random.default_rng(0).integers(0, 256, (160, 160, 3), dtype=np.uint8)).save(path)
+
+
+def write_wav(path):
+    samples = np.random.default_rng(1).integers(-2000, 2000, 40000, dtype=np.int16)
+
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(8000)
+        wf.writeframes(samples.tobytes())
+
+
+def write_avi(path):
+    rng = np.random.default_rng(2)
+    out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"FFV1"), 10, (64, 48))
+
+    for _ in range(12):
+        out.write(rng.integers(0, 256, (48, 64, 3), dtype=np.uint8))
+
+    out.release()
+
+
+COVERS = {"cover.png": write_png, "cover.wav": write_wav, "cover.avi": write_avi}
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return ml_kem_512.generate_keypair()
+
+
+@pytest.mark.parametrize("density", DENSITIES)
+@pytest.mark.parametrize("name", COVERS)
+def test_round_trip_at_each_density(tmp_path, keys, name, density):
+    pk, sk = keys
+    cover = tmp_path / name
+    COVERS[name](cover)
+    data = os.urandom(3000)
+
+    stego = hide(cover, data, pk, tmp_path, density=density)
+    header = probe_payload(stego, os.path.basename(stego))
+
+    assert header_density(header) == density
+    assert extract(stego, sk) == ("file", data)
+
+
+@pytest.mark.parametrize("density", [0, 5, -1])
+def test_hide_rejects_density_out_of_range(client, tmp_path, density):
+    cover = tmp_path / "cover.png"
+    write_png(cover)
+    pk, _ = ml_kem_512.generate_keypair()
+
+    response = client.post("/sender/hide", data={"message": "hi", "density": str(density)}, files={
+        "cover_file": ("cover.png", cover.read_bytes()),
+        "public_key": ("pk.bin", pk)
+    })
+
+    assert response.status_code == 400
+    assert response.json() == {"error": "Density must be between 1 and 4 bits per sample"}
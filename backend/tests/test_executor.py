@@ -0,0 +1,41 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from services import executor
+
+
+def crash():
+    os._exit(1)
+
+
+def answer():
+    return 42
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    monkeypatch.setattr(executor, "EXECUTOR_KIND", "process")
+    executor.shutdown_executor()
+    yield
+    executor.shutdown_executor()
+
+
+def test_dead_worker_replaces_pool(process_pool):
+    finished = []
+
+    async def scenario():
+        with pytest.raises(executor.WorkerLostError):
+            await executor.run_in_pool(crash, on_finish=lambda: finished.append(True))
+
+        return await executor.run_in_pool(answer)
+
+    first = executor.get_executor()
+
+    assert asyncio.run(scenario()) == 42
+    assert isinstance(executor.get_executor(), ProcessPoolExecutor)
+    assert executor.get_executor() is not first
+    assert finished == [True]
+    assert executor._in_flight == 0
@@ -0,0 +1,79 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from stego.indices import legacy_random_indices, lazy_random_indices, get_random_indices
+
+
+# Straightforward versions of both generators: full-range shuffles in
+# plain Python, which the vectorized ones must match index for index.
+
+def reference_legacy(capacity, seed, offset, count):
+    size = capacity - offset
+    indices = list(range(size))
+    state = int.from_bytes(hashlib.sha256(seed).digest(), "big") & 0x7fffffff
+
+    for i in range(size - 1, 0, -1):
+        state = (1103515245 * state + 12345) & 0x7fffffff
+        j = state % (i + 1)
+        indices[i], indices[j] = indices[j], indices[i]
+
+    return [index + offset for index in indices[:count]]
+
+
+def reference_lazy(capacity, seed, offset, count):
+    span = capacity - offset
+    indices = list(range(span))
+    stream = hashlib.shake_256(b"stego-indices" + seed).digest(8 * count)
+
+    for t in range(count):
+        draw = int.from_bytes(stream[8 * t:8 * t + 8], "big")
+        j = t + draw % (span - t)
+        indices[t], indices[j] = indices[j], indices[t]
+
+    return [index + offset for index in indices[:count]]
+
+
+CASES = [
+    # (capacity, seed, offset, count)
+    (1, b"a", 0, 1),
+    (10, b"a", 0, 10),
+    (1000, b"seed", 0, 0),
+    (1000, b"seed", 7, 1),
+    (1000, b"seed", 40, 960),
+    (5000, b"\x00" * 32, 123, 4000),
+    (70000, b"long cover", 6344, 37),
+    (70000, b"long cover", 6344, 5000),
+    (250000, bytes(range(32)), 6344, 20000),
+]
+
+
+@pytest.mark.parametrize("capacity, seed, offset, count", CASES)
+def test_legacy_matches_reference(capacity, seed, offset, count):
+    expected = reference_legacy(capacity, seed, offset, count)
+
+    assert legacy_random_indices(capacity, seed, offset, count).tolist() == expected
+
+
+@pytest.mark.parametrize("capacity, seed, offset, count", CASES)
+def test_lazy_matches_reference(capacity, seed, offset, count):
+    expected = reference_lazy(capacity, seed, offset, count)
+
+    assert lazy_random_indices(capacity, seed, offset, count).tolist() == expected
+
+
+@pytest.mark.parametrize("generate", [lazy_random_indices, legacy_random_indices])
+def test_shorter_plan_is_prefix(generate):
+    # the plan cache serves shorter payloads from a longer plan
+    full = generate(70000, b"prefix", 100, 3000)
+    short = generate(70000, b"prefix", 100, 1200)
+
+    assert np.array_equal(full[:1200], short)
+    assert len(np.unique(full)) == 3000
+    assert full.min() >= 100
+
+
+def test_count_over_capacity_rejected():
+    with pytest.raises(ValueError, match="Not enough capacity"):
+        get_random_indices(100, b"x", 10, 91)
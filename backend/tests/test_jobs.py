@@ -0,0 +1,19 @@
+import asyncio
+
+from services import jobs
+
+
+def test_zero_ttl_does_not_spin(monkeypatch):
+    sweeps = []
+    monkeypatch.setattr(jobs, "JOB_RESULT_TTL", 0)
+    monkeypatch.setattr(jobs, "expire_jobs", lambda: sweeps.append(1))
+
+    async def scenario():
+        try:
+            await asyncio.wait_for(jobs.expire_jobs_forever(), 0.3)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(scenario())
+
+    assert sweeps == []
@@ -0,0 +1,124 @@
+import multiprocessing
+import secrets
+import time
+
+import pytest
+from pqcrypto.kem import ml_kem_512
+
+from services import keystore
+
+
+@pytest.fixture(autouse=True)
+def keystore_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(keystore, "KEYSTORE_DIR", str(tmp_path))
+    monkeypatch.setattr(keystore, "KEYSTORE_SECRET", None)
+    keystore._master_key.cache_clear()
+    yield
+    keystore._master_key.cache_clear()
+
+
+def test_public_reimport_keeps_private_key():
+    pk, sk = ml_kem_512.generate_keypair()
+    key_id = keystore.store_key(pk, sk)
+
+    assert keystore.store_key(pk) == key_id
+    assert keystore.load_private_key(key_id) == sk
+    assert keystore.list_keys() == [{"key_id": key_id, "private": True}]
+
+
+def test_same_pair_reimport_is_accepted():
+    pk, sk = ml_kem_512.generate_keypair()
+    key_id = keystore.store_key(pk, sk)
+
+    assert keystore.store_key(pk, sk) == key_id
+    assert keystore.load_private_key(key_id) == sk
+
+
+def test_private_key_overwrite_rejected():
+    pk, sk = ml_kem_512.generate_keypair()
+    key_id = keystore.store_key(pk, sk)
+    # same secret vector, other implicit-rejection seed z: also a valid key for pk
+    other = sk[:-32] + bytes(32)
+
+    with pytest.raises(keystore.KeyConflictError, match="different private key"):
+        keystore.store_key(pk, other)
+
+    assert keystore.load_private_key(key_id) == sk
+
+
+@pytest.mark.parametrize("public, private, error", [
+    (799, None, "Public key must be 800 bytes"),
+    (801, 1632, "Public key must be 800 bytes"),
+    (800, 1631, "Private key must be 1632 bytes"),
+])
+def test_wrong_key_lengths_rejected(public, private, error):
+    pk, sk = ml_kem_512.generate_keypair()
+    public_key = (pk * 2)[:public]
+    private_key = (sk * 2)[:private] if private else None
+
+    with pytest.raises(ValueError, match=error):
+        keystore.store_key(public_key, private_key)
+
+    assert keystore.list_keys() == []
+
+
+def test_mismatched_pair_rejected():
+    pk, _ = ml_kem_512.generate_keypair()
+    _, sk = ml_kem_512.generate_keypair()
+
+    with pytest.raises(ValueError, match="does not belong"):
+        keystore.store_key(pk, sk)
+
+    assert keystore.list_keys() == []
+
+
+def test_private_key_added_to_public_only_record():
+    pk, sk = ml_kem_512.generate_keypair()
+    key_id = keystore.store_key(pk)
+
+    with pytest.raises(KeyError):
+        keystore.load_private_key(key_id)
+
+    keystore.store_key(pk, sk)
+
+    assert keystore.load_private_key(key_id) == sk
+
+
+def _racing_master_key(index, barrier, directory, queue):
+    keystore.KEYSTORE_DIR = directory
+    keystore._master_key.cache_clear()
+    token_bytes = secrets.token_bytes
+
+    def slow_token_bytes(size):
+        # stagger the writers so that checking and writing interleave
+        time.sleep(0.02 * index)
+        return token_bytes(size)
+
+    keystore.secrets.token_bytes = slow_token_bytes
+    barrier.wait()
+    queue.put(keystore._master_key())
+
+
+@pytest.mark.parametrize("secret", [None, "passphrase"])
+def test_racing_workers_share_one_master_key(tmp_path, secret):
+    ctx = multiprocessing.get_context("fork")
+    workers = 8
+    barrier = ctx.Barrier(workers)
+    queue = ctx.Queue()
+    directory = str(tmp_path / "race")
+    keystore.KEYSTORE_SECRET = secret
+
+    procs = [ctx.Process(target=_racing_master_key, args=(i, barrier, directory, queue)) for i in range(workers)]
+
+    for proc in procs:
+        proc.start()
+
+    keys = {queue.get(timeout=30) for _ in procs}
+
+    for proc in procs:
+        proc.join()
+
+    keystore.KEYSTORE_DIR = directory
+    keystore._master_key.cache_clear()
+
+    assert keys == {keystore._master_key()}
@@ -0,0 +1,123 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+from pqcrypto.kem import ml_kem_512
+
+from routes import key_routes
+from services import keystore
+from stegolib import hide
+
+TOKEN = "s3cret-token"
+
+
+@pytest.fixture(autouse=True)
+def keystore_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(keystore, "KEYSTORE_DIR", str(tmp_path / "keys"))
+    monkeypatch.setattr(keystore, "KEYSTORE_SECRET", None)
+    keystore._master_key.cache_clear()
+    yield
+    keystore._master_key.cache_clear()
+
+
+@pytest.fixture
+def stored(tmp_path):
+    """(key_id, stego file bytes hidden for that stored key)"""
+    pk, sk = ml_kem_512.generate_keypair()
+    key_id = keystore.store_key(pk, sk)
+    cover = tmp_path / "cover.png"
+    Image.fromarray(np.random.default_rng(4).integers(0, 256, (120, 120, 3), dtype=np.uint8)).save(cover)
+
+    with open(hide(cover, "for the stored key", None, tmp_path, key_id), "rb") as f:
+        return key_id, f.read()
+
+
+def keystore_requests(client, key_id, stego, headers):
+    cover = ("cover.png", stego)
+
+    return {
+        "list": client.get("/keys", headers=headers),
+        "get": client.get(f"/keys/{key_id}", headers=headers),
+        "import": client.post("/keys", files={"public_key": ("pk", bytes(800))}, headers=headers),
+        "generate": client.post("/generate-keys?store=true", headers=headers),
+        "hide": client.post("/sender/hide", data={"key_id": key_id, "message": "hi"},
+                            files={"cover_file": cover}, headers=headers),
+        "extract": client.post("/receiver/extract", files={"stego_file": cover}, headers=headers),
+        "extract_job": client.post("/jobs/extract", files={"stego_file": cover}, headers=headers),
+        "delete": client.delete(f"/keys/{key_id}", headers=headers),
+    }
+
+
+def test_keystore_closed_without_token(client, stored, monkeypatch):
+    monkeypatch.setattr(key_routes, "KEYSTORE_TOKEN", None)
+    key_id, stego = stored
+
+    for name, response in keystore_requests(client, key_id, stego, {}).items():
+        assert response.status_code == 403, name
+
+    assert keystore.list_keys() == [{"key_id": key_id, "private": True}]
+    assert client.post("/generate-keys").status_code == 200
+
+
+@pytest.mark.parametrize("headers", [{}, {"Authorization": "Bearer wrong"}, {"Authorization": TOKEN}])
+def test_keystore_needs_the_token(client, stored, monkeypatch, headers):
+    monkeypatch.setattr(key_routes, "KEYSTORE_TOKEN", TOKEN)
+    key_id, stego = stored
+
+    for name, response in keystore_requests(client, key_id, stego, headers).items():
+        assert response.status_code == 401, name
+
+    assert keystore.list_keys() == [{"key_id": key_id, "private": True}]
+
+
+def test_keystore_open_with_token(client, stored, monkeypatch):
+    monkeypatch.setattr(key_routes, "KEYSTORE_TOKEN", TOKEN)
+    key_id, stego = stored
+    headers = {"Authorization": f"Bearer {TOKEN}"}
+
+    assert client.get("/keys", headers=headers).json()["keys"] == [{"key_id": key_id, "private": True}]
+
+    response = client.post("/receiver/extract", files={"stego_file": ("cover.png", stego)}, headers=headers)
+    assert response.json() == {"message": "for the stored key"}
+
+    response = client.post("/sender/hide", data={"key_id": key_id, "message": "hi"},
+                           files={"cover_file": ("cover.png", stego)}, headers=headers)
+    assert response.status_code == 200
+
+    assert client.delete(f"/keys/{key_id}", headers=headers).status_code == 200
+    assert keystore.list_keys() == []
+
+
+def test_import_rejects_invalid_keys(client, monkeypatch):
+    monkeypatch.setattr(key_routes, "KEYSTORE_TOKEN", TOKEN)
+    headers = {"Authorization": f"Bearer {TOKEN}"}
+    pk, sk = ml_kem_512.generate_keypair()
+    _, other = ml_kem_512.generate_keypair()
+
+    def import_key(public_key, private_key):
+        return client.post("/keys", headers=headers, files={
+            "public_key": ("pk", public_key), "private_key": ("sk", private_key)
+        })
+
+    assert import_key(pk[:-1], sk).status_code == 400
+    assert import_key(pk, sk + b"x").status_code == 400
+    assert import_key(pk, other).status_code == 400
+    assert keystore.list_keys() == []
+
+    assert import_key(pk, sk).status_code == 200
+    assert import_key(pk, sk[:-32] + bytes(32)).status_code == 409
+
+
+def test_unreadable_stored_key_is_invalid_key(client, stored, monkeypatch):
+    monkeypatch.setattr(key_routes, "KEYSTORE_TOKEN", TOKEN)
+    key_id, stego = stored
+
+    with open(os.path.join(keystore.KEYSTORE_DIR, key_id + ".key"), "w") as f:
+        f.write("{not json")
+
+    response = client.post("/receiver/extract", files={"stego_file": ("cover.png", stego)},
+                           headers={"Authorization": f"Bearer {TOKEN}"})
+
+    assert response.status_code == 400
+    assert response.json() == {"error": "Invalid private key", "key_id": key_id}
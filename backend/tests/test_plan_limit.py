@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+from pqcrypto.kem import ml_kem_512
+
+from services import stego_service
+from services.stego_service import StegoError
+from stego.indices import plan_memory
+from stegolib import hide, extract
+
+
+@pytest.fixture
+def cover(tmp_path):
+    path = tmp_path / "cover.png"
+    Image.fromarray(np.random.default_rng(1).integers(0, 256, (300, 300, 3), dtype=np.uint8)).save(path)
+    return path
+
+
+def test_hide_over_plan_limit_rejected(cover, tmp_path, monkeypatch):
+    pk, _ = ml_kem_512.generate_keypair()
+    monkeypatch.setattr(stego_service, "PLAN_MEMORY_MAX", plan_memory(4096, 2))
+
+    with pytest.raises(StegoError, match="plan memory limit") as raised:
+        hide(cover, os.urandom(8192), pk, tmp_path, density=2)
+
+    assert raised.value.details["max_bytes"] == 4096
+    assert raised.value.details["density"] == 2
+
+    hide(cover, os.urandom(3000), pk, tmp_path, density=2)
+
+
+def test_extract_over_plan_limit_rejected(cover, tmp_path, monkeypatch):
+    pk, sk = ml_kem_512.generate_keypair()
+    stego = hide(cover, os.urandom(8192), pk, tmp_path)
+
+    monkeypatch.setattr(stego_service, "PLAN_MEMORY_MAX", plan_memory(4096))
+
+    with pytest.raises(StegoError, match="plan memory limit"):
+        extract(stego, sk)
+
+    monkeypatch.setattr(stego_service, "PLAN_MEMORY_MAX", 0)
+
+    kind, data = extract(stego, sk)
+
+    assert (kind, len(data)) == ("file", 8192)
@@ -0,0 +1,102 @@
+import os
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+from pqcrypto.kem import ml_kem_512
+
+from stegolib import hide
+
+JUNK = {
+    "junk.wav": b"RIFF\x24\x00\x00\x00WAVEfmt \x10\x00\x00\x00" + b"\x01" * 7,
+    "short.wav": b"RIFF",
+    "junk.png": b"not an image at all" * 20,
+    "short.png": b"\x89PNG\r\n\x1a\n\x00\x00",
+    "junk.avi": b"RIFF" + bytes(256),
+}
+
+
+@pytest.mark.parametrize("name", JUNK)
+def test_probe_junk_is_not_stego(client, name):
+    response = client.post("/receiver/probe", files={"stego_file": (name, JUNK[name])})
+
+    assert response.status_code == 200
+    assert response.json() == {"stego": False}
+
+
+@pytest.mark.parametrize("name", JUNK)
+def test_extract_junk_has_no_hidden_data(client, name):
+    _, sk = ml_kem_512.generate_keypair()
+    response = client.post("/receiver/extract", files={
+        "stego_file": (name, JUNK[name]),
+        "private_key": ("sk.bin", sk)
+    })
+
+    assert response.status_code == 400
+    assert response.json() == {"error": "No hidden data found"}
+
+
+@pytest.mark.parametrize("payload", ["meet at noon", os.urandom(5000)], ids=["message", "file"])
+def test_extract_with_wrong_key_fails_decryption(client, tmp_path, payload):
+    cover = tmp_path / "cover.png"
+    Image.fromarray(np.random.default_rng(2).integers(0, 256, (200, 200, 3), dtype=np.uint8)).save(cover)
+    pk, sk = ml_kem_512.generate_keypair()
+    _, wrong = ml_kem_512.generate_keypair()
+
+    with open(hide(cover, payload, pk, tmp_path), "rb") as f:
+        stego = f.read()
+
+    response = client.post("/receiver/extract", files={
+        "stego_file": ("cover.stego.png", stego),
+        "private_key": ("sk.bin", wrong)
+    })
+
+    assert response.status_code == 400
+    assert response.json() == {"error": "Decryption failed"}
+
+    response = client.post("/receiver/extract", files={
+        "stego_file": ("cover.stego.png", stego),
+        "private_key": ("sk.bin", sk)
+    })
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("private_key", [b"short", bytes(1633)], ids=["short", "long"])
+def test_extract_with_malformed_key_is_invalid_key(client, tmp_path, private_key):
+    cover = tmp_path / "cover.png"
+    Image.fromarray(np.random.default_rng(5).integers(0, 256, (100, 100, 3), dtype=np.uint8)).save(cover)
+    pk, _ = ml_kem_512.generate_keypair()
+
+    with open(hide(cover, "hi", pk, tmp_path), "rb") as f:
+        stego = f.read()
+
+    response = client.post("/receiver/extract", files={
+        "stego_file": ("cover.stego.png", stego),
+        "private_key": ("sk.bin", private_key)
+    })
+
+    assert response.status_code == 400
+    assert response.json() == {"error": "Invalid private key"}
+
+
+@pytest.mark.parametrize("public_key", [b"short", bytes(801)], ids=["short", "long"])
+def test_hide_with_malformed_key_is_invalid_key(client, public_key):
+    cover = ("cover.txt", b"plenty of cover text " * 50)
+    data = {"message": "hi"}
+    key = {"public_key": ("pk.bin", public_key)}
+
+    response = client.post("/sender/hide", data=data, files={"cover_file": cover, **key})
+
+    assert response.status_code == 400
+    assert response.json() == {"error": "Invalid public key"}
+
+    response = client.post("/jobs/hide", data=data, files={"cover_file": cover, **key})
+    job = client.get(response.headers["Location"]).json()
+
+    while job["status"] in ("queued", "running"):
+        time.sleep(0.05)
+        job = client.get(response.headers["Location"]).json()
+
+    assert job["error"] == {"code": 400, "error": "Invalid public key"}
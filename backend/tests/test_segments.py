@@ -0,0 +1,108 @@
+import io
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from crypto.crypto_utils import (
+    SEGMENT_SIZE, TAG_SIZE, segment_nonce, segmented_size, encrypt_segments, decrypt_segments
+)
+
+STEP = SEGMENT_SIZE + TAG_SIZE
+KEY = bytes(range(32))
+
+
+def seal(plain):
+    out = io.BytesIO()
+    nonce = encrypt_segments(io.BytesIO(plain).read, out.write, KEY)
+
+    return nonce, out.getvalue()
+
+
+def open_sealed(nonce, ciphertext):
+    out = io.BytesIO()
+    decrypt_segments(nonce, ciphertext, KEY, out.write)
+
+    return out.getvalue()
+
+
+def segments(ciphertext):
+    return [ciphertext[start:start + STEP] for start in range(0, len(ciphertext), STEP)]
+
+
+@pytest.mark.parametrize("size", [0, 1, SEGMENT_SIZE, SEGMENT_SIZE + 1, 3 * SEGMENT_SIZE + 100])
+def test_round_trip(size):
+    plain = os.urandom(size)
+    nonce, ciphertext = seal(plain)
+
+    assert len(ciphertext) == segmented_size(size)
+    assert open_sealed(nonce, ciphertext) == plain
+
+
+@pytest.fixture
+def sealed():
+    plain = os.urandom(3 * SEGMENT_SIZE + 100)
+    nonce, ciphertext = seal(plain)
+    assert len(segments(ciphertext)) == 4
+
+    return nonce, ciphertext
+
+
+def test_reordered_segments_are_rejected(sealed):
+    nonce, ciphertext = sealed
+    parts = segments(ciphertext)
+
+    with pytest.raises(InvalidTag):
+        open_sealed(nonce, b"".join([parts[1], parts[0], *parts[2:]]))
+
+
+@pytest.mark.parametrize("cut", [STEP, 2 * STEP, 3 * STEP, 3 * STEP + 50, 4], ids=[
+    "one_segment", "two_segments", "drop_final", "inside_final", "inside_first"
+])
+def test_truncated_ciphertext_is_rejected(sealed, cut):
+    nonce, ciphertext = sealed
+
+    with pytest.raises((InvalidTag, ValueError)):
+        open_sealed(nonce, ciphertext[:cut])
+
+
+@pytest.mark.parametrize("index", [0, 2, 3])
+def test_duplicated_segment_is_rejected(sealed, index):
+    nonce, ciphertext = sealed
+    parts = segments(ciphertext)
+    parts.insert(index, parts[index])
+
+    with pytest.raises(InvalidTag):
+        open_sealed(nonce, b"".join(parts))
+
+
+def test_final_flag_is_authenticated(sealed):
+    nonce, ciphertext = sealed
+    plain = open_sealed(nonce, ciphertext)
+    parts = segments(ciphertext)
+    aes = AESGCM(KEY)
+
+    # the last segment sealed as if more were to follow
+    parts[-1] = aes.encrypt(segment_nonce(nonce, 3, False), plain[3 * SEGMENT_SIZE:], None)
+
+    with pytest.raises(InvalidTag):
+        open_sealed(nonce, b"".join(parts))
+
+    # a middle segment sealed as final: only a stream that ends there opens
+    parts = segments(ciphertext)
+    parts[1] = aes.encrypt(segment_nonce(nonce, 1, True), plain[SEGMENT_SIZE:2 * SEGMENT_SIZE], None)
+
+    with pytest.raises(InvalidTag):
+        open_sealed(nonce, b"".join(parts))
+
+    assert open_sealed(nonce, b"".join(parts[:2])) == plain[:2 * SEGMENT_SIZE]
+
+
+def test_tampered_segment_is_rejected(sealed):
+    nonce, ciphertext = sealed
+    tampered = bytearray(ciphertext)
+    tampered[STEP + 10] ^= 1
+
+    with pytest.raises(InvalidTag):
+        open_sealed(nonce, bytes(tampered))
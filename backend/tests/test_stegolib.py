@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+from pqcrypto.kem import ml_kem_512
+
+from services.stego_service import StegoError
+from stegolib import hide, extract
+
+
+@pytest.fixture
+def cover(tmp_path):
+    path = tmp_path / "cover.png"
+    Image.fromarray(np.random.default_rng(3).integers(0, 256, (200, 200, 3), dtype=np.uint8)).save(path)
+    return path
+
+
+def test_extract_reports_payload_kind(cover, tmp_path):
+    pk, sk = ml_kem_512.generate_keypair()
+    data = os.urandom(3000)
+
+    assert extract(hide(cover, "meet at noon", pk, tmp_path / "m.png"), sk) == ("message", "meet at noon")
+
+    stego = hide(cover, data, pk, tmp_path / "f.png")
+    assert extract(stego, sk) == ("file", data)
+
+    # a message that happens to equal the output path is still a message
+    out = str(tmp_path / "out.bin")
+    stego = hide(cover, out, pk, tmp_path / "p.png")
+    assert extract(stego, sk, out) == ("message", out)
+    assert not os.path.exists(out)
+
+
+def test_missing_keys_raise_stego_error(cover, tmp_path):
+    pk, _ = ml_kem_512.generate_keypair()
+
+    with pytest.raises(StegoError, match="public_key or a key_id"):
+        hide(cover, "hi", None, tmp_path)
+
+    stego = hide(cover, "hi", pk, tmp_path)
+
+    with pytest.raises(StegoError, match="No private key"):
+        extract(stego)
@@ -0,0 +1,125 @@
+import os
+import struct
+
+import numpy as np
+import pytest
+from pqcrypto.kem import ml_kem_512
+
+from crypto.crypto_utils import MAGIC, aes_encrypt, derive_aes_key, kyber_encapsulate
+from stego.text_stego import (
+    ALPHABET, MARK, ZWSP, ZWNJ, RADICES, encode_zwc, decode_zwc, trailing_symbols, embed_text
+)
+from stegolib import hide, extract
+
+COVER = "An ordinary paragraph of cover text.\n" * 20
+PAYLOADS = [b"", b"\x00", b"ab", os.urandom(1), os.urandom(2), os.urandom(3), os.urandom(1000)]
+
+
+@pytest.fixture
+def keys():
+    return ml_kem_512.generate_keypair()
+
+
+def write_stego(path, cover, block):
+    path.write_text(cover + "\n\n" + block, encoding="utf-8")
+
+    return path
+
+
+@pytest.mark.parametrize("radix", RADICES)
+@pytest.mark.parametrize("payload", PAYLOADS, ids=lambda p: f"{len(p)}B")
+def test_block_round_trip(tmp_path, radix, payload):
+    block = encode_zwc(payload, radix)
+
+    assert set(block) <= set(ALPHABET)
+    assert block.startswith(MARK) == (radix != 2)
+
+    path = write_stego(tmp_path / "stego.txt", COVER, block)
+
+    assert decode_zwc(trailing_symbols(path)) == payload
+
+
+def test_unknown_radix_is_rejected():
+    with pytest.raises(ValueError, match="Text radix"):
+        encode_zwc(b"data", 16)
+
+
+@pytest.mark.parametrize("radix", RADICES)
+def test_hide_extract_for_each_radix(tmp_path, keys, monkeypatch, radix):
+    from services import stego_service
+
+    monkeypatch.setattr(stego_service, "TEXT_RADIX", radix)
+    pk, sk = keys
+    cover = tmp_path / "cover.txt"
+    cover.write_text(COVER, encoding="utf-8")
+
+    stego = hide(cover, "radix test message", pk, tmp_path)
+
+    with open(stego, encoding="utf-8") as f:
+        assert f.read().startswith(COVER)
+
+    assert extract(stego, sk) == ("message", "radix test message")
+
+
+@pytest.mark.parametrize("old_radix, new_radix", [(2, 8), (2, 4), (8, 2), (4, 8)])
+def test_trailing_block_wins_over_earlier_blocks(tmp_path, old_radix, new_radix):
+    # a stego text reused as a cover: v1 ZWSP/ZWNJ and MARK blocks side by side
+    cover = COVER + "\n\n" + encode_zwc(os.urandom(40), old_radix)
+    payload = os.urandom(40)
+    path = write_stego(tmp_path / "stego.txt", cover, encode_zwc(payload, new_radix))
+
+    assert decode_zwc(trailing_symbols(path)) == payload
+
+
+@pytest.mark.parametrize("radix", RADICES)
+def test_cover_with_zero_width_chars(tmp_path, keys, monkeypatch, radix):
+    from services import stego_service
+
+    monkeypatch.setattr(stego_service, "TEXT_RADIX", radix)
+    pk, sk = keys
+    # joiners in emoji sequences, soft breaks, and a cover ending in ZWC
+    text = "family \U0001F468\u200D\U0001F469\u200D\U0001F467 zero\u200Bwidth\u200C break " + MARK + ZWSP + ZWNJ
+    cover = tmp_path / "cover.txt"
+    cover.write_text(text, encoding="utf-8")
+
+    stego = hide(cover, "hidden next to joiners", pk, tmp_path)
+
+    with open(stego, encoding="utf-8") as f:
+        assert f.read().startswith(text)
+
+    assert extract(stego, sk) == ("message", "hidden next to joiners")
+
+
+@pytest.mark.parametrize("block, error", [
+    (MARK + ALPHABET[0], "Unknown text payload mode"),
+    (MARK + ALPHABET[1] + ALPHABET[5], "Corrupt text payload"),
+], ids=["mode", "symbol"])
+def test_corrupt_block_is_rejected(block, error):
+    symbols = np.array([ALPHABET.index(char) for char in block], dtype=np.uint8)
+
+    with pytest.raises(ValueError, match=error):
+        decode_zwc(symbols)
+
+
+def test_legacy_block_round_trip(tmp_path, keys):
+    # a v1 (STEG) payload spelled the way the original engine did it
+    pk, sk = keys
+    kyber_ct, shared_secret = kyber_encapsulate(pk)
+    nonce, ciphertext = aes_encrypt(b"legacy message", derive_aes_key(shared_secret))
+    header = MAGIC + struct.pack(">I", len(kyber_ct)) + kyber_ct + nonce + struct.pack(">I", len(ciphertext))
+    bits = "".join(f"{byte:08b}" for byte in header + ciphertext)
+    block = "".join(ZWNJ if bit == "1" else ZWSP for bit in bits)
+
+    assert encode_zwc(header + ciphertext, 2) == block
+
+    stego = write_stego(tmp_path / "legacy.txt", COVER, block)
+
+    assert extract(stego, sk) == ("message", "legacy message")
+
+    # and the file API writes the same block from the same header and body
+    rewritten = tmp_path / "rewritten.txt"
+    cover = tmp_path / "cover.txt"
+    cover.write_text(COVER, encoding="utf-8")
+    embed_text(cover, rewritten, header, ciphertext, radix=2)
+
+    assert rewritten.read_bytes() == stego.read_bytes()
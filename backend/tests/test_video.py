@@ -0,0 +1,186 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+from pqcrypto.kem import ml_kem_512
+
+from crypto.crypto_utils import build_header, density_flags
+from services.stego_service import StegoError
+from stego import video_shards
+from stego.bits import bits_to_bytes, read_lsb, symbol_count, symbols_to_bits
+from stego.indices import get_random_indices
+from stego.video_stego import embed_video, extract_capture
+from stegolib import hide, extract
+
+WIDTH, HEIGHT, FRAMES = 64, 48, 40
+
+
+def write_video(path, fourcc, frames=FRAMES, seed=0):
+    rng = np.random.default_rng(seed)
+    out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*fourcc), 10, (WIDTH, HEIGHT))
+
+    for _ in range(frames):
+        out.write(rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8))
+
+    out.release()
+
+
+def frame_count(path):
+    cap = cv2.VideoCapture(str(path))
+    count = 0
+
+    while cap.read()[0]:
+        count += 1
+
+    reported = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    return count, reported
+
+
+def short_cover(path, seed):
+    """An MJPG AVI cut short: its header still reports FRAMES frames. The
+    seed keeps covers apart in the cover cache."""
+    write_video(path, "MJPG", seed=seed)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) * 7 // 10])
+
+    decoded, reported = frame_count(path)
+    assert decoded < reported == FRAMES
+
+    return path
+
+
+@pytest.fixture
+def keys():
+    return ml_kem_512.generate_keypair()
+
+
+@pytest.fixture
+def sharding(monkeypatch):
+    """Shard the small test videos as if they were over the size threshold
+    on a multi-core machine."""
+    monkeypatch.setattr(video_shards, "VIDEO_SHARD_MIN_BYTES", 0)
+    monkeypatch.setattr(video_shards, "CPU_COUNT", 4)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_overstated_frame_count_embeds_real_frames(tmp_path, keys, monkeypatch, sharding, workers):
+    from services import stego_service
+
+    monkeypatch.setattr(stego_service, "VIDEO_WORKERS", workers)
+    pk, sk = keys
+    data = os.urandom(20000)
+    cover = short_cover(tmp_path / "short.avi", seed=workers)
+
+    stego = hide(cover, data, pk, tmp_path)
+    decoded, _ = frame_count(cover)
+
+    # more than one shard chunk, so the workers split the frames
+    assert decoded > 16
+
+    assert frame_count(stego) == (decoded, decoded)
+    assert extract(stego, sk) == ("file", data)
+
+
+def test_overstated_frame_count_rechecks_capacity(tmp_path, keys):
+    cover = short_cover(tmp_path / "short.avi", seed=3)
+    decoded, _ = frame_count(cover)
+    real_bytes = decoded * WIDTH * HEIGHT * 3 // 8
+
+    # fits the reported frame count, not the frames that decode
+    with pytest.raises(StegoError, match="Video too small for payload"):
+        hide(cover, os.urandom(real_bytes), keys[0], tmp_path)
+
+
+def embed_bytes(cover, stego, workers):
+    rng = np.random.default_rng(7)
+    header, body, seed = (rng.bytes(n) for n in (64, 3000, 32))
+    embed_video(str(cover), str(stego), header, body, seed, workers=workers)
+
+    return stego.read_bytes()
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_sharded_embed_matches_serial(tmp_path, sharding, workers):
+    cover = tmp_path / "cover.avi"
+    write_video(cover, "FFV1", seed=10 + workers)
+
+    serial = embed_bytes(cover, tmp_path / "serial.avi", 1)
+    sharded = embed_bytes(cover, tmp_path / "sharded.avi", workers)
+
+    assert video_shards.shard_count({"width": WIDTH, "height": HEIGHT, "frame_count": FRAMES}, workers) == workers
+    assert sharded == serial
+
+
+def test_small_video_embeds_serially(tmp_path, monkeypatch):
+    def no_spawn(*args, **kwargs):
+        raise AssertionError("spawned shard workers for a video under the threshold")
+
+    monkeypatch.setattr(video_shards, "CPU_COUNT", 4)
+    monkeypatch.setattr(video_shards.mp, "get_context", no_spawn)
+    cover = tmp_path / "cover.avi"
+    write_video(cover, "FFV1", seed=20)
+
+    assert FRAMES * WIDTH * HEIGHT * 3 < video_shards.VIDEO_SHARD_MIN_BYTES
+    assert embed_bytes(cover, tmp_path / "sharded.avi", 4) == embed_bytes(cover, tmp_path / "serial.avi", 1)
+
+
+class CountingCapture:
+    """A VideoCapture that counts the frames it decodes and skips."""
+
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(str(path))
+        self.decoded = 0
+        self.skipped = 0
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def grab(self):
+        self.skipped += 1
+        return self.cap.grab()
+
+    def read(self):
+        self.decoded += 1
+        return self.cap.read()
+
+
+def full_decode_body(path, header, seed, density):
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame.reshape(-1))
+
+    cap.release()
+    samples = np.concatenate(frames)
+    num_bits = header["msg_len"] * 8
+    indices = get_random_indices(len(samples), seed, header["size"] * 8, symbol_count(num_bits, density))
+
+    return bits_to_bytes(symbols_to_bits(read_lsb(samples, indices, density), density, num_bits))
+
+
+@pytest.mark.parametrize("density", [1, 3])
+def test_extract_capture_decodes_only_body_frames(tmp_path, density):
+    cover = tmp_path / "cover.avi"
+    stego = tmp_path / "stego.avi"
+    write_video(cover, "FFV1", seed=30 + density)
+    rng = np.random.default_rng(density)
+    body, seed = rng.bytes(3 * density), rng.bytes(32)
+    header = build_header(rng.bytes(768), rng.bytes(12), len(body), density_flags(density))
+    embed_video(str(cover), str(stego), header, body, seed, density=density)
+
+    cap = CountingCapture(stego)
+    parsed, _, extracted = extract_capture(cap, lambda header: seed)
+    cap.cap.release()
+
+    assert extracted == body
+    assert extracted == full_decode_body(stego, parsed, seed, density)
+    # the body is spread over several frames, but not every frame is decoded
+    assert 2 < cap.decoded < FRAMES
+    assert cap.skipped > 0
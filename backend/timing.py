@@ -0,0 +1,90 @@
+import cProfile
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# ---------------- STAGE TIMING ----------------
+# Hot paths wrap their stages in `with stage("name", nbytes):`. Inside a
+# job started by run_timed the durations and byte counts are collected and
+# handed back with the result; everywhere else stage() costs one ContextVar
+# lookup. A stage entered several times (per frame, per block) accumulates.
+
+_stages = ContextVar("stego_stages", default=None)
+
+
+@contextmanager
+def stage(name, nbytes=0):
+    stages = _stages.get()
+
+    if stages is None:
+        yield
+        return
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        add_stage(stages, name, time.perf_counter() - start, nbytes)
+
+
+def add_stage(stages, name, seconds, nbytes=0):
+    entry = stages.setdefault(name, [0.0, 0])
+    entry[0] += seconds
+    entry[1] += nbytes
+
+
+def count_bytes(name, nbytes):
+    """Add nbytes to a stage without timing anything."""
+    stages = _stages.get()
+
+    if stages is not None:
+        add_stage(stages, name, 0.0, nbytes)
+
+
+def merge_stages(other):
+    """Fold stages collected elsewhere (e.g. in a child process) into the
+    current job's."""
+    stages = _stages.get()
+
+    if stages is not None:
+        for name, (seconds, nbytes) in other.items():
+            add_stage(stages, name, seconds, nbytes)
+
+
+def run_timed(profile_path, fn, *args):
+    """Run fn(*args) collecting its stages. Returns (result, stages).
+
+    With a profile_path the call also runs under cProfile and the stats are
+    dumped there. Top level so it can be shipped to pool workers.
+    """
+    stages = {}
+    token = _stages.set(stages)
+    profiler = cProfile.Profile() if profile_path else None
+
+    try:
+        if profiler is None:
+            result = fn(*args)
+        else:
+            result = profiler.runcall(fn, *args)
+    finally:
+        _stages.reset(token)
+
+        if profiler is not None:
+            profiler.dump_stats(profile_path)
+
+    return result, stages
+
+
+def server_timing(stages):
+    """Format stages as a Server-Timing header value."""
+    parts = []
+
+    for name, (seconds, nbytes) in stages.items():
+        part = f"{name};dur={seconds * 1000:.2f}"
+        if nbytes:
+            part += f';desc="{nbytes} B"'
+        parts.append(part)
+
+    return ", ".join(parts)